@@ -1,13 +1,15 @@
 from fastapi import FastAPI, HTTPException
 
-from Simple.src.types.models import ModelType, EmbeddingModel, MODEL_TOKEN_LIMITS, MODEL_SYS_PROMPTS
+from Simple.src.types.models import ModelType, EmbeddingModel, MODEL_TOKEN_LIMITS, MODEL_SYS_PROMPTS, EMBEDDING_DIMENSIONS
 from Simple.src.types.API import LLMOutput, Keyword
 from Simple.src.types.reviews import Review
 
-from .types.t_api import TokenLimitResponse
+from .types.t_api import TokenLimitResponse, EmbeddingRequest, EmbeddingResponse
 from .utils.tokens import count_claude_tokens, count_gpt_tokens
+from .utils.outputs import split_by_product
 
 from openai import OpenAI
+import openai
 
 from anthropic.types import Message
 import anthropic
@@ -41,6 +43,12 @@ logger.debug("FAST API: Starting...")
 app = FastAPI()
 logger.success("FAST API: Ready and listening")
 
+def _retry_after(response) -> dict[str, str] | None:
+    """Forwards the provider's Retry-After header, if any, so the client backs off long enough."""
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    return {"Retry-After": retry_after} if retry_after else None
+
+
 @app.get("/health")
 async def check_endpoint():
     return {
@@ -61,8 +69,12 @@ async def get_token_limit(model: ModelType, response_model=TokenLimitResponse):
         "token_limit": MODEL_TOKEN_LIMITS.get(selected_model)
     }
 
-@app.post("/feed_model/{model}", response_model=LLMOutput)
+@app.post("/feed_model/{model}", response_model=list[LLMOutput])
 async def feed_model(model: str, reviews: list[Review], prompt: str | None = "default"):
+    """
+        Extracts keywords and sentiment for a chunk of reviews.
+        Chunks may mix products, so one LLMOutput is returned per product in the chunk.
+    """
     logger.debug(f"Recived request. Model: {model}, prompt: {prompt} {reviews}")
     try:
         selected_model = ModelType(model)
@@ -87,32 +99,38 @@ async def feed_model(model: str, reviews: list[Review], prompt: str | None = "de
             if token_count > MODEL_TOKEN_LIMITS[ModelType.CLAUDE]:
                 # Check if it will go past max tokens *NOT GUARANTEED \
 
+                # 413 tells the client to split the chunk and try again
                 raise HTTPException(
-                    status_code=400, 
+                    status_code=413, 
                     detail=f"""Input content exceeded token limit of {MODEL_TOKEN_LIMITS[ModelType.CLAUDE]}!
                     \nSystem Prompt token count: {count_claude_tokens(MODEL_SYS_PROMPTS[prompt])} 
                     \nInput Review Token count: {count_claude_tokens(formatted_reviews)}
-                    \nTotal: {count_claude_tokens(MODEL_SYS_PROMPTS[prompt] + count_claude_tokens(formatted_reviews))}
+                    \nTotal: {token_count}
                     """
                 )
 
             # Get the LLM response
-            message: Message = claude_client.messages.create(
-                model="claude-3-5-sonnet-20240620",
-                max_tokens=MODEL_TOKEN_LIMITS[ModelType.CLAUDE],
-                system=MODEL_SYS_PROMPTS[prompt],
-                messages=[
-                    {
-                        "role": "user", 
-                        "content": formatted_reviews
-                    }
-                ],
-                temperature=0 # We can play with this later.
-            )
+            try:
+                message: Message = claude_client.messages.create(
+                    model="claude-3-5-sonnet-20240620",
+                    max_tokens=MODEL_TOKEN_LIMITS[ModelType.CLAUDE],
+                    system=MODEL_SYS_PROMPTS[prompt],
+                    messages=[
+                        {
+                            "role": "user", 
+                            "content": formatted_reviews
+                        }
+                    ],
+                    temperature=0 # We can play with this later.
+                )
+            except anthropic.RateLimitError as e:
+                raise HTTPException(status_code=429, detail=f"Claude: rate limited. {e}", headers=_retry_after(e.response))
+            except anthropic.APIConnectionError as e:
+                raise HTTPException(status_code=503, detail=f"Claude: connection error. {e}")
             logger.debug(f"Recieved anthropic response: {message}")
             if message.stop_reason == "max_tokens":
-                # Catch max_token limits 
-                raise HTTPException(status_code=400, detail="Claude: MAX TOKEN REACHED")
+                # Catch max_token limits. A smaller chunk needs a shorter response.
+                raise HTTPException(status_code=413, detail="Claude: MAX TOKEN REACHED")
             
             if not message.content[0].text:
                 raise HTTPException(status_code=500, detail="Claude: No assistant response found! Reviews NOT parsed!")
@@ -120,16 +138,9 @@ async def feed_model(model: str, reviews: list[Review], prompt: str | None = "de
             try:
                 parsed_dict = json.loads(message.content[0].text)
                 #logger.debug(f"Parsed dict: {parsed_dict}")
-            
-                # Add in the product ID to LLMOutput
-                parsed_dict['product_id'] = reviews[0].product_id 
-                # Add the product ID to each Keyword of LLMOutput
-                for kw in parsed_dict.get("keywords", []):
-                    kw["product_id"] = reviews[0].product_id
-
-                llm_output = LLMOutput(**parsed_dict) 
-                #logger.debug(f"Created LLMOutput object: {llm_output}")
-                return llm_output
+
+                # Attribute each keyword to its review's product
+                return split_by_product(parsed_dict, reviews)
             except json.JSONDecodeError:
                 raise HTTPException(status_code=400, detail="Recieved Invalid JSON format from claude")
             except ValueError as e:
@@ -137,27 +148,34 @@ async def feed_model(model: str, reviews: list[Review], prompt: str | None = "de
                 raise HTTPException(status_code=400, detail=f"Validation error when constructing LLMOutput from Claude response! {e}")
 
         case ModelType.GPT3 | ModelType.GPT4 | ModelType.GPT4Mini | ModelType.GPT4Mini_FT:
-            response = openAI_client.chat.completions.create(
-                model=selected_model.value,  
-                messages=[
-                    { "role": "system", "content": MODEL_SYS_PROMPTS[prompt]},
-                    { "role": "user", "content": formatted_reviews}
-                ],
-            )
+            try:
+                response = openAI_client.chat.completions.create(
+                    model=selected_model.value,  
+                    messages=[
+                        { "role": "system", "content": MODEL_SYS_PROMPTS[prompt]},
+                        { "role": "user", "content": formatted_reviews}
+                    ],
+                )
+            except openai.RateLimitError as e:
+                raise HTTPException(status_code=429, detail=f"OpenAI: rate limited. {e}", headers=_retry_after(e.response))
+            except openai.BadRequestError as e:
+                if e.code == "context_length_exceeded":
+                    raise HTTPException(status_code=413, detail=f"OpenAI: {e}")
+                raise HTTPException(status_code=400, detail=f"OpenAI: {e}")
+            except openai.APIConnectionError as e:
+                raise HTTPException(status_code=503, detail=f"OpenAI: connection error. {e}")
+            if response.choices[0].finish_reason == "length":
+                raise HTTPException(status_code=413, detail="OpenAI: MAX TOKEN REACHED")
             try:
                 response_text = response.choices[0].message.content
                 #logger.debug(response_text)
                 parsed_output = json.loads(response_text)
-                parsed_output['product_id'] = reviews[0].product_id 
-                for kw in parsed_output.get("keywords", []):
-                    kw["product_id"] = reviews[0].product_id
-
                 logger.debug(parsed_output)
-                llm_output = LLMOutput(**parsed_output)
-                return llm_output
+                return split_by_product(parsed_output, reviews)
             except json.JSONDecodeError as e:
                 print("Failed to parse JSON:", e)
                 print("Raw response:", response_text)
+                raise HTTPException(status_code=502, detail="Recieved Invalid JSON format from OpenAI")
 
         case ModelType.Gemini:
             logger.warning("Not yet implemented")
@@ -221,7 +239,7 @@ async def get_embeddings(model: str, llmOut: LLMOutput) -> LLMOutput:
             embeddings = openAI_client.embeddings.create(
                 model=selected_model.value,
                 input=keywords,
-                dimensions=1536
+                dimensions=EMBEDDING_DIMENSIONS
             )
 
             if len(embeddings.data) != len(llmOut.keywords):
@@ -238,3 +256,42 @@ async def get_embeddings(model: str, llmOut: LLMOutput) -> LLMOutput:
             # Athnropic's embedding 
             raise HTTPException(status_code=404, detail="Voyage embeddings not currently implimented!")
 
+
+@app.post("/embed_texts/{model}", response_model=EmbeddingResponse)
+async def embed_texts(model: str, request: EmbeddingRequest) -> EmbeddingResponse:
+    """
+        Embeds a batch of distinct texts in one provider call.
+        Clients dedupe keywords first and fan the vectors back out themselves.
+    """
+    try:
+        selected_model = EmbeddingModel(model)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Selected embedding model does not exist!")
+
+    if not request.texts:
+        raise HTTPException(status_code=400, detail="No texts provided!")
+
+    match selected_model:
+        case EmbeddingModel.TEXT_LARGE3 | EmbeddingModel.TEXT_SMALL3:
+            try:
+                embeddings = openAI_client.embeddings.create(
+                    model=selected_model.value,
+                    input=request.texts,
+                    dimensions=EMBEDDING_DIMENSIONS
+                )
+            except openai.RateLimitError as e:
+                raise HTTPException(status_code=429, detail=f"OpenAI: rate limited. {e}", headers=_retry_after(e.response))
+            except openai.BadRequestError as e:
+                raise HTTPException(status_code=413 if e.code == "context_length_exceeded" else 400, detail=f"OpenAI: {e}")
+            except openai.APIConnectionError as e:
+                raise HTTPException(status_code=503, detail=f"OpenAI: connection error. {e}")
+
+            if len(embeddings.data) != len(request.texts):
+                raise HTTPException(status_code=500, detail="Mismatch between texts and embedding array response lengths.")
+
+            # The API may return items out of order, each carries its input index.
+            ordered = sorted(embeddings.data, key=lambda item: item.index)
+            return EmbeddingResponse(model=selected_model.value, embeddings=[item.embedding for item in ordered])
+
+        case EmbeddingModel.VOYAGE_LARGE2 | EmbeddingModel.VOYAGE_LITE2_INSTRUCT:
+            raise HTTPException(status_code=404, detail="Voyage embeddings not currently implimented!")
@@ -2,4 +2,11 @@ from pydantic import BaseModel
 
 class TokenLimitResponse(BaseModel):
     model: str
-    token_limit: int
\ No newline at end of file
+    token_limit: int
+
+class EmbeddingRequest(BaseModel):
+    texts: list[str]
+
+class EmbeddingResponse(BaseModel):
+    model: str
+    embeddings: list[list[float]] # In the same order as EmbeddingRequest.texts
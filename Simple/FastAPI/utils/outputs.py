@@ -0,0 +1,33 @@
+from Simple.src.types.API import LLMOutput
+from Simple.src.types.reviews import Review
+
+from loguru import logger
+
+
+def split_by_product(parsed_output: dict, reviews: list[Review]) -> list[LLMOutput]:
+    """
+        Splits a parsed model response back into one LLMOutput per product in the chunk.
+
+        Every keyword is attributed through the review_id it was extracted from, so chunks
+        packed with reviews from several products come back correctly attributed.
+        Every product of the chunk gets an LLMOutput, even if no keywords were found for it.
+    """
+    review_products: dict[str, str] = {review.review_id: review.product_id for review in reviews}
+    # dict keeps the chunk's product order
+    keywords_by_product: dict[str, list[dict]] = {review.product_id: [] for review in reviews}
+    single_product: str | None = reviews[0].product_id if len(keywords_by_product) == 1 else None
+
+    for kw in parsed_output.get("keywords", []):
+        kw["review_id"] = str(kw.get("review_id"))
+        product_id = review_products.get(kw["review_id"], single_product)
+        if product_id is None:
+            # Can't attribute a hallucinated review_id when the chunk spans products.
+            logger.warning(f"Dropping keyword with unknown review_id: {kw}")
+            continue
+        kw["product_id"] = product_id
+        keywords_by_product[product_id].append(kw)
+
+    return [
+        LLMOutput(product_id=product_id, keywords=keywords)
+        for product_id, keywords in keywords_by_product.items()
+    ]
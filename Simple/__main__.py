@@ -1,20 +1,31 @@
 import csv
 import os
 
-from Simple.src.types.models import ModelType, EmbeddingModel, MODEL_SYS_PROMPTS
+from Simple.src.types.models import ModelType, EmbeddingModel, RateLimit, ModelPrice, MODEL_SYS_PROMPTS, MODEL_RATE_LIMITS, MODEL_PRICES
+from Simple.src.types.budget import BudgetPolicy, ProductPriority
 from Simple.src.types.API import LLMOutput, Keyword, Cluster
+from Simple.src.types.chunking import ChunkStrategy
+from Simple.src.types.reviews import ReviewFilter, SamplingStrategy
+from Simple.src.types.watermark import RunMode, Watermark
 from Simple.src.utils.api_interface import APIInterface
 from Simple.src.utils.aggregator import Aggregator
+from Simple.src.utils.tokens import count_tokens
+from Simple.src.utils.token_cache import TOKEN_CACHE_PATH
+from Simple.src.utils.telemetry import get_telemetry
+from Simple.src.utils.budget import BudgetGovernor, prioritize
 from Simple.src.types.client.clientstate import ClientState, ReadOnlyClientState
 from Simple.data.parser_factory import ParserFactory
 from Simple.data.parsers import DataParser
+from Simple.data.watermarks import load_watermark, save_watermark
+from Simple.data.keyword_writer import KeywordWriter
+from Simple.data.journal import ExtractionJournal, find_journal, journal_path, new_header, roll_back_outputs
 
 from loguru import logger
 from pathlib import Path
 from collections import deque
 from datetime import datetime
 
-import tiktoken
+import random
 import json
 
 
@@ -57,6 +68,51 @@ class HearSayAPP:
                         val = EmbeddingModel[value]
                     except KeyError:
                         raise ValueError(f"Invalid Embedding Model: {value}")
+                case "chunk_strategy":
+                    try:
+                        val = ChunkStrategy[value]
+                    except KeyError:
+                        raise ValueError(f"Invalid Chunk Strategy: {value}")
+                case "review_filter":
+                    val = ReviewFilter(**value) if value else None
+                case "sampling":
+                    try:
+                        val = SamplingStrategy[value]
+                    except KeyError:
+                        raise ValueError(f"Invalid Sampling Strategy: {value}")
+                case "run_mode":
+                    try:
+                        val = RunMode[value]
+                    except KeyError:
+                        raise ValueError(f"Invalid Run Mode: {value}")
+                case "budget_policy":
+                    try:
+                        val = BudgetPolicy[value]
+                    except KeyError:
+                        raise ValueError(f"Invalid Budget Policy: {value}")
+                case "product_priority":
+                    try:
+                        val = ProductPriority[value]
+                    except KeyError:
+                        raise ValueError(f"Invalid Product Priority: {value}")
+                case "model_prices":
+                    # Per-model overrides of the default list prices
+                    val = dict(MODEL_PRICES)
+                    for model_name, price in (value or {}).items():
+                        try:
+                            val[ModelType[model_name]] = ModelPrice(**price)
+                        except KeyError:
+                            raise ValueError(f"Invalid Model Type in model_prices: {model_name}")
+                case "prometheus_textfile":
+                    val = Path(value) if value else None
+                case "rate_limits":
+                    # Per-model overrides of the default provider limits
+                    val = dict(MODEL_RATE_LIMITS)
+                    for model_name, limit in (value or {}).items():
+                        try:
+                            val[ModelType[model_name]] = RateLimit(**limit)
+                        except KeyError:
+                            raise ValueError(f"Invalid Model Type in rate_limits: {model_name}")
                 case _:
                     val = value
 
@@ -340,37 +396,156 @@ class HearSayAPP:
         if not self.global_state.data_source:
             self.DataSourceSelection()
 
+        output_dir = Path(__file__).parent / "data" / "output"
+        get_telemetry().reset()
+        journal: ExtractionJournal | None = None
+        if self.global_state.run_mode is RunMode.RESUME:
+            path = find_journal(output_dir, self.global_state.data_source)
+            if path is None:
+                logger.warning("No interrupted extraction found for this data source, running a full extraction.")
+            else:
+                journal = ExtractionJournal.load(path)
+
+        watermark: Watermark | None = None
+        if self.global_state.run_mode is RunMode.INCREMENTAL or (journal is not None and journal.header.merge):
+            watermark = load_watermark(self.global_state.data_source)
+            if watermark is None or not (output_dir / f"{watermark.keyword_file}_keywords.csv").exists():
+                logger.warning("No previous extraction found for this data source, running a full extraction.")
+                watermark = None
+            else:
+                logger.info(f"Incremental run: skipping {len(watermark.review_ids)} reviews already in {watermark.keyword_file}_keywords.csv")
+
+        # Samples are drawn with a seed the journal keeps, so a resumed run draws the same reviews (and chunks) again
+        if journal is not None and journal.header.sampling_seed is not None:
+            sampling_seed = journal.header.sampling_seed
+        else:
+            sampling_seed = random.randrange(2 ** 32)
+
         logger.info(f"🔍 Extracting Keywords and Sentiment from {self.global_state.data_source}...")
-        parser: DataParser = ParserFactory.get_parser(self.global_state.data_source, self.global_state.max_reviews)
+        parser: DataParser = ParserFactory.get_parser(
+            self.global_state.data_source,
+            self.global_state.max_reviews,
+            self.global_state.ingest_memory_mb,
+            self.global_state.review_filter,
+            self.global_state.columnar_store,
+            self.global_state.parallel_ingest,
+            self.global_state.sampling,
+            self.global_state.max_reviews_per_product,
+            watermark,
+            sampling_seed
+        )
         
         # Extract and chunk the data into usable format (Review... for now)
-        batch_size: int = self.API.get_token_limit()
-        enc = tiktoken.get_encoding('cl100k_base')
-        prompt_tokens: int = len(enc.encode(MODEL_SYS_PROMPTS[self.global_state.prompt]))
-        batch_size -= prompt_tokens
-        self.global_state.reviews = parser.get_batched_reviews(batch_size, prompt_tokens)
-        
-        # Call the API to extract the keywords / sentiment
-        llmOutput: deque[LLMOutput] = self.API.get_llmOutput(filter_product_id=None)
-        # In-Built setter converts the deque to a map of {prod_id: LLMOutput} 
-        self.global_state.llm_output = llmOutput
+        # The model's whole limit: the planner takes the prompt off itself, chunks hold token_limit - prompt_tokens review tokens.
+        token_limit: int = self.API.get_token_limit()
+        prompt_tokens: int = count_tokens([MODEL_SYS_PROMPTS[self.global_state.prompt]])[0]
+        self.global_state.reviews = parser.get_batched_reviews(
+            token_limit,
+            prompt_tokens,
+            self.global_state.chunk_strategy,
+            self.global_state.cross_product_packing,
+            self.global_state.dedup_threshold,
+            TOKEN_CACHE_PATH if self.global_state.token_cache else None
+        )
+        self.global_state.duplicates = parser.duplicates
+        if not self.global_state.reviews:
+            print("✅ No new reviews to extract.")
+            return
 
-        # Save the Keyword / Sentiment results to a CSV
-        print("="*50)
-        print("Enter a filename to save to. (Enter to skip and generate automated name)")
-        print("="*50)
-        choice = input("FileName: ")
-        data_type, data_name = self.global_state.data_source.parts[-2:]
+        # Spend the month's budget on the highest priority products first, the chunks that don't fit are deferred.
+        governor = BudgetGovernor(
+            self.global_state.model_prices[self.global_state.model],
+            prompt_tokens,
+            self.global_state.budget_usd,
+            self.global_state.budget_tokens,
+            self.global_state.budget_policy
+        )
+        reviews = prioritize(self.global_state.reviews, self.global_state.product_priority)
+        if journal is not None:
+            # Chunks the interrupted run already extracted cost nothing now
+            reviews = {
+                prod_id: pending for prod_id, chunks in reviews.items()
+                if (pending := deque(chunk for chunk in chunks if self.API.chunk_key(list(chunk)) not in journal.done))
+            }
+        self.global_state.reviews = governor.plan(reviews)
+        if not self.global_state.reviews and journal is None:
+            print("⚠️  This month's extraction budget is spent, nothing was extracted.")
+            return
 
-        if choice.lower() in ("n", "no", ""):
-            choice = f"{data_type}-{data_name}-{int(datetime.now().timestamp())}"
-        
+        # Keywords are written as they are extracted, so the file name is needed up front.
+        if journal is not None:
+            choice = journal.header.keyword_file
+        elif watermark is not None:
+            # Incremental runs merge into the file the watermark was saved with.
+            choice = watermark.keyword_file
+        else:
+            print("="*50)
+            print("Enter a filename to save to. (Enter to skip and generate automated name)")
+            print("="*50)
+            choice = input("FileName: ")
+            data_type, data_name = self.global_state.data_source.parts[-2:]
+
+            if choice.lower() in ("n", "no", ""):
+                choice = f"{data_type}-{data_name}-{int(datetime.now().timestamp())}"
+
+        try:
+            if journal is not None:
+                # The CSVs go back to how they were before the interrupted run, then get its journaled chunks.
+                roll_back_outputs(output_dir, journal.header)
+                writer = KeywordWriter(output_dir, choice, merge=journal.header.merge)
+                writer.write(journal.outputs)
+            else:
+                journal = ExtractionJournal.create(
+                    journal_path(output_dir, choice),
+                    new_header(output_dir, self.global_state.data_source, choice, merge=watermark is not None, sampling_seed=sampling_seed)
+                )
+                writer = KeywordWriter(output_dir, choice, merge=watermark is not None)
+        except OSError as e:
+            logger.error(f"Could not open the keyword files for writing: {e}")
+            return
+
+        # Only this run's keywords are held in memory; an incremental run reloads the full file once they're saved.
+        self.global_state.llm_output = {}
+        self.global_state.llm_output = deque(journal.outputs)
         # append _keywords to the filename
-        self.global_state.keyword_source = Path(__file__).parent / "data" / "output" / f"{choice}_keywords.csv" 
-        if self._save_keywords(file_name=choice):
-            self.global_state.keyword_source = None
-            logger.warning("Could not save keywords to a file.")            
-        logger.info(f"✅ Saved output to {choice}.csv")
+        self.global_state.keyword_source = writer.keyword_path
+        try:
+            with writer:
+                # Call the API to extract, embed and save the keywords / sentiment
+                llmOutput: deque[LLMOutput] = self.API.get_llmOutput(filter_product_id=None, writer=writer, journal=journal, governor=governor)
+        except KeyboardInterrupt:
+            journal.close()
+            self._save_telemetry(choice)
+            logger.warning(f"Extraction interrupted. Everything up to now is journaled in {journal.path}, set run_mode to RESUME to finish it.")
+            return
+        finally:
+            # Whatever stopped the run, what it spent counts against the month
+            governor.close()
+        # In-Built setter converts the deque to a map of {prod_id: LLMOutput} 
+        self.global_state.llm_output = llmOutput
+        logger.info(f"✅ Saved output to {choice}_keywords.csv")
+
+        if self.API.dead_letters:
+            self._save_dead_letters(file_name=choice)
+
+        # Only advance the watermark once the keywords are safely on disk. Failed and deferred reviews stay unseen for the next run.
+        if governor.deferred_ids:
+            logger.warning(f"{governor.report.deferred_reviews} reviews were deferred to stay within budget, the next run picks them up")
+        for review_id in [dead.review_id for dead in self.API.dead_letters] + list(governor.deferred_ids):
+            parser.processed.review_ids.discard(review_id)
+            parser.processed.review_ids.difference_update(self.global_state.duplicates.get(review_id, ()))
+        # The interrupted run's journaled reviews are in the CSV too, whether or not this run parsed them again
+        parser.processed.review_ids.update(kw.review_id for output in journal.outputs for kw in output.keywords)
+        parser.processed.keyword_file = choice
+        save_watermark(
+            self.global_state.data_source,
+            watermark.merged(parser.processed) if watermark is not None else parser.processed
+        )
+        journal.discard()
+        self._save_telemetry(choice)
+        if watermark is not None:
+            self.global_state.product_source = output_dir / f"{choice}_products.csv"
+            self._load_keywords()
 
     def Aggregate(self):
         # If LLMOutput isn't loaded, request an input Keywords file
@@ -382,8 +557,10 @@ class HearSayAPP:
         aggregator = Aggregator(
             global_state = ReadOnlyClientState(self.global_state),
             ) 
+        get_telemetry().reset()
         saved_agg_path, clusters = aggregator.aggregate()
         self.global_state.aggregate_source = saved_agg_path
+        self._save_telemetry(saved_agg_path.stem)
         
         
     def DisplayResults(self):
@@ -408,43 +585,34 @@ class HearSayAPP:
         # train_model_function(self.model, self.data_source)
         logger.info("✅ Training Completed!")
     
-    def _save_keywords(self, file_name: str) -> int:
-        """
-        Function to save LLMOutput to Keyword and Product CSVs
-        :param file_name (str): 
-        """
-        output_dir = Path(__file__).parent / "data" / "output"
-        output_dir.mkdir(parents=True, exist_ok=True)
-
-        keyword_path = output_dir / f"{file_name}_keywords.csv"
-        product_path = output_dir / f"{file_name}_products.csv"
-        
+    def _save_telemetry(self, file_name: str) -> None:
+        """Writes the run's per-stage telemetry next to its output, and to the Prometheus textfile if one is configured."""
+        telemetry = get_telemetry()
+        summary_path = Path(__file__).parent / "data" / "output" / f"{file_name}_telemetry.json"
         try:
+            telemetry.write_summary(summary_path)
+            if self.global_state.prometheus_textfile:
+                telemetry.write_prometheus(self.global_state.prometheus_textfile)
+        except OSError as e:
+            logger.error(f"Could not save the run's telemetry: {e}")
+            return
+        stages = ", ".join(f"{name} {stats.seconds:.1f}s" for name, stats in telemetry.stages.items())
+        logger.info(f"📈 Run telemetry ({stages}) saved to {summary_path}")
 
-            # Save keywords CSV
-            with keyword_path.open('w', newline='', encoding='utf-8') as kf:
-                kw_writer = csv.DictWriter(kf, fieldnames=["product_id", "review_id", "keyword", "sentiment", "embedding"])
-                kw_writer.writeheader()
-                for output in self.global_state.llm_output.values():
-                    for kw in output.keywords:
-                        kw_writer.writerow(kw.model_dump())
-
-            # Save products CSV (excluding keywords)
-            with product_path.open('w', newline='', encoding='utf-8') as pf:
-                prod_writer = csv.DictWriter(pf, fieldnames=["product_id"])
-                prod_writer.writeheader()
-                for output in self.global_state.llm_output.values():
-                    prod_writer.writerow({
-                        "product_id": output.product_id
-                    })
-        except PermissionError:
-            logger.error("Could not save output. Permission denied.")
-            return 1
+    def _save_dead_letters(self, file_name: str) -> None:
+        """Saves the reviews extraction gave up on next to the keyword CSV, so none are lost silently."""
+        dead_letter_path = Path(__file__).parent / "data" / "output" / f"{file_name}_dead_letters.csv"
+        try:
+            with dead_letter_path.open('w', newline='', encoding='utf-8') as df:
+                writer = csv.DictWriter(df, fieldnames=["review_id", "product_id", "error"])
+                writer.writeheader()
+                for dead in self.API.dead_letters:
+                    writer.writerow(dead.model_dump())
         except OSError as e:
-            logger.error(f"Good luck. OS Error: {e}")
-            return 1
-        return 0
-    
+            logger.error(f"Could not save the dead-letter list: {e}")
+            return
+        logger.warning(f"⚠️ {len(self.API.dead_letters)} reviews could not be extracted. Saved to {dead_letter_path}")
+
     def _load_keywords(self) -> None:
         """
             Load parsed Keyword and Product data from CSV files into ClientState.llm_output
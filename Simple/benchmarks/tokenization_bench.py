@@ -0,0 +1,68 @@
+"""
+    Tokenization throughput benchmark.
+
+    Compares the old per-review path (tiktoken.get_encoding + encode on every Review.token_count call)
+    against the batched tokenization stage.
+
+    Usage: python -m Simple.benchmarks.tokenization_bench [num_reviews]
+"""
+from Simple.src.types.reviews import Review
+from Simple.src.utils.tokens import tokenize_reviews, DEFAULT_ENCODING
+
+import random
+import time
+import sys
+
+import tiktoken
+
+WORDS: list[str] = [
+    "taste", "price", "great", "salty", "sweet", "coffee", "bag", "stale", "delivery", "dog",
+    "loves", "terrible", "fresh", "flavor", "would", "buy", "again", "not", "worth", "it"
+]
+PRODUCT_SIZE: int = 50
+
+
+def make_reviews(n: int) -> list[Review]:
+    rng = random.Random(0)
+    return [
+        Review(
+            review_id=str(i),
+            product_id=f"B{i // PRODUCT_SIZE:08d}",
+            rating=rng.randint(1, 5),
+            summary="summary",
+            text=" ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 160))),
+            date=1300000000 + i
+        )
+        for i in range(n)
+    ]
+
+
+def per_review(reviews: list[Review]) -> int:
+    """The baseline: one get_encoding + encode per review."""
+    total = 0
+    for review in reviews:
+        enc = tiktoken.get_encoding(DEFAULT_ENCODING)
+        total += len(enc.encode(review.text))
+    return total
+
+
+def batched(reviews: list[Review]) -> int:
+    """Tokenization stage applied one product at a time, as get_batched_reviews does."""
+    for start in range(0, len(reviews), PRODUCT_SIZE):
+        tokenize_reviews(reviews[start:start + PRODUCT_SIZE])
+    return sum(review.token_count() for review in reviews)
+
+
+def main(n: int) -> None:
+    reviews = make_reviews(n)
+    tiktoken.get_encoding(DEFAULT_ENCODING) # Warm the encoder so loading isn't measured
+
+    for name, fn in (("per-review", per_review), ("batched", batched)):
+        start = time.perf_counter()
+        total_tokens = fn(reviews)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>10}: {n / elapsed:>12,.0f} reviews/sec ({elapsed:.2f}s, {total_tokens:,} tokens)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
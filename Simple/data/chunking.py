@@ -0,0 +1,303 @@
+from Simple.src.types.reviews import ReviewRecord
+from Simple.src.types.chunking import ChunkStrategy, ChunkPlanReport
+
+from multiprocessing import shared_memory, resource_tracker
+from multiprocessing.pool import Pool
+from collections import deque
+from typing import Sequence
+import bisect
+from loguru import logger
+
+import multiprocessing
+import numpy as np
+
+# Products are planned in windows of roughly this many reviews, each window gets its own shared block.
+WINDOW_REVIEWS: int = 250_000
+# Windows smaller than this are planned in-process, spawning workers would cost more than the work.
+PARALLEL_THRESHOLD: int = 20_000
+# Cross-product packing: products filling at most this fraction of a single chunk are packed together.
+SMALL_PRODUCT_FILL: float = 0.5
+# Keys of packed multi-product chunk groups in the batched reviews map start with this.
+PACKED_KEY_PREFIX: str = "packed:"
+
+
+def greedy_ranges(counts: Sequence[int], token_limit: int, prompt_tokens: int) -> list[tuple[int, int]]:
+    """
+        Splits one product's reviews into [start, end) index ranges in input order.
+        A new chunk starts as soon as the next review doesn't fit in the current one.
+    """
+    ranges: list[tuple[int, int]] = []
+    start: int = 0
+    current_chunk_size: int = 0
+
+    for idx, review_token_count in enumerate(counts):
+        # Start a new chunk if needed
+        if idx > start and current_chunk_size + review_token_count + prompt_tokens > token_limit:
+            ranges.append((start, idx))
+            start = idx
+            current_chunk_size = 0
+        current_chunk_size += review_token_count
+
+    if start < len(counts):
+        ranges.append((start, len(counts)))
+    return ranges
+
+
+def first_fit_decreasing(counts: Sequence[int], capacity: int) -> list[list[int]]:
+    """Places reviews largest first into the first chunk with room. Reviews larger than capacity get their own chunk."""
+    bins: list[list[int]] = []
+    remaining: list[int] = []
+
+    for idx in sorted(range(len(counts)), key=lambda i: -counts[i]):
+        count = counts[idx]
+        for b, room in enumerate(remaining):
+            if count <= room:
+                bins[b].append(idx)
+                remaining[b] -= count
+                break
+        else:
+            bins.append([idx])
+            remaining.append(capacity - count)
+    return bins
+
+
+def best_fit_decreasing(counts: Sequence[int], capacity: int) -> list[list[int]]:
+    """Places reviews largest first into the chunk with the least room left that still fits them."""
+    bins: list[list[int]] = []
+    # Sorted (room, bin) pairs, the tightest fit is the first entry with room >= count.
+    rooms: list[tuple[int, int]] = []
+
+    for idx in sorted(range(len(counts)), key=lambda i: -counts[i]):
+        count = counts[idx]
+        pos = bisect.bisect_left(rooms, (count, -1))
+        if pos < len(rooms):
+            room, b = rooms.pop(pos)
+        else:
+            room, b = capacity, len(bins)
+            bins.append([])
+        bins[b].append(idx)
+        if room - count > 0:
+            bisect.insort(rooms, (room - count, b))
+    return bins
+
+
+def plan_chunks(counts: Sequence[int], token_limit: int, prompt_tokens: int, strategy: ChunkStrategy) -> list[list[int]]:
+    """
+        Plans one product's chunks as lists of review indices, each list in input order.
+        Uses the same budget as greedy_ranges: a chunk holds at most token_limit - prompt_tokens review tokens.
+    """
+    match strategy:
+        case ChunkStrategy.GREEDY:
+            return [list(range(start, end)) for start, end in greedy_ranges(counts, token_limit, prompt_tokens)]
+        case ChunkStrategy.FIRST_FIT_DECREASING:
+            bins = first_fit_decreasing(counts, token_limit - prompt_tokens)
+        case ChunkStrategy.BEST_FIT_DECREASING:
+            bins = best_fit_decreasing(counts, token_limit - prompt_tokens)
+        case _:
+            raise ValueError(f"Unknown chunk strategy: {strategy}")
+
+    # Keep reviews (and chunks) in input order so the model sees them as they were written.
+    for b in bins:
+        b.sort()
+    bins.sort(key=lambda b: b[0])
+    return bins
+
+
+def _plan_product(counts: list[int], token_limit: int, prompt_tokens: int, strategy: ChunkStrategy) -> tuple[list[list[int]], int]:
+    """Plans a product and also returns how many chunks greedy would have needed, for the report."""
+    chunks = plan_chunks(counts, token_limit, prompt_tokens, strategy)
+    if strategy is ChunkStrategy.GREEDY:
+        return chunks, len(chunks)
+    return chunks, len(greedy_ranges(counts, token_limit, prompt_tokens))
+
+
+def _plan_window_slice(
+        shm_name: str,
+        num_products: int,
+        num_reviews: int,
+        lo: int,
+        hi: int,
+        token_limit: int,
+        prompt_tokens: int,
+        strategy: ChunkStrategy
+    ) -> list[tuple[list[list[int]], int]]:
+    """
+        Worker function. Plans products [lo, hi) of a window straight from the shared token arrays.
+        Only review indices (relative to each product's first review) are sent back.
+    """
+    # Pool workers share the parent's resource tracker, so attaching here doesn't take ownership.
+    # The parent unlinks the block once the window is planned.
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        offsets, counts = _window_arrays(shm, num_products, num_reviews)
+        bounds = offsets[lo:hi + 1].tolist()
+        slice_counts = counts[bounds[0]:bounds[-1]].tolist()
+        del offsets, counts # Release the buffer views, close() fails while they're alive
+    finally:
+        shm.close()
+
+    base = bounds[0]
+    return [
+        _plan_product(slice_counts[bounds[p] - base:bounds[p + 1] - base], token_limit, prompt_tokens, strategy)
+        for p in range(hi - lo)
+    ]
+
+
+def _window_arrays(shm: shared_memory.SharedMemory, num_products: int, num_reviews: int) -> tuple[np.ndarray, np.ndarray]:
+    """Layout of a window block: int64 product offsets (num_products + 1) followed by int32 token counts."""
+    offsets = np.ndarray((num_products + 1,), dtype=np.int64, buffer=shm.buf)
+    counts = np.ndarray((num_reviews,), dtype=np.int32, buffer=shm.buf, offset=offsets.nbytes)
+    return offsets, counts
+
+
+def _fill_window(shm: shared_memory.SharedMemory, window: list[tuple[str, list[ReviewRecord]]], num_reviews: int) -> None:
+    """Writes a window's product offsets and token counts into its shared block."""
+    offsets, counts = _window_arrays(shm, len(window), num_reviews)
+    offsets[0] = 0
+    for p, (_, reviews) in enumerate(window):
+        offsets[p + 1] = offsets[p] + len(reviews)
+        counts[offsets[p]:offsets[p + 1]] = [review.token_count() for review in reviews]
+
+
+class ChunkEngine:
+    """
+        Parallel chunk planner over shared-memory token arrays.
+
+        The parent keeps every ReviewRecord; workers only ever see token counts and product offsets
+        through a shared memory block and return review indices. The parent then builds chunks
+        from its own review lists, so no ReviewRecord object is pickled in either direction.
+
+        Packing totals for the whole run are accumulated in ChunkEngine.report.
+
+        With cross_product set, long-tail products (a single chunk at most SMALL_PRODUCT_FILL full)
+        are packed whole into shared chunks instead of each paying for its own request. Those chunks
+        are returned under a PACKED_KEY_PREFIX key, every review still carries its own product_id.
+
+        Usage:
+        ```
+        with ChunkEngine(token_limit, prompt_tokens, ChunkStrategy.BEST_FIT_DECREASING) as engine:
+            for prod_id, reviews in products:
+                for prod_id, chunks in engine.add(prod_id, reviews):
+                    ...
+            for prod_id, chunks in engine.flush():
+                ...
+        ```
+    """
+    def __init__(self,
+        token_limit: int,
+        prompt_tokens: int,
+        strategy: ChunkStrategy = ChunkStrategy.GREEDY,
+        cross_product: bool = False,
+        processes: int | None = None
+        ):
+        self.token_limit: int = token_limit
+        self.prompt_tokens: int = prompt_tokens
+        self.strategy: ChunkStrategy = strategy
+        self.cross_product: bool = cross_product
+        self.report: ChunkPlanReport = ChunkPlanReport(
+            strategy=strategy,
+            chunk_capacity=token_limit - prompt_tokens,
+            prompt_tokens=prompt_tokens
+        )
+        self.processes: int = processes or min(8, multiprocessing.cpu_count()) # Maximum of 8 processes (Excessive process spawn can overload system)
+        self._pool: Pool | None = None
+        self._window: list[tuple[str, list[ReviewRecord]]] = []
+        self._window_reviews: int = 0
+        self._packed_groups: int = 0
+
+    def __enter__(self) -> "ChunkEngine":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def add(self, prod_id: str, reviews: list[ReviewRecord]) -> list[tuple[str, deque[deque[ReviewRecord]]]]:
+        """Queues a tokenized product. Returns the chunked products of the window once it's full."""
+        self._window.append((prod_id, reviews))
+        self._window_reviews += len(reviews)
+        if self._window_reviews >= WINDOW_REVIEWS:
+            return self.flush()
+        return []
+
+    def flush(self) -> list[tuple[str, deque[deque[ReviewRecord]]]]:
+        """Plans every queued product and builds its chunks."""
+        window, self._window, self._window_reviews = self._window, [], 0
+        if not window:
+            return []
+
+        plans = self._plan(window)
+        small_limit: int = int(self.report.chunk_capacity * SMALL_PRODUCT_FILL)
+        output: list[tuple[str, deque[deque[ReviewRecord]]]] = []
+        long_tail: list[tuple[list[ReviewRecord], int]] = []
+
+        for (prod_id, reviews), (chunk_indices, greedy_chunks) in zip(window, plans):
+            tokens = sum(review.token_count() for review in reviews)
+            self.report.products += 1
+            self.report.reviews += len(reviews)
+            self.report.review_tokens += tokens
+            self.report.greedy_chunks += greedy_chunks
+
+            if self.cross_product and len(chunk_indices) == 1 and tokens <= small_limit:
+                long_tail.append((reviews, tokens))
+                continue
+            output.append((prod_id, deque(deque(reviews[i] for i in indices) for indices in chunk_indices)))
+            self.report.chunks += len(chunk_indices)
+
+        if long_tail:
+            output.append(self._pack_long_tail(long_tail))
+        return output
+
+    def _pack_long_tail(self, long_tail: list[tuple[list[ReviewRecord], int]]) -> tuple[str, deque[deque[ReviewRecord]]]:
+        """Packs whole small products into shared chunks with the run's strategy."""
+        # Each product is a single item, so a product's reviews always travel together.
+        product_chunks = plan_chunks([tokens for _, tokens in long_tail], self.token_limit, self.prompt_tokens, self.strategy)
+        chunks: deque[deque[ReviewRecord]] = deque(
+            deque(review for p in products for review in long_tail[p][0])
+            for products in product_chunks
+        )
+
+        key = f"{PACKED_KEY_PREFIX}{self._packed_groups}"
+        self._packed_groups += 1
+        self.report.chunks += len(chunks)
+        self.report.packed_products += len(long_tail)
+        logger.debug(f"Packed {len(long_tail)} long-tail products into {len(chunks)} chunks under {key}")
+        return key, chunks
+
+    def _plan(self, window: list[tuple[str, list[ReviewRecord]]]) -> list[tuple[list[list[int]], int]]:
+        num_reviews = sum(len(reviews) for _, reviews in window)
+
+        if self.processes == 1 or num_reviews < PARALLEL_THRESHOLD:
+            return [
+                _plan_product([review.token_count() for review in reviews], self.token_limit, self.prompt_tokens, self.strategy)
+                for _, reviews in window
+            ]
+
+        if self._pool is None:
+            # Start the tracker before forking so the workers inherit it instead of each starting their own.
+            resource_tracker.ensure_running()
+            self._pool = multiprocessing.Pool(processes=self.processes)
+
+        num_products = len(window)
+        size = (num_products + 1) * np.dtype(np.int64).itemsize + num_reviews * np.dtype(np.int32).itemsize
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        try:
+            _fill_window(shm, window, num_reviews)
+
+            # A few slices per worker keeps them busy when product sizes are skewed.
+            step = max(1, -(-num_products // (self.processes * 4)))
+            tasks = [
+                (shm.name, num_products, num_reviews, lo, min(lo + step, num_products), self.token_limit, self.prompt_tokens, self.strategy)
+                for lo in range(0, num_products, step)
+            ]
+            logger.debug(f"Planning {num_products} products ({num_reviews} reviews) across {len(tasks)} shared-memory tasks")
+
+            plans: list[tuple[list[list[int]], int]] = []
+            for part in self._pool.starmap(_plan_window_slice, tasks):
+                plans.extend(part)
+            return plans
+        finally:
+            shm.close()
+            shm.unlink()
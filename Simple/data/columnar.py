@@ -0,0 +1,156 @@
+from Simple.src.types.reviews import ReviewFilter
+from .grouping import group_by_key
+
+from loguru import logger
+from pathlib import Path
+from operator import itemgetter
+from typing import Iterator
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import json
+
+COLUMNAR_DIR: str = ".columnar"
+MANIFEST: str = "manifest.json"
+ROW_GROUP_SIZE: int = 64 * 1024 # The file is sorted, so row groups cover disjoint ProductId ranges for pushdown
+ROW_OVERHEAD_BYTES: int = 256 # Estimated in-memory cost of a row on top of its strings
+READ_BLOCK_BYTES: int = 8 * 1024 * 1024 # CSV bytes parsed per batch while converting
+SCAN_BATCH_SIZE: int = 16 * 1024
+
+
+class ColumnarStore:
+    """
+        One-time columnar (Parquet) copy of a CSV data source.
+
+        Every CSV under the data source is streamed into a Parquet file sorted by the sort column, and stored
+        under `<data_source>/.columnar/`. Rows are sorted within memory_budget by spilling sorted runs to disk
+        and merging them (see grouping.group_by_key), and all rows of a sort key land in the same row group.
+        A manifest of the source files' sizes and mtimes is kept next to them, so the store is rebuilt
+        automatically when the CSVs change.
+
+        Scans read only the requested columns, and filters are pushed down into the Parquet reader,
+        so row groups whose statistics can't match are never decoded.
+    """
+    def __init__(self, data_source: Path, column_types: dict[str, str], sort_by: str, memory_budget: int = 512 * 1024 * 1024):
+        self.data_source: Path = data_source
+        self.column_types: dict[str, pa.DataType] = {column: pa.type_for_alias(alias) for column, alias in column_types.items()}
+        self.sort_by: str = sort_by
+        self.memory_budget: int = memory_budget # Bytes of rows buffered while sorting before spilling a run
+        self.store_dir: Path = data_source / COLUMNAR_DIR
+
+    def _sources(self) -> list[Path]:
+        return sorted(file for file in self.data_source.rglob("*.csv") if COLUMNAR_DIR not in file.parts)
+
+    def _fingerprint(self) -> dict[str, list[int]]:
+        return {
+            str(file.relative_to(self.data_source)): [file.stat().st_size, file.stat().st_mtime_ns]
+            for file in self._sources()
+        }
+
+    def _parquet_path(self, relative_csv: str) -> Path:
+        return self.store_dir / Path(relative_csv).with_suffix(".parquet")
+
+    def is_fresh(self) -> bool:
+        """True if the store exists and was built from the current CSVs with the current columns."""
+        manifest_path = self.store_dir / MANIFEST
+        if not manifest_path.exists():
+            return False
+        try:
+            manifest = json.loads(manifest_path.read_text())
+        except json.JSONDecodeError:
+            return False
+        return (
+            manifest.get("sources") == self._fingerprint()
+            and manifest.get("columns") == list(self.column_types)
+            and manifest.get("sort_by") == self.sort_by
+        )
+
+    def build(self) -> None:
+        """Converts every CSV of the data source into a Parquet file sorted by the sort column, in streamed batches."""
+        fingerprint = self._fingerprint()
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+        for relative_csv in fingerprint:
+            source = self.data_source / relative_csv
+            target = self._parquet_path(relative_csv)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            logger.info(f"Converting {source} to columnar store {target}")
+
+            reader = pa_csv.open_csv(
+                source,
+                read_options=pa_csv.ReadOptions(block_size=READ_BLOCK_BYTES),
+                parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+                convert_options=pa_csv.ConvertOptions(
+                    include_columns=list(self.column_types),
+                    column_types=self.column_types
+                )
+            )
+            rows = (row for batch in reader for row in batch.to_pylist())
+            with pq.ParquetWriter(target, reader.schema) as writer:
+                group: list[dict] = []
+                for _, key_rows in group_by_key(rows, itemgetter(self.sort_by), _row_size, self.memory_budget, ordered=True):
+                    group.extend(key_rows)
+                    if len(group) >= ROW_GROUP_SIZE:
+                        self._write_group(writer, group)
+                        group = []
+                if group:
+                    self._write_group(writer, group)
+
+        # Written last: a crash mid-build leaves the store stale instead of half-valid.
+        (self.store_dir / MANIFEST).write_text(json.dumps({
+            "sources": fingerprint,
+            "columns": list(self.column_types),
+            "sort_by": self.sort_by
+        }))
+
+    def _write_group(self, writer: pq.ParquetWriter, rows: list[dict]) -> None:
+        writer.write_table(pa.Table.from_pylist(rows, schema=writer.schema), row_group_size=len(rows))
+
+    def ensure(self) -> None:
+        if not self.is_fresh():
+            self.build()
+
+    def scan(self, columns: list[str], expression: pc.Expression | None = None) -> Iterator[pa.RecordBatch]:
+        """Streams record batches of only the given columns, filtered inside the scan."""
+        files = [str(self._parquet_path(relative_csv)) for relative_csv in self._fingerprint()]
+        if not files:
+            return
+        dataset = ds.dataset(files, format="parquet")
+        yield from dataset.to_batches(columns=columns, filter=expression, batch_size=SCAN_BATCH_SIZE)
+
+
+def _row_size(row: dict) -> int:
+    return sum(len(value) for value in row.values() if isinstance(value, str)) + ROW_OVERHEAD_BYTES
+
+
+def filter_expression(
+        review_filter: ReviewFilter | None,
+        product_column: str,
+        rating_column: str,
+        time_column: str
+    ) -> pc.Expression | None:
+    """Translates a ReviewFilter into a pushdown expression over the given column names."""
+    if review_filter is None:
+        return None
+
+    terms: list[pc.Expression] = []
+    if review_filter.product_ids is not None:
+        terms.append(pc.field(product_column).isin(sorted(review_filter.product_ids)))
+    if review_filter.min_rating is not None:
+        terms.append(pc.field(rating_column) >= review_filter.min_rating)
+    if review_filter.max_rating is not None:
+        terms.append(pc.field(rating_column) <= review_filter.max_rating)
+    if review_filter.start_time is not None:
+        terms.append(pc.field(time_column) >= review_filter.start_time)
+    if review_filter.end_time is not None:
+        terms.append(pc.field(time_column) <= review_filter.end_time)
+
+    if not terms:
+        return None
+    expression = terms[0]
+    for term in terms[1:]:
+        expression = expression & term
+    return expression
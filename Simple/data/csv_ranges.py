@@ -0,0 +1,146 @@
+from Simple.src.types.reviews import ReviewRecord, ReviewFilter
+
+from multiprocessing.pool import Pool
+from collections import deque
+from pathlib import Path
+from typing import Callable, Iterator
+from loguru import logger
+
+import multiprocessing
+import itertools
+import csv
+import io
+
+RANGE_BYTES: int = 16 * 1024 * 1024 # Target size of one parse task
+SCAN_BLOCK_BYTES: int = 8 * 1024 * 1024
+QUOTE: bytes = b'"'
+NEWLINE: bytes = b"\n"
+
+
+def record_aligned_ranges(path: Path, target_bytes: int | None = None) -> tuple[list[str], list[tuple[int, int]]]:
+    """
+        Splits a CSV into [start, end) byte ranges which each begin and end on a record boundary.
+
+        Quoted fields may contain newlines, so a newline only ends a record when it sits outside quotes.
+        Escaped quotes ("") flip the quote state twice, so tracking quote parity over the whole file is exact.
+        The scan only counts bytes in large blocks, which is far cheaper than parsing the rows.
+
+        :param target_bytes: Approximate size of a range, RANGE_BYTES by default.
+        :return: The header's field names and the byte ranges of the data rows.
+    """
+    target_bytes = target_bytes or RANGE_BYTES
+    size = path.stat().st_size
+    boundaries: list[int] = []
+    in_quotes: bool = False
+    next_split: int = 0 # First boundary wanted is the end of the header
+    offset: int = 0
+
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(SCAN_BLOCK_BYTES)
+            if not block:
+                break
+
+            pos = 0
+            while next_split < offset + len(block):
+                # Find the first record boundary at or after next_split inside this block.
+                search_from = max(next_split - offset, pos)
+                in_quotes ^= block.count(QUOTE, pos, search_from) % 2 == 1
+                pos = search_from
+                found = False
+                while True:
+                    nl = block.find(NEWLINE, pos)
+                    if nl == -1:
+                        break
+                    in_quotes ^= block.count(QUOTE, pos, nl) % 2 == 1
+                    pos = nl + 1
+                    if not in_quotes:
+                        found = True
+                        break
+                if not found:
+                    break
+                boundaries.append(offset + pos)
+                next_split = offset + pos + target_bytes
+
+            in_quotes ^= block.count(QUOTE, pos) % 2 == 1
+            offset += len(block)
+
+    if not boundaries:
+        return [], []
+
+    with open(path, "rb") as f:
+        header_line = f.read(boundaries[0]).decode("utf-8-sig")
+    fieldnames = next(csv.reader(io.StringIO(header_line)))
+
+    if boundaries[-1] < size:
+        boundaries.append(size)
+    return fieldnames, list(itertools.pairwise(boundaries))
+
+
+def _parse_range(
+        path: Path,
+        start: int,
+        end: int,
+        fieldnames: list[str],
+        limit: int,
+        row_to_review: Callable[[dict], ReviewRecord],
+        review_filter: ReviewFilter | None
+    ) -> list[ReviewRecord]:
+    """Worker function. Parses the rows of one byte range, stopping after `limit` matching reviews."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+
+    reviews: list[ReviewRecord] = []
+    for row in csv.DictReader(io.StringIO(text, newline=""), fieldnames=fieldnames):
+        if len(reviews) == limit:
+            break
+        review = row_to_review(row)
+        if review_filter and not review_filter.matches(review.product_id, review.rating, review.date):
+            continue
+        reviews.append(review)
+    return reviews
+
+
+def parallel_csv_reviews(
+        files: list[Path],
+        row_to_review: Callable[[dict], ReviewRecord],
+        max_reviews: int,
+        review_filter: ReviewFilter | None = None,
+        processes: int | None = None
+    ) -> Iterator[ReviewRecord]:
+    """
+        Parses CSV files in record-aligned byte ranges across a process pool.
+
+        Ranges are dispatched in file order with a bounded number in flight, and their results are
+        yielded back in that same order. max_reviews is therefore enforced exactly and globally,
+        yielding the same reviews a sequential read would.
+
+        :param row_to_review: Module or class level function mapping a csv row to a ReviewRecord (must be picklable).
+    """
+    processes = processes or min(8, multiprocessing.cpu_count())
+    tasks = (
+        (file, start, end, fieldnames)
+        for file in files
+        for fieldnames, ranges in [record_aligned_ranges(file)]
+        for start, end in ranges
+    )
+
+    count: int = 0
+    with Pool(processes=processes) as pool:
+        pending = deque()
+        while True:
+            # Keep a bounded number of ranges in flight, each capped by what's left of the global budget.
+            while len(pending) < processes * 2 and (task := next(tasks, None)):
+                file, start, end, fieldnames = task
+                pending.append(pool.apply_async(_parse_range, (file, start, end, fieldnames, max_reviews - count, row_to_review, review_filter)))
+            if not pending:
+                break
+
+            for review in pending.popleft().get():
+                yield review
+                count += 1
+                if count == max_reviews:
+                    return # Leaving the pool's context terminates the ranges still in flight
+
+    logger.debug(f"Parsed {count} reviews from {len(files)} files in parallel")
@@ -0,0 +1,95 @@
+from loguru import logger
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, TypeVar
+
+import tempfile
+import pickle
+import heapq
+
+T = TypeVar("T")
+
+
+def group_by_key(
+        items: Iterable[T],
+        key: Callable[[T], str],
+        sizeof: Callable[[T], int],
+        memory_budget: int,
+        ordered: bool = False
+    ) -> Iterator[tuple[str, list[T]]]:
+    """
+        Groups a (possibly huge) stream of items by key while holding at most ~memory_budget bytes.
+
+        If the whole stream fits in the budget the groups are yielded in first-seen order straight from memory
+        (in key order when ordered is set).
+        Otherwise the buffer is sorted and spilled to an on-disk run every time it fills up,
+        and the runs are k-way merged so each group is yielded exactly once in key order.
+
+        NOTE: A single group is always materialized in full, so one huge key can still exceed the budget.
+
+        :param items: Stream of items, consumed once.
+        :param key: Grouping key of an item (ex: ProductId).
+        :param sizeof: Estimated in-memory size of an item in bytes.
+        :param memory_budget: Maximum bytes to buffer before spilling to disk.
+        :param ordered: Always yield the groups in key order.
+    """
+    buffer: list[T] = []
+    buffer_size: int = 0
+
+    with tempfile.TemporaryDirectory(prefix="hearsay-runs-") as run_dir:
+        runs: list[Path] = []
+
+        for item in items:
+            buffer.append(item)
+            buffer_size += sizeof(item)
+            if buffer_size >= memory_budget:
+                runs.append(_spill_run(buffer, key, Path(run_dir) / f"run-{len(runs)}.pkl"))
+                buffer = []
+                buffer_size = 0
+
+        if not runs:
+            # Everything fit in memory, no need to touch the disk.
+            groups: dict[str, list[T]] = {}
+            for item in buffer:
+                groups.setdefault(key(item), []).append(item)
+            yield from (sorted(groups.items(), key=lambda group: group[0]) if ordered else groups.items())
+            return
+
+        if buffer:
+            runs.append(_spill_run(buffer, key, Path(run_dir) / f"run-{len(runs)}.pkl"))
+            buffer = []
+        logger.debug(f"Merging {len(runs)} sorted runs from {run_dir}")
+
+        # heapq.merge is stable, so items with equal keys keep their input order across runs.
+        merged = heapq.merge(*(_read_run(run) for run in runs), key=lambda pair: pair[0])
+
+        current_key: str | None = None
+        current_group: list[T] = []
+        for item_key, item in merged:
+            if item_key != current_key and current_group:
+                yield current_key, current_group
+                current_group = []
+            current_key = item_key
+            current_group.append(item)
+
+        if current_group:
+            yield current_key, current_group
+
+
+def _spill_run(buffer: list[T], key: Callable[[T], str], path: Path) -> Path:
+    """Sorts the buffer by key (stable) and writes it as a stream of pickled (key, item) pairs."""
+    buffer.sort(key=key)
+    with path.open("wb") as run_file:
+        for item in buffer:
+            pickle.dump((key(item), item), run_file, protocol=pickle.HIGHEST_PROTOCOL)
+    logger.debug(f"Spilled run of {len(buffer)} items to {path}")
+    return path
+
+
+def _read_run(path: Path) -> Iterator[tuple[str, T]]:
+    """Lazily reads back the (key, item) pairs of a spilled run."""
+    with path.open("rb") as run_file:
+        while True:
+            try:
+                yield pickle.load(run_file)
+            except EOFError:
+                return
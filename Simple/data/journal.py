@@ -0,0 +1,110 @@
+from Simple.src.types.journal import JournalHeader, JournalEntry
+from Simple.src.types.API import LLMOutput
+
+from pydantic import ValidationError
+from loguru import logger
+from pathlib import Path
+from typing import Iterable
+
+import os
+
+JOURNAL_SUFFIX: str = "_journal.jsonl"
+
+
+def journal_path(output_dir: Path, keyword_file: str) -> Path:
+    return output_dir / f"{keyword_file}{JOURNAL_SUFFIX}"
+
+
+def find_journal(output_dir: Path, data_source: Path) -> Path | None:
+    """The most recent unfinished journal of a data source, if any."""
+    candidates: list[tuple[float, Path]] = []
+    for path in output_dir.glob(f"*{JOURNAL_SUFFIX}"):
+        try:
+            with path.open(encoding="utf-8") as jf:
+                header = JournalHeader.model_validate_json(jf.readline())
+        except (OSError, ValidationError):
+            continue
+        if Path(header.data_source) == data_source:
+            candidates.append((path.stat().st_mtime, path))
+    return max(candidates)[1] if candidates else None
+
+
+def new_header(output_dir: Path, data_source: Path, keyword_file: str, merge: bool, sampling_seed: int | None = None) -> JournalHeader:
+    """Header of a run about to write <keyword_file>, recording the sizes its CSVs must be rolled back to."""
+    def size(path: Path) -> int:
+        return path.stat().st_size if merge and path.exists() else 0
+    return JournalHeader(
+        data_source=str(data_source),
+        keyword_file=keyword_file,
+        merge=merge,
+        keyword_bytes=size(output_dir / f"{keyword_file}_keywords.csv"),
+        product_bytes=size(output_dir / f"{keyword_file}_products.csv"),
+        sampling_seed=sampling_seed
+    )
+
+
+def roll_back_outputs(output_dir: Path, header: JournalHeader) -> None:
+    """Truncates the run's CSVs to their sizes when it started, dropping rows written after the last journaled chunk."""
+    for path, size in ((output_dir / f"{header.keyword_file}_keywords.csv", header.keyword_bytes),
+                       (output_dir / f"{header.keyword_file}_products.csv", header.product_bytes)):
+        if not size:
+            path.unlink(missing_ok=True)
+        elif path.exists():
+            os.truncate(path, size)
+
+
+class ExtractionJournal:
+    """
+        Append-only record of the chunks an extraction run has completed.
+
+        Every entry is flushed and fsynced before the next one is written, so after a crash or Ctrl-C the
+        journal holds every chunk that was saved. A torn last line (crash mid-write) is ignored on load.
+    """
+    def __init__(self, path: Path, header: JournalHeader, entries: list[JournalEntry] | None = None):
+        self.path: Path = path
+        self.header: JournalHeader = header
+        self.done: set[str] = {key for entry in entries or () for key in entry.chunks}
+        self.outputs: list[LLMOutput] = [output for entry in entries or () for output in entry.outputs]
+        self._file = path.open("a", encoding="utf-8")
+
+    @classmethod
+    def create(cls, path: Path, header: JournalHeader) -> "ExtractionJournal":
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(header.model_dump_json() + "\n", encoding="utf-8")
+        return cls(path, header)
+
+    @classmethod
+    def load(cls, path: Path) -> "ExtractionJournal":
+        entries: list[JournalEntry] = []
+        with path.open("rb") as jf:
+            header = JournalHeader.model_validate_json(jf.readline())
+            valid_bytes = jf.tell()
+            for line in iter(jf.readline, b""):
+                try:
+                    entries.append(JournalEntry.model_validate_json(line))
+                except ValidationError:
+                    logger.warning(f"Ignoring a torn entry at the end of {path}")
+                    break
+                valid_bytes = jf.tell()
+        # Drop the torn tail, so new entries don't end up glued to it
+        os.truncate(path, valid_bytes)
+        journal = cls(path, header, entries)
+        logger.info(f"Resuming from {path}: {len(journal.done)} chunks already extracted")
+        return journal
+
+    def append(self, chunks: Iterable[str], outputs: list[LLMOutput]) -> None:
+        entry = JournalEntry(chunks=list(chunks), outputs=outputs)
+        if not entry.chunks:
+            return
+        self._file.write(entry.model_dump_json() + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.done.update(entry.chunks)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def discard(self) -> None:
+        """Removes the journal once its run's results are safely saved."""
+        self.close()
+        self.path.unlink(missing_ok=True)
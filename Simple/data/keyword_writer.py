@@ -0,0 +1,60 @@
+from Simple.src.types.API import LLMOutput
+
+from pathlib import Path
+from typing import Iterable
+from loguru import logger
+
+import csv
+
+KEYWORD_FIELDS: list[str] = ["product_id", "review_id", "keyword", "sentiment", "embedding"]
+
+
+class KeywordWriter:
+    """
+        Streams LLMOutputs into the <name>_keywords.csv / <name>_products.csv pair as they are produced.
+
+        With merge=True rows are appended to existing files, and products already listed aren't repeated.
+        Every write is flushed, so whatever was written survives a crash later in the run.
+    """
+    def __init__(self, output_dir: Path, file_name: str, merge: bool = False):
+        output_dir.mkdir(parents=True, exist_ok=True)
+        self.keyword_path: Path = output_dir / f"{file_name}_keywords.csv"
+        self.product_path: Path = output_dir / f"{file_name}_products.csv"
+        merge = merge and self.keyword_path.exists()
+
+        self._products: set[str] = set()
+        if merge and self.product_path.exists():
+            with self.product_path.open(newline='', encoding='utf-8') as pf:
+                self._products = {row["product_id"] for row in csv.DictReader(pf)}
+
+        self._kf = self.keyword_path.open('a' if merge else 'w', newline='', encoding='utf-8')
+        self._pf = self.product_path.open('a' if self._products else 'w', newline='', encoding='utf-8')
+        self._kw_writer = csv.DictWriter(self._kf, fieldnames=KEYWORD_FIELDS)
+        self._prod_writer = csv.DictWriter(self._pf, fieldnames=["product_id"])
+        if not merge:
+            self._kw_writer.writeheader()
+        if not self._products:
+            self._prod_writer.writeheader()
+        self.keywords_written: int = 0
+
+    def __enter__(self) -> "KeywordWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def write(self, outputs: Iterable[LLMOutput]) -> None:
+        for output in outputs:
+            for kw in output.keywords:
+                self._kw_writer.writerow(kw.model_dump())
+            self.keywords_written += len(output.keywords)
+            if output.product_id not in self._products:
+                self._products.add(output.product_id)
+                self._prod_writer.writerow({"product_id": output.product_id})
+        self._kf.flush()
+        self._pf.flush()
+
+    def close(self) -> None:
+        self._kf.close()
+        self._pf.close()
+        logger.debug(f"Wrote {self.keywords_written} keywords to {self.keyword_path}")
@@ -1,4 +1,6 @@
 from .parsers import YelpParser, DataParser, AmazonParser
+from Simple.src.types.reviews import ReviewFilter, SamplingStrategy
+from Simple.src.types.watermark import Watermark
 from pathlib import Path
 import os
 
@@ -16,13 +18,24 @@ class ParserFactory:
         return cls._instance
 
     @staticmethod
-    def get_parser(file_path: Path, max_reviews: int) -> DataParser:
+    def get_parser(
+        file_path: Path,
+        max_reviews: int,
+        memory_budget_mb: int = 512,
+        review_filter: ReviewFilter | None = None,
+        use_columnar: bool = False,
+        parallel_ingest: bool = False,
+        sampling: SamplingStrategy = SamplingStrategy.HEAD,
+        max_per_product: int | None = None,
+        watermark: Watermark | None = None,
+        sampling_seed: int | None = None
+        ) -> DataParser:
         """Determines parser to use based off file path"""
 
         path_parts = {part.lower() for part in file_path.parts}
 
         for key in ParserFactory._parsers:
             if key in path_parts:
-                return ParserFactory._parsers[key](file_path, max_reviews)
+                return ParserFactory._parsers[key](file_path, max_reviews, memory_budget_mb, review_filter, use_columnar, parallel_ingest, sampling, max_per_product, watermark, sampling_seed)
 
         raise ValueError(f"No matching parser found for path: {file_path}")        
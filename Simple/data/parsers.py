@@ -1,128 +1,123 @@
-from Simple.src.types.reviews import Review
+from Simple.src.types.reviews import ReviewRecord, ReviewFilter, SamplingStrategy
 from Simple.src.types.models import MODEL_SYS_PROMPTS
+from Simple.src.types.chunking import ChunkStrategy, ChunkPlanReport
+from Simple.src.types.watermark import Watermark
+from Simple.src.utils.tokens import tokenize_reviews
+from Simple.src.utils.token_cache import TokenCountCache
+from Simple.src.utils.telemetry import get_telemetry
+from Simple.src.processing.dedup import deduplicate
+from .grouping import group_by_key
+from .sampling import stratified_sample
+from .chunking import ChunkEngine, plan_chunks
+from .csv_ranges import parallel_csv_reviews
 
 from abc import ABC, abstractmethod
 from loguru import logger
 from pathlib import Path
 from collections import deque
+from contextlib import nullcontext
+from typing import Iterable, Iterator
 from tqdm import tqdm
 
-import multiprocessing
-import tiktoken
+from datetime import datetime
+
+import itertools
+import hashlib
 import csv
+import sys
+
+# Rough per-review overhead (slotted record, rating, date, ids) used to estimate ingest memory usage.
+_REVIEW_OVERHEAD_BYTES: int = 256
 
 class DataParser(ABC):
     """ Abstract class for all data parsers
         Similar to virtual classes in c++
     """
-    def __init__(self, data_source: Path, max_reviews: int = 1000):
+    def __init__(self,
+        data_source: Path,
+        max_reviews: int = 1000,
+        memory_budget_mb: int = 512,
+        review_filter: ReviewFilter | None = None,
+        use_columnar: bool = False,
+        parallel_ingest: bool = False,
+        sampling: SamplingStrategy = SamplingStrategy.HEAD,
+        max_per_product: int | None = None,
+        watermark: Watermark | None = None,
+        sampling_seed: int | None = None
+        ):
         if not data_source:
             raise ValueError("No data source passed in")
         self.data_source: Path = data_source
         self.max_reviews: int = max_reviews
+        self.memory_budget: int = memory_budget_mb * 1024 * 1024
+        self.review_filter: ReviewFilter | None = review_filter
+        self.use_columnar: bool = use_columnar # Read through a one-time Parquet copy of the source
+        self.parallel_ingest: bool = parallel_ingest # Parse CSVs in record-aligned byte ranges across processes
+        self.sampling: SamplingStrategy = sampling
+        self.max_per_product: int | None = max_per_product # Only applies to stratified sampling
+        self.watermark: Watermark | None = watermark # Incremental runs: only reviews unseen by this watermark are read
+        self.sampling_seed: int | None = sampling_seed # Same seed, same stratified sample (resumed runs rely on it)
+        self.processed: Watermark = Watermark() # Reviews batched by get_batched_reviews, to advance the watermark with
+        self.plan_report: ChunkPlanReport | None = None # Set by get_batched_reviews
+        self.duplicates: dict[str, list[str]] = {} # Representative review_id -> near-duplicate review_ids, set by get_batched_reviews
 
     @abstractmethod
-    def _parse(self) -> list[Review]:
-        """Parses the data source and stores the reviews internally"""
+    def _parse(self) -> Iterator[ReviewRecord]:
+        """Lazily parses the data source, yielding one review at a time, at most self._read_limit of them"""
         pass
 
-    @abstractmethod
-    def _chunk_reviews(self,
-        prod_id: str,                   # Product ID
-        prod_reviews: list[Review],     # Reviews for this ID 
-        token_limit: int,               # Token limit
-        queue: multiprocessing.Queue,   # Queue to return output
-        line_number: int | None         # Line number to print output. If None, no output is printed
-        ) -> None:
-        """Worker script for chunking reviews according to token count."""
+    @property
+    def _read_limit(self) -> int:
+        """How many reviews _parse should read. Sampling and watermark filtering need to see the whole source."""
+        if self.sampling is SamplingStrategy.HEAD and self.watermark is None:
+            return self.max_reviews
+        return sys.maxsize
 
-    @abstractmethod
-    def get_batched_reviews(self, token_limit: int, prompt_tokens: int) -> dict[str, deque[deque[Review]]]:
-        """
-            Batches reviews according to token limit provided by API.
-        """
-        pass
-        
+    def _reviews(self) -> Iterable[ReviewRecord]:
+        reviews = self._parse()
+        if self.watermark is not None:
+            reviews = (review for review in reviews if self.watermark.is_unseen(review.review_id, review.date))
 
-class AmazonParser(DataParser):
-    def __init__(self, data_source: Path | None, max_reviews: int = 1000):
-        super().__init__(data_source, max_reviews)
-    
-    def _parse(self) -> list[Review]:
-        # Search every file (including those found in sub-directories) of this directory.
-        reviews: list[Review] = [] 
-        for file in self.data_source.rglob("*.csv"):
-            """
-                Open the file and parse the review.
-                NOTE: Each file within the selected datasource should be in the __SAME FORMAT__. Otherwise, your parser wont work!
-            """
+        if self.sampling is SamplingStrategy.HEAD:
+            return itertools.islice(reviews, self.max_reviews)
+        return stratified_sample(
+            reviews,
+            self.max_reviews,
+            stratum=lambda review: (review.product_id, round(review.rating)),
+            group=lambda review: review.product_id,
+            group_cap=self.max_per_product,
+            seed=self.sampling_seed
+        )
 
-            logger.debug(f"Opening data source: {file}")
-            with open(file=file, newline='', mode='r', encoding='utf-8') as csv_file:
-                reader = csv.DictReader(csv_file)
-                
-                count = 0
-                print("\nExtracting reviews....")
-                for row in reader:
-                    if count == self.max_reviews:
-                        print(f"\nComplete!\n")
-                        break
-                    review = Review(
-                        review_id=row.get("Id"),
-                        product_id=row.get("ProductId"),
-                        rating=row.get("Score"),
-                        summary=row.get("Summary"),
-                        text=row.get("Text"),
-                        date=row.get("Time")
-                    )
-                    #logger.debug(f"Constructed review object: {review}")
-                    reviews.append(review)
-                    count += 1
-                    # adhere to the maximum number of reviews for par
-                    #print(f"\rProgress: [{"=" * (count * 50 // self.max_reviews):<50}] {count / self.max_reviews:.2%}", end="")
-                
-        
-        if len(reviews) == 0:
-            logger.warning(f"No reviews found in file: {self.data_source}")
+    def iter_product_reviews(self) -> Iterator[tuple[str, list[ReviewRecord]]]:
+        """
+            Streams (product_id, reviews) groups from the data source.
 
-        return reviews
+            Reviews are buffered up to the parser's memory budget and spilled to sorted on-disk runs beyond that,
+            so peak memory stays flat no matter how large the input is.
+        """
+        return group_by_key(
+            self._reviews(),
+            key=lambda review: review.product_id,
+            sizeof=lambda review: len(review.text) + len(review.summary) + _REVIEW_OVERHEAD_BYTES,
+            memory_budget=self.memory_budget
+        )
 
-    def _chunk_reviews(self, 
-        prod_id: str, 
-        prod_reviews: deque[Review], 
+    def get_batched_reviews(self,
         token_limit: int,
-        prompt_tokens: int
-        ):
-        """Worker function to chunk reviews for a single product_id """
-
-        chunks: deque[deque[Review]] = deque()
-        current_chunk: deque[Review] = deque()
-        current_chunk_size: int = 0
-
-        for review in prod_reviews:
-            review_token_count = review.token_count()
-
-            # Start a new chunk if needed
-            if current_chunk_size + review_token_count + prompt_tokens  > token_limit:
-                chunks.append(current_chunk)
-                current_chunk = deque()
-                current_chunk_size = 0
-            
-            # Add review to the current chunk
-            current_chunk.append(review)
-            current_chunk_size += review_token_count
-           
-
-        # Append last chunk if remaining reviews
-        if current_chunk:        
-            chunks.append(current_chunk)
-        
-        return prod_id, chunks
-    
-    
-    def get_batched_reviews(self, token_limit: int, prompt_tokens: int) -> dict[str, deque[deque[Review]]]:
+        prompt_tokens: int,
+        strategy: ChunkStrategy = ChunkStrategy.GREEDY,
+        cross_product: bool = False,
+        dedup_threshold: float | None = None,
+        token_cache_path: Path | None = None
+        ) -> dict[str, deque[deque[ReviewRecord]]]:
         """
             Batches data according to selected model's token limit and product ID.
+            Shared by every parser, only _parse differs between data sources.
+            With cross_product, small products are packed together under "packed:<n>" keys.
+            With dedup_threshold, near-duplicate reviews of a product are only sent once, see self.duplicates.
+            With token_cache_path, token counts are read from / added to a persistent cache at that path.
+            The packing strategy is reported in self.plan_report once batching finishes.
 
             Ex: 
             {
@@ -130,25 +125,264 @@ class AmazonParser(DataParser):
                 "2": [ [{text: str, rating: int...}], [{text, str, rating: int...}] ]
             }
         """
-        # Sort by product id.
-        reviews_by_product: dict[str, deque[Review]] = {}
-        for review in self._parse():
-            reviews_by_product.setdefault(review.product_id, []).append(review)
-        
-        total_products = len(reviews_by_product)
-        logger.debug(f"Chunking reviews for {len(reviews_by_product.keys())} products")
-        
-        with tqdm(total=total_products, desc="Chunking Reviews", unit=" product") as pbar:
-            # Create MP pool
-            with multiprocessing.Pool(processes=min(8, multiprocessing.cpu_count())) as pool: # Maximum of 8 processes (Excessive process spawn can overload system)
-                results = []
-                for result in pool.starmap_async(self._chunk_reviews, [(prod_id, reviews, token_limit, prompt_tokens) for prod_id, reviews in reviews_by_product.items()]).get():
-                    results.append(result)
-                    pbar.update(1) #update progress bar
-        # Convert results back into dict
-        chunked_reviews: dict[str, deque[deque[Review]]] = {prod_id: chunks for prod_id, chunks in results}
+        chunked_reviews: dict[str, deque[deque[ReviewRecord]]] = {}
+        self.duplicates = {}
+        self.processed = Watermark()
+        removed: int = 0
+        tokens_saved: int = 0
+        requests_saved: int = 0
+
+        telemetry = get_telemetry()
+        token_cache = TokenCountCache(token_cache_path) if token_cache_path else nullcontext()
+        with tqdm(desc="Chunking Reviews", unit=" product") as pbar, token_cache as cache:
+            # Workers plan chunks from shared token arrays, reviews never leave this process.
+            with ChunkEngine(token_limit, prompt_tokens, strategy, cross_product) as engine:
+                for prod_id, reviews in telemetry.timed_iter("parse", self.iter_product_reviews()):
+                    self.processed.record(reviews)
+                    duplicates: dict[str, list[str]] = {}
+                    if dedup_threshold is not None:
+                        with telemetry.stage("dedup", items=len(reviews)):
+                            reviews, duplicates = deduplicate(reviews, dedup_threshold)
+
+                    # Tokenization stage: one batch encode per product, counts travel with the reviews.
+                    with telemetry.stage("tokenize", items=len(reviews)):
+                        tokenize_reviews(reviews, cache=cache)
+
+                    if duplicates:
+                        # Each duplicate is costed as its representative, near-duplicates tokenize alike.
+                        self.duplicates.update(duplicates)
+                        counts = [review.token_count() for review in reviews]
+                        dup_counts = [
+                            review.token_count()
+                            for review in reviews
+                            for _ in duplicates.get(review.review_id, ())
+                        ]
+                        removed += len(dup_counts)
+                        tokens_saved += sum(dup_counts)
+                        requests_saved += (
+                            len(plan_chunks(counts + dup_counts, token_limit, prompt_tokens, strategy))
+                            - len(plan_chunks(counts, token_limit, prompt_tokens, strategy))
+                        )
+
+                    with telemetry.stage("chunk", items=len(reviews)):
+                        for prod_id, chunks in engine.add(prod_id, reviews):
+                            chunked_reviews[prod_id] = chunks
+                            pbar.update(1)
+
+                with telemetry.stage("chunk"):
+                    for prod_id, chunks in engine.flush():
+                        chunked_reviews[prod_id] = chunks
+                        pbar.update(1) #update progress bar
+
+        self.plan_report = engine.report
+        self.plan_report.duplicates_removed = removed
+        self.plan_report.duplicate_tokens_saved = tokens_saved
+        self.plan_report.duplicate_requests_saved = requests_saved
+        if cache is not None:
+            self.plan_report.token_cache_hits = cache.hits
+            self.plan_report.token_cache_misses = cache.misses
+            self.plan_report.token_cache_seconds = cache.lookup_seconds
+        logger.info(f"Chunk plan: {self.plan_report}")
         return chunked_reviews
-    
+        
+
+class AmazonParser(DataParser):
+    # Only the columns a ReviewRecord needs, everything else in the dump is never read.
+    # Types are pyarrow aliases, so pyarrow is only imported when the columnar store is used.
+    COLUMN_TYPES: dict[str, str] = {
+        "Id": "string",
+        "ProductId": "string",
+        "Score": "float64",
+        "Time": "int64",
+        "Summary": "string",
+        "Text": "string"
+    }
+
+    def __init__(self,
+        data_source: Path | None,
+        max_reviews: int = 1000,
+        memory_budget_mb: int = 512,
+        review_filter: ReviewFilter | None = None,
+        use_columnar: bool = False,
+        parallel_ingest: bool = False,
+        sampling: SamplingStrategy = SamplingStrategy.HEAD,
+        max_per_product: int | None = None,
+        watermark: Watermark | None = None,
+        sampling_seed: int | None = None
+        ):
+        super().__init__(data_source, max_reviews, memory_budget_mb, review_filter, use_columnar, parallel_ingest, sampling, max_per_product, watermark, sampling_seed)
+
+    def _parse(self) -> Iterator[ReviewRecord]:
+        if self.use_columnar:
+            if self.parallel_ingest:
+                logger.warning("parallel_ingest is ignored when reading through the columnar store")
+            return self._parse_columnar()
+        return self._parse_csv()
+
+    def _parse_columnar(self) -> Iterator[ReviewRecord]:
+        """
+            Reads reviews from the columnar store (built on first use), with the review filter pushed into the scan.
+            NOTE: The store is sorted by ProductId, so HEAD sampling doesn't take the reviews in file order.
+        """
+        from .columnar import ColumnarStore, filter_expression
+
+        store = ColumnarStore(self.data_source, self.COLUMN_TYPES, sort_by="ProductId", memory_budget=self.memory_budget)
+        store.ensure()
+
+        expression = filter_expression(self.review_filter, product_column="ProductId", rating_column="Score", time_column="Time")
+        count: int = 0
+        for batch in store.scan(list(self.COLUMN_TYPES), expression):
+            columns = batch.to_pydict()
+            for review_id, product_id, rating, time, summary, text in zip(
+                columns["Id"], columns["ProductId"], columns["Score"], columns["Time"], columns["Summary"], columns["Text"]
+            ):
+                if count == self._read_limit:
+                    return
+                yield ReviewRecord(
+                    review_id=review_id,
+                    product_id=product_id,
+                    rating=rating,
+                    summary=summary or "",
+                    text=text or "",
+                    date=time
+                )
+                count += 1
+
+        if count == 0:
+            logger.warning(f"No reviews found in columnar store: {store.store_dir}")
+
+    @staticmethod
+    def _review_from_row(row: dict) -> ReviewRecord:
+        return ReviewRecord(
+            review_id=row["Id"],
+            product_id=row["ProductId"],
+            rating=float(row["Score"]),
+            summary=row["Summary"] or "",
+            text=row["Text"] or "",
+            date=int(row["Time"])
+        )
+
+    def _parse_csv(self) -> Iterator[ReviewRecord]:
+        """
+            Open the files and parse the reviews.
+            NOTE: Each file within the selected datasource should be in the __SAME FORMAT__. Otherwise, your parser wont work!
+        """
+        # Search every file (including those found in sub-directories) of this directory.
+        files: list[Path] = sorted(self.data_source.rglob("*.csv"))
+        if self.parallel_ingest:
+            reviews = parallel_csv_reviews(files, AmazonParser._review_from_row, self._read_limit, self.review_filter)
+        else:
+            reviews = self._read_csv_files(files)
+
+        # max_reviews is a global cap across all files
+        count: int = 0
+        print("\nExtracting reviews....")
+        for review in reviews:
+            yield review
+            count += 1
+            if count == self._read_limit:
+                print(f"\nComplete!\n")
+                break
+
+        if count == 0:
+            logger.warning(f"No reviews found in file: {self.data_source}")
+
+    def _read_csv_files(self, files: list[Path]) -> Iterator[ReviewRecord]:
+        """Sequential ingest, one row at a time."""
+        for file in files:
+            logger.debug(f"Opening data source: {file}")
+            with open(file=file, newline='', mode='r', encoding='utf-8') as csv_file:
+                for row in csv.DictReader(csv_file):
+                    review = self._review_from_row(row)
+                    if self.review_filter and not self.review_filter.matches(review.product_id, review.rating, review.date):
+                        continue
+                    yield review
+
 class YelpParser(DataParser):
-    pass
+    """
+        Parses the YelpScrapper output: `reviews*.csv` joined to `business*.csv` on biz_id.
+
+        The business files are small and read once into a hash index, the review files are
+        streamed row by row and never held in memory. Each business is treated as a product.
+    """
+    DATE_FORMAT: str = "%b %d, %Y" # As scraped, ex: "Mar 3, 2024"
+
+    def __init__(self,
+        data_source: Path | None,
+        max_reviews: int = 1000,
+        memory_budget_mb: int = 512,
+        review_filter: ReviewFilter | None = None,
+        use_columnar: bool = False,
+        parallel_ingest: bool = False,
+        sampling: SamplingStrategy = SamplingStrategy.HEAD,
+        max_per_product: int | None = None,
+        watermark: Watermark | None = None,
+        sampling_seed: int | None = None
+        ):
+        super().__init__(data_source, max_reviews, memory_budget_mb, review_filter, use_columnar, parallel_ingest, sampling, max_per_product, watermark, sampling_seed)
+        if use_columnar:
+            logger.debug("Columnar and parallel ingest are not supported for Yelp data, streaming the CSVs directly.")
+        self._businesses: dict[str, str] | None = None
+
+    def _business_index(self) -> dict[str, str]:
+        """biz_id -> business name, built once per parser."""
+        if self._businesses is None:
+            self._businesses = {}
+            for file in self.data_source.rglob("business*.csv"):
+                logger.debug(f"Indexing businesses from: {file}")
+                with open(file=file, newline='', mode='r', encoding='utf-8') as csv_file:
+                    for row in csv.DictReader(csv_file):
+                        self._businesses[row["id"]] = row.get("name") or ""
+        return self._businesses
+
+    @staticmethod
+    def _review_id(row: dict) -> str:
+        """The scraper doesn't write review ids. Derive a stable one from the review's content."""
+        key = "\x1f".join((row.get("biz_id") or "", row.get("username") or "", row.get("date") or "", row.get("text") or ""))
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+    @classmethod
+    def _timestamp(cls, date: str | None) -> int:
+        try:
+            return int(datetime.strptime(date or "", cls.DATE_FORMAT).timestamp())
+        except ValueError:
+            return 0
+
+    def _parse(self) -> Iterator[ReviewRecord]:
+        businesses = self._business_index()
+        if not businesses:
+            logger.warning(f"No business files found in: {self.data_source}")
+
+        count: int = 0
+        unmatched: int = 0
+        for file in self.data_source.rglob("reviews*.csv"):
+            logger.debug(f"Opening data source: {file}")
+            with open(file=file, newline='', mode='r', encoding='utf-8') as csv_file:
+                for row in csv.DictReader(csv_file):
+                    if count == self._read_limit:
+                        return
+                    biz_id = row.get("biz_id")
+                    if biz_id not in businesses:
+                        unmatched += 1
+                        continue
+
+                    rating = float(row.get("rating") or 0)
+                    date = self._timestamp(row.get("date"))
+                    if self.review_filter and not self.review_filter.matches(biz_id, rating, date):
+                        continue
+
+                    yield ReviewRecord(
+                        review_id=self._review_id(row),
+                        product_id=biz_id,
+                        rating=rating,
+                        summary=businesses[biz_id],
+                        text=row.get("text") or "",
+                        date=date
+                    )
+                    count += 1
+
+        if unmatched:
+            logger.warning(f"Skipped {unmatched} reviews with no matching business")
+        if count == 0:
+            logger.warning(f"No reviews found in file: {self.data_source}")
     
\ No newline at end of file
@@ -0,0 +1,115 @@
+from collections import defaultdict
+from typing import Callable, Hashable, Iterable, TypeVar
+from loguru import logger
+
+import random
+import heapq
+
+T = TypeVar("T")
+
+
+def _levels_needed(
+        seen: dict[Hashable, int],
+        stratum_group: dict[Hashable, Hashable],
+        n: int,
+        group_cap: int | None,
+        max_level: int
+    ) -> int:
+    """
+        Smallest L such that taking up to L items from every stratum (and up to group_cap per group) yields n items.
+        Items ranked L or deeper in their stratum can then never be selected.
+    """
+    def available(level: int) -> int:
+        per_group: dict[Hashable, int] = defaultdict(int)
+        for s, count in seen.items():
+            per_group[stratum_group[s]] += min(count, level)
+        if group_cap is None:
+            return sum(per_group.values())
+        return sum(min(count, group_cap) for count in per_group.values())
+
+    low, high = 1, max_level
+    while low < high:
+        mid = (low + high) // 2
+        if available(mid) >= n:
+            high = mid
+        else:
+            low = mid + 1
+    return low
+
+
+def stratified_sample(
+        items: Iterable[T],
+        n: int,
+        stratum: Callable[[T], Hashable],
+        group: Callable[[T], Hashable],
+        group_cap: int | None = None,
+        seed: int | None = None
+    ) -> list[T]:
+    """
+        Single-pass stratified reservoir sample of n items.
+
+        Every item gets a random priority, and each stratum keeps a bottom-k reservoir (a uniform sample of it).
+        The final sample takes strata round-robin: every stratum's best item, then every stratum's second best, ...
+        so small strata are fully represented before large ones get more. At most group_cap items are taken per group.
+
+        Reservoirs are trimmed as the stream goes to the deepest level round-robin could still reach, so memory stays
+        around n items plus one counter per stratum however long the stream is.
+
+        :param stratum: Stratum of an item (ex: (ProductId, Score)).
+        :param group: Group an item's stratum belongs to, group_cap applies to it (ex: ProductId).
+        :return: The sampled items in stream order.
+    """
+    if n <= 0:
+        return []
+
+    rng = random.Random(seed)
+    max_level: int = min(n, group_cap) if group_cap else n
+    seen: dict[Hashable, int] = defaultdict(int)
+    stratum_group: dict[Hashable, Hashable] = {}
+    reservoirs: dict[Hashable, list[tuple[float, int, T]]] = {} # Max-heaps on negated priority
+    held: int = 0
+    trim_at: int = 2 * n
+
+    for seq, item in enumerate(items):
+        s = stratum(item)
+        seen[s] += 1
+        priority = rng.random()
+        reservoir = reservoirs.get(s)
+        if reservoir is None:
+            reservoir = reservoirs[s] = []
+            stratum_group[s] = group(item)
+
+        if len(reservoir) < max_level:
+            heapq.heappush(reservoir, (-priority, seq, item))
+            held += 1
+        elif priority < -reservoir[0][0]:
+            heapq.heapreplace(reservoir, (-priority, seq, item))
+
+        if held > trim_at:
+            max_level = _levels_needed(seen, stratum_group, n, group_cap, max_level)
+            for reservoir in reservoirs.values():
+                while len(reservoir) > max_level:
+                    heapq.heappop(reservoir)
+            held = sum(len(reservoir) for reservoir in reservoirs.values())
+            trim_at = max(2 * n, 2 * held)
+
+    # Rank items by (level within their stratum, priority): round-robin over strata in random order.
+    ranked: list[tuple[int, float, int, T, Hashable]] = []
+    for s, reservoir in reservoirs.items():
+        for level, (neg_priority, seq, item) in enumerate(sorted(reservoir, reverse=True)):
+            ranked.append((level, -neg_priority, seq, item, stratum_group[s]))
+    ranked.sort(key=lambda entry: (entry[0], entry[1]))
+
+    taken: dict[Hashable, int] = defaultdict(int)
+    sample: list[tuple[int, T]] = []
+    for _, _, seq, item, g in ranked:
+        if len(sample) == n:
+            break
+        if group_cap is not None and taken[g] >= group_cap:
+            continue
+        taken[g] += 1
+        sample.append((seq, item))
+
+    logger.debug(f"Sampled {len(sample)} of {sum(seen.values())} items across {len(seen)} strata")
+    sample.sort(key=lambda pair: pair[0])
+    return [item for _, item in sample]
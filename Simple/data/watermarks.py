@@ -0,0 +1,28 @@
+from Simple.src.types.watermark import Watermark
+
+from pydantic import ValidationError
+from loguru import logger
+from pathlib import Path
+
+WATERMARK_FILE: str = ".watermark.json"
+
+
+def load_watermark(data_source: Path) -> Watermark | None:
+    """The data source's watermark, or None if it was never extracted (or the file is unreadable)."""
+    path = data_source / WATERMARK_FILE
+    if not path.exists():
+        return None
+    try:
+        return Watermark.model_validate_json(path.read_text())
+    except ValidationError as e:
+        logger.warning(f"Ignoring corrupted watermark {path}: {e}")
+        return None
+
+
+def save_watermark(data_source: Path, watermark: Watermark) -> None:
+    path = data_source / WATERMARK_FILE
+    # Write then rename, so a crash never leaves a half-written watermark behind.
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(watermark.model_dump_json())
+    tmp.replace(path)
+    logger.debug(f"Saved watermark for {data_source}: {len(watermark.review_ids)} reviews up to {watermark.max_time}")
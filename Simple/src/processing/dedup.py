@@ -0,0 +1,111 @@
+from Simple.src.types.reviews import ReviewRecord
+from Simple.src.types.API import LLMOutput
+
+from collections import defaultdict
+from typing import Iterable
+
+import numpy as np
+import zlib
+import re
+
+NUM_PERM: int = 64          # MinHash signature length
+BANDS: int = 8              # LSH bands of NUM_PERM // BANDS rows. (1/8)^(1/8) ~ 0.77 Jaccard candidate threshold
+SHINGLE_WORDS: int = 3      # Word n-gram size
+MERSENNE_PRIME: np.uint64 = np.uint64((1 << 61) - 1)
+MAX_HASH: np.uint64 = np.uint64((1 << 32) - 1)
+
+_rng = np.random.RandomState(1) # Fixed permutations so dedup is deterministic across runs
+_A: np.ndarray = _rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_B: np.ndarray = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_WORD = re.compile(r"\w+")
+
+
+def shingles(text: str) -> np.ndarray:
+    """Hashed word n-grams of the normalized text."""
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        grams = [" ".join(words)]
+    else:
+        grams = [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+    return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in set(grams)), dtype=np.uint64)
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature, the fraction of equal entries between two signatures estimates their Jaccard similarity."""
+    hashed = shingles(text)
+    # (a * x + b) mod p, uint64 arithmetic wraps like the reference implementation
+    permuted = (np.outer(_A, hashed) + _B[:, None]) % MERSENNE_PRIME & MAX_HASH
+    return permuted.min(axis=1)
+
+
+def find_duplicates(reviews: list[ReviewRecord], threshold: float) -> dict[int, list[int]]:
+    """
+        Clusters near-duplicate reviews of a single product.
+
+        LSH over banded MinHash signatures proposes candidate pairs, which are kept only when their
+        estimated Jaccard similarity reaches the threshold.
+
+        :return: Index of each cluster's representative (its first review) -> indices of its duplicates.
+    """
+    if len(reviews) < 2:
+        return {}
+
+    signatures = np.stack([minhash(review.text) for review in reviews])
+    rows = NUM_PERM // BANDS
+    parent = list(range(len(reviews)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(BANDS):
+        buckets: dict[bytes, list[int]] = defaultdict(list)
+        for idx, signature in enumerate(signatures[:, band * rows:(band + 1) * rows]):
+            buckets[signature.tobytes()].append(idx)
+
+        for members in buckets.values():
+            first = members[0]
+            for other in members[1:]:
+                root_a, root_b = find(first), find(other)
+                if root_a == root_b:
+                    continue
+                if np.mean(signatures[first] == signatures[other]) >= threshold:
+                    # The lower index stays the root, so the representative is the earliest review
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    clusters: dict[int, list[int]] = {}
+    for idx in range(len(reviews)):
+        root = find(idx)
+        if root != idx:
+            clusters.setdefault(root, []).append(idx)
+    return clusters
+
+
+def deduplicate(reviews: list[ReviewRecord], threshold: float) -> tuple[list[ReviewRecord], dict[str, list[str]]]:
+    """
+        Collapses near-duplicate reviews of a product onto their representative.
+
+        :return: The reviews to send (input order kept), and representative review_id -> duplicate review_ids.
+    """
+    clusters = find_duplicates(reviews, threshold)
+    if not clusters:
+        return reviews, {}
+
+    removed = {idx for dups in clusters.values() for idx in dups}
+    kept = [review for idx, review in enumerate(reviews) if idx not in removed]
+    mapping = {reviews[rep].review_id: [reviews[idx].review_id for idx in dups] for rep, dups in clusters.items()}
+    return kept, mapping
+
+
+def expand_duplicate_keywords(llm_outputs: Iterable[LLMOutput], duplicates: dict[str, list[str]]) -> None:
+    """Attributes every keyword extracted from a representative review to that review's duplicates too."""
+    if not duplicates:
+        return
+    for output in llm_outputs:
+        copies = []
+        for kw in output.keywords:
+            for dup_id in duplicates.get(kw.review_id, ()):
+                copies.append(kw.model_copy(update={"review_id": dup_id}))
+        output.keywords.extend(copies)
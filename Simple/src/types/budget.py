@@ -0,0 +1,23 @@
+from enum import Enum
+from pydantic import BaseModel
+
+class BudgetPolicy(Enum):
+    STOP = "stop"          # Extract whole products in priority order until the next one doesn't fit
+    DEGRADE = "degrade"    # Cover as many products as possible: every product's first chunk first, then the rest
+
+class ProductPriority(Enum):
+    MOST_REVIEWS = "most_reviews"
+    INPUT_ORDER = "input_order"
+
+class BudgetReport(BaseModel):
+    """Estimated spend of an extraction run against the monthly budget, and what it had to leave out."""
+    period: str                         # Month the spend is booked under (YYYY-MM)
+    remaining_usd: float | None = None  # Budget left when the run started, None without a dollar cap
+    remaining_tokens: int | None = None
+    planned_chunks: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0              # Estimated from the returned keywords, the API doesn't report usage
+    usd: float = 0.0
+    deferred_chunks: int = 0
+    deferred_reviews: int = 0
+    deferred_products: int = 0          # Products with at least one deferred chunk
@@ -0,0 +1,69 @@
+from enum import Enum
+from pydantic import BaseModel
+
+class ChunkStrategy(Enum):
+    GREEDY = "greedy"                                # Fill chunks in input order, new chunk when the next review doesn't fit
+    FIRST_FIT_DECREASING = "first_fit_decreasing"    # Largest reviews first, each into the first chunk with room
+    BEST_FIT_DECREASING = "best_fit_decreasing"      # Largest reviews first, each into the fullest chunk with room
+
+class ChunkPlanReport(BaseModel):
+    strategy: ChunkStrategy
+    products: int = 0
+    reviews: int = 0
+    review_tokens: int = 0
+    chunk_capacity: int = 0     # Review tokens available per chunk once the prompt is accounted for
+    prompt_tokens: int = 0      # System prompt tokens re-sent with every chunk
+    chunks: int = 0
+    greedy_chunks: int = 0      # Chunks the greedy (input order) strategy would have produced
+    packed_products: int = 0    # Long-tail products sharing cross-product chunks
+    duplicates_removed: int = 0         # Near-duplicate reviews collapsed onto a representative
+    duplicate_tokens_saved: int = 0     # Estimated from each duplicate's representative
+    duplicate_requests_saved: int = 0   # Chunks the duplicates would have added to their products
+    token_cache_hits: int = 0
+    token_cache_misses: int = 0
+    token_cache_seconds: float = 0.0    # Time spent looking counts up in the persistent token cache
+
+    @property
+    def token_cache_hit_rate(self) -> float:
+        lookups = self.token_cache_hits + self.token_cache_misses
+        return self.token_cache_hits / lookups if lookups else 0.0
+
+    @property
+    def fill_ratio(self) -> float:
+        """Fraction of the available review-token capacity actually used."""
+        if not self.chunks or self.chunk_capacity <= 0:
+            return 0.0
+        return self.review_tokens / (self.chunks * self.chunk_capacity)
+
+    @property
+    def prompt_overhead_tokens(self) -> int:
+        return self.chunks * self.prompt_tokens
+
+    @property
+    def requests_saved(self) -> int:
+        return self.greedy_chunks - self.chunks
+
+    def __str__(self) -> str:
+        return (
+            f"{self.strategy.name}: {self.chunks} chunks for {self.reviews} reviews across {self.products} products "
+            f"| fill ratio {self.fill_ratio:.1%} | prompt overhead {self.prompt_overhead_tokens} tokens "
+            f"| {self.requests_saved} requests saved vs greedy ({self.greedy_chunks} chunks)"
+            + (f" | {self.packed_products} products packed across products" if self.packed_products else "")
+            + (
+                f" | {self.duplicates_removed} near-duplicates removed, ~{self.duplicate_tokens_saved} tokens "
+                f"and {self.duplicate_requests_saved} requests saved" if self.duplicates_removed else ""
+            )
+            + (
+                f" | token cache hit rate {self.token_cache_hit_rate:.1%} ({self.token_cache_hits} hits, "
+                f"{self.token_cache_seconds * 1000:.0f} ms in lookups)" if self.token_cache_hits + self.token_cache_misses else ""
+            )
+        )
+
+class SizingStats(BaseModel):
+    """What the adaptive chunk sizer has learned about one model, carried over between runs."""
+    target_tokens: int                          # Review tokens sent per request
+    keywords_per_token: float | None = None     # Keywords returned per review token
+    output_tokens_per_keyword: float | None = None
+    seconds_per_token: float | None = None      # Request latency per review token
+    truncation_rate: float = 0.0                # Share of requests cut off at the output limit (moving average)
+    requests: int = 0
@@ -1,9 +1,13 @@
 from pathlib import Path
 from collections import deque
 
-from Simple.src.types.reviews import Review
-from Simple.src.types.models import EmbeddingModel, ModelType, MODEL_SYS_PROMPTS
+from Simple.src.types.reviews import ReviewRecord, ReviewFilter, SamplingStrategy
+from Simple.src.types.models import EmbeddingModel, ModelType, RateLimit, ModelPrice, MODEL_SYS_PROMPTS, MODEL_RATE_LIMITS, MODEL_PRICES
+from Simple.src.types.budget import BudgetPolicy, ProductPriority
 from Simple.src.types.API import LLMOutput, Cluster
+from Simple.src.types.chunking import ChunkStrategy
+from Simple.src.types.watermark import RunMode
+from Simple.src.utils.response_cache import MAX_ENTRIES as RESPONSE_CACHE_ENTRIES
 
 from loguru import logger
 from dotenv import load_dotenv
@@ -23,11 +27,39 @@ class ClientState:
         self._model: ModelType | None = None
         self._embed_model: EmbeddingModel | None = None
         self._prompt: str | None = None
-        self._reviews: dict[str, deque[deque[Review]]] = {} # Map of product id to chunked reviews for the product
+        self._reviews: dict[str, deque[deque[ReviewRecord]]] = {} # Map of product id (or packed group key) to chunked reviews for the product
         self._llm_output: dict[str, LLMOutput] = {} # Maps product id to parsed products w/keywords
         self._agg_output: dict[str, list[Cluster]] = {}
         self._end_point: str = os.getenv("FAST_API_URL")
         self._stem_reviews: bool = False
+        self._ingest_memory_mb: int = 512 # RAM budget for review ingest before spilling to disk
+        self._chunk_strategy: ChunkStrategy = ChunkStrategy.GREEDY
+        self._cross_product_packing: bool = False # Pack long-tail products together into shared chunks
+        self._columnar_store: bool = False # Read data sources through a one-time Parquet copy (written into the data source)
+        self._review_filter: ReviewFilter | None = None
+        self._parallel_ingest: bool = False # Parse CSVs in byte ranges across processes
+        self._dedup_threshold: float | None = 0.8 # MinHash Jaccard threshold for near-duplicate reviews, None disables
+        self._duplicates: dict[str, list[str]] = {} # Map of representative review id to its near-duplicate review ids
+        self._token_cache: bool = True # Persist review token counts across runs
+        self._sampling: SamplingStrategy = SamplingStrategy.HEAD # How max_reviews reviews are picked from the data source
+        self._max_reviews_per_product: int | None = None # Per-product cap for stratified sampling
+        self._run_mode: RunMode = RunMode.FULL
+        self._max_concurrent_requests: int = 16 # Model requests in flight at once, across all products
+        self._rate_limits: dict[ModelType, RateLimit] = dict(MODEL_RATE_LIMITS)
+        self._embedding_cache: bool = True # Reuse keyword / label embeddings across runs
+        self._response_cache: bool = True # False bypasses the extraction response cache
+        self._response_cache_entries: int = RESPONSE_CACHE_ENTRIES
+        self._http_connections_per_host: int = 32 # Keep-alive pool shared by extraction, embedding and labelling
+        self._request_timeout: float = 300.0 # Seconds, a large chunk can keep the model busy for minutes
+        self._http2: bool = False # Send API traffic over httpx with HTTP/2 instead of aiohttp's HTTP/1.1
+        self._prometheus_textfile: Path | None = None # Also write run telemetry here, for node_exporter's textfile collector
+        self._budget_usd: float | None = None # Monthly extraction spend cap in USD, None for no cap
+        self._budget_tokens: int | None = None # Monthly extraction token cap (input + output), None for no cap
+        self._budget_policy: BudgetPolicy = BudgetPolicy.STOP
+        self._product_priority: ProductPriority = ProductPriority.MOST_REVIEWS # Which products get the budget first
+        self._model_prices: dict[ModelType, ModelPrice] = dict(MODEL_PRICES)
+        self._adaptive_chunking: bool = True # Learn the request size per model from truncations and latency
+        self._max_truncation_rate: float = 0.05 # Share of truncated responses the adaptive chunk size is kept under
         
 
         if not (self._end_point and isinstance(self._end_point, str)):
@@ -128,11 +160,11 @@ class ClientState:
         self._prompt = prompt
     
     @property
-    def reviews(self) -> dict[str, deque[deque[Review]]] | None:
+    def reviews(self) -> dict[str, deque[deque[ReviewRecord]]] | None:
         return self._reviews
     
     @reviews.setter
-    def reviews(self, input: dict[str, deque[deque[Review]]]) -> None:
+    def reviews(self, input: dict[str, deque[deque[ReviewRecord]]]) -> None:
         # No checks here since we want to be able to null this
         self._reviews = input
 
@@ -166,6 +198,133 @@ class ClientState:
     def stem_reviews(self) -> bool:
         return self._stem_reviews
 
+    @property
+    def ingest_memory_mb(self) -> int:
+        return self._ingest_memory_mb
+
+    @property
+    def chunk_strategy(self) -> ChunkStrategy:
+        return self._chunk_strategy
+
+    @chunk_strategy.setter
+    def chunk_strategy(self, strategy: ChunkStrategy) -> None:
+        if not isinstance(strategy, ChunkStrategy):
+            logger.warning("Tried to assign invalid chunk strategy")
+            return
+        self._chunk_strategy = strategy
+
+    @property
+    def cross_product_packing(self) -> bool:
+        return self._cross_product_packing
+
+    @property
+    def columnar_store(self) -> bool:
+        return self._columnar_store
+
+    @property
+    def review_filter(self) -> ReviewFilter | None:
+        return self._review_filter
+
+    @review_filter.setter
+    def review_filter(self, review_filter: ReviewFilter | None) -> None:
+        self._review_filter = review_filter
+
+    @property
+    def parallel_ingest(self) -> bool:
+        return self._parallel_ingest
+
+    @property
+    def dedup_threshold(self) -> float | None:
+        return self._dedup_threshold
+
+    @property
+    def duplicates(self) -> dict[str, list[str]]:
+        return self._duplicates
+
+    @duplicates.setter
+    def duplicates(self, new: dict[str, list[str]]) -> None:
+        self._duplicates = new
+
+    @property
+    def token_cache(self) -> bool:
+        return self._token_cache
+
+    @property
+    def sampling(self) -> SamplingStrategy:
+        return self._sampling
+
+    @property
+    def max_reviews_per_product(self) -> int | None:
+        return self._max_reviews_per_product
+
+    @property
+    def run_mode(self) -> RunMode:
+        return self._run_mode
+
+    @property
+    def max_concurrent_requests(self) -> int:
+        return self._max_concurrent_requests
+
+    @property
+    def rate_limits(self) -> dict[ModelType, RateLimit]:
+        return self._rate_limits
+
+    @property
+    def embedding_cache(self) -> bool:
+        return self._embedding_cache
+
+    @property
+    def response_cache(self) -> bool:
+        return self._response_cache
+
+    @property
+    def response_cache_entries(self) -> int:
+        return self._response_cache_entries
+
+    @property
+    def http_connections_per_host(self) -> int:
+        return self._http_connections_per_host
+
+    @property
+    def request_timeout(self) -> float:
+        return self._request_timeout
+
+    @property
+    def http2(self) -> bool:
+        return self._http2
+
+    @property
+    def prometheus_textfile(self) -> Path | None:
+        return self._prometheus_textfile
+
+    @property
+    def budget_usd(self) -> float | None:
+        return self._budget_usd
+
+    @property
+    def budget_tokens(self) -> int | None:
+        return self._budget_tokens
+
+    @property
+    def budget_policy(self) -> BudgetPolicy:
+        return self._budget_policy
+
+    @property
+    def product_priority(self) -> ProductPriority:
+        return self._product_priority
+
+    @property
+    def model_prices(self) -> dict[ModelType, ModelPrice]:
+        return self._model_prices
+
+    @property
+    def adaptive_chunking(self) -> bool:
+        return self._adaptive_chunking
+
+    @property
+    def max_truncation_rate(self) -> float:
+        return self._max_truncation_rate
+
 
 class ReadOnlyClientState:
     """
@@ -211,7 +370,7 @@ class ReadOnlyClientState:
         return self._real_state.prompt
     
     @property
-    def reviews(self) -> dict[str, deque[deque[Review]]] | None:
+    def reviews(self) -> dict[str, deque[deque[ReviewRecord]]] | None:
         return self._real_state.reviews
 
     @property
@@ -226,6 +385,118 @@ class ReadOnlyClientState:
     def stem_reviews(self) -> bool:
         return self._real_state.stem_reviews
 
+    @property
+    def ingest_memory_mb(self) -> int:
+        return self._real_state.ingest_memory_mb
+
+    @property
+    def chunk_strategy(self) -> ChunkStrategy:
+        return self._real_state.chunk_strategy
+
+    @property
+    def cross_product_packing(self) -> bool:
+        return self._real_state.cross_product_packing
+
+    @property
+    def columnar_store(self) -> bool:
+        return self._real_state.columnar_store
+
+    @property
+    def review_filter(self) -> ReviewFilter | None:
+        return self._real_state.review_filter
+
+    @property
+    def parallel_ingest(self) -> bool:
+        return self._real_state.parallel_ingest
+
+    @property
+    def dedup_threshold(self) -> float | None:
+        return self._real_state.dedup_threshold
+
+    @property
+    def duplicates(self) -> dict[str, list[str]]:
+        return self._real_state.duplicates
+
+    @property
+    def token_cache(self) -> bool:
+        return self._real_state.token_cache
+
+    @property
+    def sampling(self) -> SamplingStrategy:
+        return self._real_state.sampling
+
+    @property
+    def max_reviews_per_product(self) -> int | None:
+        return self._real_state.max_reviews_per_product
+
+    @property
+    def run_mode(self) -> RunMode:
+        return self._real_state.run_mode
+
+    @property
+    def max_concurrent_requests(self) -> int:
+        return self._real_state.max_concurrent_requests
+
+    @property
+    def rate_limits(self) -> dict[ModelType, RateLimit]:
+        return self._real_state.rate_limits
+
+    @property
+    def embedding_cache(self) -> bool:
+        return self._real_state.embedding_cache
+
+    @property
+    def response_cache(self) -> bool:
+        return self._real_state.response_cache
+
+    @property
+    def response_cache_entries(self) -> int:
+        return self._real_state.response_cache_entries
+
+    @property
+    def http_connections_per_host(self) -> int:
+        return self._real_state.http_connections_per_host
+
+    @property
+    def request_timeout(self) -> float:
+        return self._real_state.request_timeout
+
+    @property
+    def http2(self) -> bool:
+        return self._real_state.http2
+
+    @property
+    def prometheus_textfile(self) -> Path | None:
+        return self._real_state.prometheus_textfile
+
+    @property
+    def budget_usd(self) -> float | None:
+        return self._real_state.budget_usd
+
+    @property
+    def budget_tokens(self) -> int | None:
+        return self._real_state.budget_tokens
+
+    @property
+    def budget_policy(self) -> BudgetPolicy:
+        return self._real_state.budget_policy
+
+    @property
+    def product_priority(self) -> ProductPriority:
+        return self._real_state.product_priority
+
+    @property
+    def model_prices(self) -> dict[ModelType, ModelPrice]:
+        return self._real_state.model_prices
+
+    @property
+    def adaptive_chunking(self) -> bool:
+        return self._real_state.adaptive_chunking
+
+    @property
+    def max_truncation_rate(self) -> float:
+        return self._real_state.max_truncation_rate
+
     #
     # 2) Disallow all non-internal sets
     #
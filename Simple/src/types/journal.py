@@ -0,0 +1,22 @@
+from .API import LLMOutput
+
+from pydantic import BaseModel
+
+class JournalHeader(BaseModel):
+    """
+        First line of an extraction journal: which run it belongs to and how to undo its partial CSV writes.
+
+        The keyword / product CSVs are truncated back to their sizes at the start of the run before a resume
+        replays the journal, so rows written after the last journaled chunk never end up duplicated.
+    """
+    data_source: str
+    keyword_file: str       # Output name (data/output/<name>_keywords.csv)
+    merge: bool             # Incremental run appending to an existing keyword file
+    keyword_bytes: int = 0
+    product_bytes: int = 0
+    sampling_seed: int | None = None    # Resumes must draw the same sample, or the journaled chunk keys won't match
+
+class JournalEntry(BaseModel):
+    """Outputs (with embeddings) of completed chunks, keyed by their chunk hashes."""
+    chunks: list[str]
+    outputs: list[LLMOutput]
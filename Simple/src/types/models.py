@@ -1,4 +1,5 @@
 from enum import Enum
+from pydantic import BaseModel
 
 class ModelType(Enum):
     CLAUDE = "claude-3-5-sonnet-20240620"
@@ -14,6 +15,8 @@ class EmbeddingModel(Enum):
     VOYAGE_LARGE2 = "voyage-large-2"
     VOYAGE_LITE2_INSTRUCT = "voyage-lite-02-instruct"
 
+EMBEDDING_DIMENSIONS: int = 1536 # Requested from every embedding model
+
 MODEL_TOKEN_LIMITS: dict[ModelType, int] = {
     ModelType.CLAUDE: 2048,
     ModelType.GPT3: 4096,
@@ -49,4 +52,34 @@ MODEL_SYS_PROMPTS: dict[str, str] = {
 
         Keywords:
     """,
-}
\ No newline at end of file
+}
+
+
+class RateLimit(BaseModel):
+    requests_per_minute: int
+    tokens_per_minute: int    # Input tokens: review chunk + system prompt
+
+# Provider limits for our account tier. Override per model with "rate_limits" in config.json.
+MODEL_RATE_LIMITS: dict[ModelType, RateLimit] = {
+    ModelType.CLAUDE: RateLimit(requests_per_minute=50, tokens_per_minute=40_000),
+    ModelType.GPT3: RateLimit(requests_per_minute=3_500, tokens_per_minute=200_000),
+    ModelType.GPT4: RateLimit(requests_per_minute=500, tokens_per_minute=30_000),
+    ModelType.GPT4Mini: RateLimit(requests_per_minute=500, tokens_per_minute=200_000),
+    ModelType.GPT4Mini_FT: RateLimit(requests_per_minute=500, tokens_per_minute=200_000),
+    ModelType.Gemini: RateLimit(requests_per_minute=60, tokens_per_minute=1_000_000)
+}
+
+
+class ModelPrice(BaseModel):
+    input_per_mtok: float     # USD per million input tokens
+    output_per_mtok: float    # USD per million output tokens
+
+# List prices. Override per model with "model_prices" in config.json.
+MODEL_PRICES: dict[ModelType, ModelPrice] = {
+    ModelType.CLAUDE: ModelPrice(input_per_mtok=3.00, output_per_mtok=15.00),
+    ModelType.GPT3: ModelPrice(input_per_mtok=0.50, output_per_mtok=1.50),
+    ModelType.GPT4: ModelPrice(input_per_mtok=2.50, output_per_mtok=10.00),
+    ModelType.GPT4Mini: ModelPrice(input_per_mtok=0.15, output_per_mtok=0.60),
+    ModelType.GPT4Mini_FT: ModelPrice(input_per_mtok=0.30, output_per_mtok=1.20),
+    ModelType.Gemini: ModelPrice(input_per_mtok=1.25, output_per_mtok=5.00)
+}
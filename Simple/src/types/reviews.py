@@ -1,4 +1,5 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, PrivateAttr
+from enum import Enum
 from pendulum import DateTime
 from tokenizers import Tokenizer
 import tiktoken
@@ -9,7 +10,7 @@ from loguru import logger
 
 class Review(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
-    
+
     review_id: str
     product_id: str
     rating: float
@@ -17,11 +18,109 @@ class Review(BaseModel):
     text: str
     date: int | DateTime
 
+    # Filled in by the tokenization stage. Private so it's never sent to the API.
+    _token_count: int | None = PrivateAttr(default=None)
+
     def convert_timestamp(self):
         self.date = pendulum.from_timestamp(self.date)
 
+    # NOTE: Private attrs are read straight from __pydantic_private__, going through
+    # BaseModel.__getattr__ is ~10x slower and token counts are read in the hot chunking loop.
+    @property
+    def cached_token_count(self) -> int | None:
+        return self.__pydantic_private__["_token_count"]
+
+    @cached_token_count.setter
+    def cached_token_count(self, count: int) -> None:
+        self.__pydantic_private__["_token_count"] = count
+
+    def token_count(self) -> int:
+        count = self.__pydantic_private__["_token_count"]
+        if count is None:
+            # Local import, the tokens module depends on this one.
+            from Simple.src.utils.tokens import get_encoder
+            count = self.__pydantic_private__["_token_count"] = len(get_encoder().encode_ordinary(self.text))
+        return count
+
+
+class ReviewRecord:
+    """
+        Compact, unvalidated review used on the ingest and chunking hot path.
+
+        Parsers convert field types themselves, so building one is a plain attribute assignment instead of a
+        pydantic validation, and __slots__ drops the per-instance __dict__. model_dump() matches
+        Review.model_dump(), so the API boundary (where the server validates into Review) is unchanged.
+    """
+    __slots__ = ("review_id", "product_id", "rating", "summary", "text", "date", "cached_token_count")
+
+    def __init__(
+            self,
+            review_id: str,
+            product_id: str,
+            rating: float,
+            summary: str,
+            text: str,
+            date: int,
+            cached_token_count: int | None = None
+        ):
+        self.review_id: str = review_id
+        self.product_id: str = product_id
+        self.rating: float = rating
+        self.summary: str = summary
+        self.text: str = text
+        self.date: int = date
+        self.cached_token_count: int | None = cached_token_count # Filled in by the tokenization stage, never sent
+
     def token_count(self) -> int:
-        enc = tiktoken.get_encoding('cl100k_base')
-        return len(enc.encode(self.text))
-    
+        if self.cached_token_count is None:
+            from Simple.src.utils.tokens import get_encoder
+            self.cached_token_count = len(get_encoder().encode_ordinary(self.text))
+        return self.cached_token_count
+
+    def model_dump(self) -> dict:
+        return {
+            "review_id": self.review_id,
+            "product_id": self.product_id,
+            "rating": self.rating,
+            "summary": self.summary,
+            "text": self.text,
+            "date": self.date
+        }
+
+    def to_model(self) -> Review:
+        """Materializes the validated pydantic Review."""
+        review = Review(**self.model_dump())
+        review.cached_token_count = self.cached_token_count
+        return review
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ReviewRecord):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"ReviewRecord(review_id={self.review_id!r}, product_id={self.product_id!r}, rating={self.rating!r})"
+
+
+class ReviewFilter(BaseModel):
+    """Optional predicates applied while reading a data source. None means unfiltered."""
+    product_ids: set[str] | None = None
+    min_rating: float | None = None
+    max_rating: float | None = None
+    start_time: int | None = None # Unix timestamps, inclusive
+    end_time: int | None = None
+
+    def matches(self, product_id: str, rating: float, time: int) -> bool:
+        """Row-by-row check, for sources read without predicate pushdown."""
+        return (
+            (self.product_ids is None or product_id in self.product_ids)
+            and (self.min_rating is None or rating >= self.min_rating)
+            and (self.max_rating is None or rating <= self.max_rating)
+            and (self.start_time is None or time >= self.start_time)
+            and (self.end_time is None or time <= self.end_time)
+        )
+
 
+class SamplingStrategy(Enum):
+    HEAD = "head"                # The first max_reviews reviews, in file order
+    STRATIFIED = "stratified"    # Reservoir sample of max_reviews balanced across (product, score)
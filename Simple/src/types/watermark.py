@@ -0,0 +1,36 @@
+from enum import Enum
+from pydantic import BaseModel
+from typing import Iterable
+
+class RunMode(Enum):
+    FULL = "full"                  # Extract from the whole data source and write a new keyword file
+    INCREMENTAL = "incremental"    # Extract only reviews newer than the data source's watermark, merge into its keyword file
+    RESUME = "resume"              # Finish the data source's interrupted run from its journal
+
+class Watermark(BaseModel):
+    """
+        What has already been extracted from a data source.
+
+        Reviews newer than max_time are new without a lookup, older ones are new unless their id was processed.
+        (Sampled or capped runs don't process everything up to max_time, so the time alone isn't enough.)
+    """
+    max_time: int = 0
+    review_ids: set[str] = set()
+    keyword_file: str | None = None    # Output name (data/output/<name>_keywords.csv) the keywords were saved under
+
+    def is_unseen(self, review_id: str, time: int) -> bool:
+        return time > self.max_time or review_id not in self.review_ids
+
+    def record(self, reviews: Iterable) -> None:
+        """Marks reviews (anything with review_id and date) as processed."""
+        for review in reviews:
+            self.review_ids.add(review.review_id)
+            if review.date > self.max_time:
+                self.max_time = review.date
+
+    def merged(self, other: "Watermark") -> "Watermark":
+        return Watermark(
+            max_time=max(self.max_time, other.max_time),
+            review_ids=self.review_ids | other.review_ids,
+            keyword_file=other.keyword_file or self.keyword_file
+        )
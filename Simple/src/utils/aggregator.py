@@ -1,6 +1,10 @@
 from Simple.src.types.API import Cluster, Keyword, LLMOutput
-from Simple.src.types.models import EmbeddingModel, ModelType
+from Simple.src.types.models import EmbeddingModel, ModelType, EMBEDDING_DIMENSIONS
 from Simple.src.types.client.clientstate import ReadOnlyClientState
+from Simple.src.utils.embedding_cache import EmbeddingCache, get_embedding_cache, normalize_text
+from Simple.src.utils.http_client import APIClient, TRANSPORT_ERRORS
+from Simple.src.utils.retry import APIRequestError
+from Simple.src.utils.telemetry import get_telemetry
 from collections import defaultdict
 
 from sklearn.cluster import KMeans
@@ -11,8 +15,8 @@ from pathlib import Path
 from collections import Counter
 
 import numpy as np
+import asyncio
 import csv
-import requests
 
 class Aggregator:
 
@@ -30,18 +34,28 @@ class Aggregator:
                 # freq[keyword] += 1
                 # compute weighted k-means
 
-        # Find optimal cluster count for each product
-        optimal_k: dict[str, int] = self.find_optimal_k_clusters(k_min=2)
-        # Get product's keyword clusters
-        cluster_keywords: dict[str, list[list[Keyword]]] = self.cluster_k_means(optimal_k=optimal_k)
+        cache: EmbeddingCache | None = get_embedding_cache() if self.global_state.embedding_cache else None
+        if cache is not None:
+            cache.reset_stats()
+
+        telemetry = get_telemetry()
+        with telemetry.stage("cluster", items=len(self.global_state.llm_output)):
+            # Find optimal cluster count for each product
+            optimal_k: dict[str, int] = self.find_optimal_k_clusters(k_min=2)
+            # Get product's keyword clusters
+            cluster_keywords: dict[str, list[list[Keyword]]] = self.cluster_k_means(optimal_k=optimal_k)
         # Get labels for each product's cluster's keywords
-        clusters: dict[str, list[Cluster]] = self.get_cluster_label(cluster_keywords)
+        with telemetry.stage("label", items=sum(map(len, cluster_keywords.values()))):
+            clusters: dict[str, list[Cluster]] = self.get_cluster_label(cluster_keywords)
 
         f_name: str = self.global_state.keyword_source.stem.removesuffix("_keywords")
         agg_path: Path = self.global_state.keyword_source.parent / f"{f_name}_agg.csv"
         logger.debug(agg_path)
 
-        self.cluster_to_csv(clusters, f_name)
+        with telemetry.stage("save", items=sum(map(len, clusters.values()))):
+            self.cluster_to_csv(clusters, f_name)
+        if cache is not None:
+            logger.info(f"Label embedding cache: {cache.summary()}")
         return (agg_path, clusters)
 
     
@@ -100,67 +114,92 @@ class Aggregator:
 
     
     def get_cluster_label(self, prod_clusters: dict[str, list[list[Keyword]]]) -> dict[str, list[Cluster]]:
-        
+        """Labels (and embeds the label of) every cluster, sending the requests concurrently over one pooled client."""
+        return asyncio.run(self._label_clusters(prod_clusters))
+
+    async def _label_clusters(self, prod_clusters: dict[str, list[list[Keyword]]]) -> dict[str, list[Cluster]]:
         res_clusters: dict[str, list[Cluster]] = defaultdict(list)
+        semaphore = asyncio.Semaphore(self.global_state.max_concurrent_requests)
 
-        for product_id, clusters in prod_clusters.items():
-            
-            for cluster in clusters:
-
-                # === 1. Compute frequency map of keywords === 
-                freq_map = Counter(kw.keyword for kw in cluster)
-
-                # === 2. Compute frequency-weighted centroid
-                embeddings = np.array([kw.embedding for kw in cluster])
-                weights = np.array([freq_map[kw.keyword] for kw in cluster])
-                centroid = np.average(embeddings, axis=0, weights=weights)
-
-                # == 3. Cosine similarity between each keyword and centroid == 
-                sims = cosine_similarity([centroid], embeddings)[0]
-                weighted_sims = sims * weights
-
-                # == 4. Select top-N keywords, or all if small cluster == 
-                max_keywords = 10
-                # if len(cluster) <= max_keywords:
-                #     top_keywords = [kw.keyword for kw in cluster]
-                # else:
-                top_indicies = weighted_sims.argsort()[-max_keywords:][::-1]
-                top_keywords = [cluster[i] for i in top_indicies]
-                serialized_kw = [kw.model_dump() for kw in top_keywords]
-
-                # Get a label for the cluster's keywords
-                response = requests.post(f"{self.global_state.end_point}/get_cluster_label/{ModelType.GPT4.value}", json=serialized_kw)
-                if not response.ok:
-                    logger.error(f"Error: {response.status_code}, {response.json()}")
-                    continue
-                
-
-                # Embed the label
-                label = response.json().get("label")
-                # API expects a LLMOutput object. Store the generated label here to get label embedding.
-                dummy_input: LLMOutput = LLMOutput( 
-                    product_id="",
-                    keywords=[Keyword(product_id="", review_id="", keyword=label, sentiment=0.5)],
-                    rating_count=0,
-                    rating_sum=0,
-                    summary=""
-                )
-                embedding_response = requests.post(f"{self.global_state.end_point}/get_embeddings/{EmbeddingModel.TEXT_SMALL3.value}", json=dummy_input.model_dump())
-                label_embedding: LLMOutput = embedding_response.json().get('keywords', [])[0].get('embedding')
-                
-                # Construct the Cluster with the label, label_embed, and keywords
-                res_cluster = Cluster(
-                    product_id=product_id,
-                    gen_keyword=label,
-                    embedding=label_embedding,
-                    sentiment_sum=sum(kw.sentiment for kw in cluster),
-                    sentiment_count=len(cluster),
-                    child_keywords=['-'.join([kw.keyword, kw.review_id]) for kw in cluster]
-                )
-                res_clusters[product_id].append(res_cluster)
+        async with APIClient.from_state(self.global_state) as client:
+            async def label(product_id: str, cluster: list[Keyword]) -> Cluster | None:
+                async with semaphore:
+                    return await self._label_cluster(client, product_id, cluster)
 
+            labelled = await asyncio.gather(*(
+                label(product_id, cluster) for product_id, clusters in prod_clusters.items() for cluster in clusters
+            ))
+
+        for res_cluster in labelled:
+            if res_cluster is not None:
+                res_clusters[res_cluster.product_id].append(res_cluster)
         return res_clusters
-    
+
+    async def _label_cluster(self, client: APIClient, product_id: str, cluster: list[Keyword]) -> Cluster | None:
+        # === 1. Compute frequency map of keywords === 
+        freq_map = Counter(kw.keyword for kw in cluster)
+
+        # === 2. Compute frequency-weighted centroid
+        embeddings = np.array([kw.embedding for kw in cluster])
+        weights = np.array([freq_map[kw.keyword] for kw in cluster])
+        centroid = np.average(embeddings, axis=0, weights=weights)
+
+        # == 3. Cosine similarity between each keyword and centroid == 
+        sims = cosine_similarity([centroid], embeddings)[0]
+        weighted_sims = sims * weights
+
+        # == 4. Select top-N keywords, or all if small cluster == 
+        max_keywords = 10
+        # if len(cluster) <= max_keywords:
+        #     top_keywords = [kw.keyword for kw in cluster]
+        # else:
+        top_indicies = weighted_sims.argsort()[-max_keywords:][::-1]
+        top_keywords = [cluster[i] for i in top_indicies]
+        serialized_kw = [kw.model_dump() for kw in top_keywords]
+
+        try:
+            # Get a label for the cluster's keywords
+            response = await client.post(f"/get_cluster_label/{ModelType.GPT4.value}", serialized_kw)
+            # Embed the label
+            label = response.get("label")
+            label_embedding: list[float] = await self._embed_label(client, label)
+        except (APIRequestError, *TRANSPORT_ERRORS) as e:
+            logger.error(f"Error: {e}")
+            return None
+
+        # Construct the Cluster with the label, label_embed, and keywords
+        return Cluster(
+            product_id=product_id,
+            gen_keyword=label,
+            embedding=label_embedding,
+            sentiment_sum=sum(kw.sentiment for kw in cluster),
+            sentiment_count=len(cluster),
+            child_keywords=['-'.join([kw.keyword, kw.review_id]) for kw in cluster]
+        )
+
+    async def _embed_label(self, client: APIClient, label: str) -> list[float]:
+        """Label embedding, read from the embedding cache when this label was embedded before."""
+        cache: EmbeddingCache | None = get_embedding_cache() if self.global_state.embedding_cache else None
+        key = normalize_text(label)
+        if cache is not None:
+            cached = cache.get_many(EmbeddingModel.TEXT_SMALL3, EMBEDDING_DIMENSIONS, [key])
+            if key in cached:
+                return cached[key]
+
+        # API expects a LLMOutput object. Store the generated label here to get label embedding.
+        dummy_input: LLMOutput = LLMOutput( 
+            product_id="",
+            keywords=[Keyword(product_id="", review_id="", keyword=label, sentiment=0.5)],
+            rating_count=0,
+            rating_sum=0,
+            summary=""
+        )
+        embedding_response = await client.post(f"/get_embeddings/{EmbeddingModel.TEXT_SMALL3.value}", dummy_input.model_dump())
+        label_embedding: list[float] = embedding_response.get('keywords', [])[0].get('embedding')
+        if cache is not None and label_embedding:
+            cache.put_many(EmbeddingModel.TEXT_SMALL3, EMBEDDING_DIMENSIONS, {key: label_embedding})
+        return label_embedding
+
     def cluster_to_csv(self, prod_clusters: dict[str, list[Cluster]], filename: str):
         with open(f"{self.package_dir}/data/output/{filename}-agg.csv", newline="", mode="w") as aggregator_csv:
             writer = csv.DictWriter(aggregator_csv, fieldnames=[
@@ -1,16 +1,36 @@
-from Simple.src.types.models import EmbeddingModel, ModelType, MODEL_SYS_PROMPTS, MODEL_TOKEN_LIMITS
-from Simple.src.types.reviews import Review
+from Simple.src.types.models import EmbeddingModel, ModelType, MODEL_SYS_PROMPTS, MODEL_TOKEN_LIMITS, EMBEDDING_DIMENSIONS
+from Simple.src.types.reviews import ReviewRecord
 from Simple.src.types.API import LLMOutput, Keyword
 from Simple.src.types.client.clientstate import ReadOnlyClientState
+from Simple.src.processing.dedup import expand_duplicate_keywords
+from Simple.src.utils.scheduler import RequestScheduler
+from Simple.src.utils.tokens import count_tokens
+from Simple.src.utils.retry import APIRequestError, DeadLetter, MAX_ATTEMPTS, backoff_delay
+from Simple.src.utils.embedding_cache import EmbeddingCache, get_embedding_cache, normalize_text
+from Simple.data.keyword_writer import KeywordWriter
+from Simple.data.journal import ExtractionJournal
+from Simple.src.utils.http_client import APIClient, TRANSPORT_ERRORS
+from Simple.src.utils.telemetry import get_telemetry
+from Simple.src.utils.budget import BudgetGovernor
+from Simple.src.utils.chunk_sizer import ChunkSizer, CHUNK_SIZING_PATH
+from Simple.src.utils.response_cache import ResponseCache, RESPONSE_CACHE_PATH, response_key
 
 
 from loguru import logger
 from collections import deque
+from pydantic import ValidationError
 from tqdm.asyncio import tqdm
+from typing import Iterator
 
-import requests
 import asyncio
-import aiohttp
+import json
+import time
+
+EMBED_BATCH_SIZE: int = 512        # Texts per /embed_texts request (the provider allows 2048)
+EMBED_BATCH_TOKENS: int = 100_000  # Well under the provider's per-request token cap
+EMBED_WORKERS: int = 4             # Embedding stage workers, each coalescing queued chunks into requests
+PIPELINE_QUEUE_SIZE: int = 32      # Chunks' outputs a stage may run ahead of the next one
+REPAIR_CHUNK_REVIEWS: int = 4      # Reviews per chunk when re-extracting reviews that got no valid keywords
 
 class APIInterface:
     def __init__(self, state: ReadOnlyClientState):
@@ -18,114 +38,476 @@ class APIInterface:
         if not state:
             raise ValueError("Could not create an API interface due to corrupted client state.")
         self.state = state
+        self.dead_letters: list[DeadLetter] = [] # Reviews the last extraction gave up on
+        self.response_cache: ResponseCache | None = None # Open during extraction unless bypassed
+        self.invalid_keywords: int = 0 # Keywords dropped for a review_id that wasn't in their chunk
+        self.repaired_reviews: int = 0 # Reviews re-extracted because they got no valid keyword
+        self.governor: BudgetGovernor | None = None # Budget of the running extraction, if any
+        self.sizer: ChunkSizer | None = None # Adaptive chunk target of the running extraction, if enabled
 
     def get_token_limit(self, from_source: bool = False) -> None:
         if not from_source:
             return MODEL_TOKEN_LIMITS[self.state.model]
         
         logger.debug(f"Sending request for model: {self.state.model}")
-        token_limit_res = requests.get(f"{self.state.end_point}/token_limit/{self.state.model.value}")
-        if not token_limit_res.status_code == 200:
-            logger.error(f"Could not obtain token limit via API. {token_limit_res.json()}")
-        return token_limit_res.json()["token_limit"]
+        try:
+            return APIClient.from_state(self.state).request_sync("GET", f"/token_limit/{self.state.model.value}")["token_limit"]
+        except (APIRequestError, *TRANSPORT_ERRORS) as e:
+            logger.error(f"Could not obtain token limit via API, using the known limit. {e}")
+            return MODEL_TOKEN_LIMITS[self.state.model]
     
     def get_llmOutput(
             # Filter by product id
             self,
-            filter_product_id: set[str] | None = None  # Not implemented
+            filter_product_id: set[str] | None = None,  # Not implemented
+            writer: KeywordWriter | None = None,
+            journal: ExtractionJournal | None = None,
+            governor: BudgetGovernor | None = None
             ) -> deque[LLMOutput]:
-        output: deque[LLMOutput] = asyncio.run(self._extract_keywords_sentiment())
-
         """
-        Because we rely on Proompt engineering and black magic boxes 
-        to correctly place the review_id we need to assert that the LLM didn't
-        hallucinate a false review_id.
+            Runs extraction -> embedding -> persistence as a pipeline of stages connected by bounded queues.
+
+            Each chunk's keywords are embedded as soon as extraction returns them and handed to the writer
+            as soon as they are embedded. A full queue blocks the stage feeding it, so a slow stage holds
+            back the ones before it instead of letting their results pile up in memory.
 
-        If it did, ship the faulty review back (by keeping track of which reviews were NOT faulty)
+            With a journal, chunks it already holds are skipped and every saved chunk is journaled, so an
+            interrupted run can be resumed. Only this run's outputs are returned.
+
+            With a governor, a chunk is only sent while its estimate fits the remaining budget, see governor.deferred_ids.
         """
-        # self._validate_output()....
+        self.governor = governor
+        try:
+            return asyncio.run(self._run_pipeline(writer, journal))
+        finally:
+            self.governor = None
+
+    async def _run_pipeline(self, writer: KeywordWriter | None, journal: ExtractionJournal | None) -> deque[LLMOutput]:
+        # Items are (hashes of the completed chunks, their outputs)
+        extracted: asyncio.Queue[tuple[list[str], list[LLMOutput]] | None] = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        embedded: asyncio.Queue[tuple[list[str], list[LLMOutput]] | None] = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        output: deque[LLMOutput] = deque()
+
+        cache: EmbeddingCache | None = get_embedding_cache() if self.state.embedding_cache else None
+        if cache is not None:
+            cache.reset_stats()
 
-        # Fetch the embeddings for all the keywords
-        self._get_embeddings(llmOutputs=output)
+        async def persist() -> None:
+            finished = 0
+            while finished < EMBED_WORKERS:
+                item = await embedded.get()
+                if item is None:
+                    finished += 1
+                    continue
+                get_telemetry().sample_queue("embedded", embedded.qsize())
+                chunk_keys, outputs = item
+                if writer is not None:
+                    with get_telemetry().stage("save", items=sum(len(out.keywords) for out in outputs)):
+                        writer.write(outputs)
+                # Journaled only once written, a resume truncates the CSVs to match the journal anyway
+                if journal is not None:
+                    journal.append(chunk_keys, outputs)
+                output.extend(outputs)
+
+        async with APIClient.from_state(self.state) as client:
+            async def extract() -> None:
+                await self._extract_keywords_sentiment(client, extracted, journal.done if journal is not None else None)
+                for _ in range(EMBED_WORKERS):
+                    await extracted.put(None)
+
+            await asyncio.gather(
+                extract(),
+                *(self._embed_stage(client, extracted, embedded) for _ in range(EMBED_WORKERS)),
+                persist()
+            )
+
+        if cache is not None:
+            logger.info(f"Embedding cache: {cache.summary()}")
         return output
 
-    async def _extract_keywords_sentiment(self) -> deque[LLMOutput]:
+    async def _embed_stage(self, client: APIClient, extracted: asyncio.Queue, embedded: asyncio.Queue) -> None:
+        """
+            Embedding worker: embeds the keywords of extracted chunks and passes them on.
+
+            Chunks already waiting in the queue are coalesced (up to EMBED_BATCH_SIZE keywords), so embedding
+            requests stay well filled when extraction runs ahead.
+        """
+        done = False
+        while not done:
+            item = await extracted.get()
+            if item is None:
+                break
+            get_telemetry().sample_queue("extracted", extracted.qsize())
+            chunk_keys, outputs = item
+            keywords = sum(len(out.keywords) for out in outputs)
+            while keywords < EMBED_BATCH_SIZE and not extracted.empty():
+                more = extracted.get_nowait()
+                if more is None:
+                    done = True
+                    break
+                chunk_keys += more[0]
+                outputs += more[1]
+                keywords += sum(len(out.keywords) for out in more[1])
+
+            await self._embed_outputs(client, outputs)
+            # Near-duplicate reviews were never sent, they inherit their representative's keywords (and embeddings)
+            expand_duplicate_keywords(outputs, self.state.duplicates)
+            await embedded.put((chunk_keys, outputs))
+        await embedded.put(None)
+
+    async def _extract_keywords_sentiment(self, client: APIClient, extracted: asyncio.Queue | None = None, skip: set[str] | None = None) -> deque[LLMOutput]:
         """
-            Process all chunks concurrently
+            Process all chunks concurrently.
+
+            With a queue, every chunk's (hash, outputs) are put on it as soon as they arrive instead of being returned.
+            Chunks whose hash is in skip (already journaled) aren't extracted again.
         """
         output = deque()
-        async with aiohttp.ClientSession() as session:
+        self.dead_letters = []
+        self.invalid_keywords = self.repaired_reviews = 0
+        # Requests are paced by the scheduler, the client's connection pool is shared with the embedding stage.
+        scheduler = RequestScheduler(self.state.rate_limits[self.state.model], self.state.max_concurrent_requests)
+        prompt_tokens: int = count_tokens([MODEL_SYS_PROMPTS[self.state.prompt]])[0]
+        if self.state.response_cache:
+            self.response_cache = ResponseCache(RESPONSE_CACHE_PATH, self.state.response_cache_entries)
+        if self.state.adaptive_chunking:
+            # The limit chunks were planned with (token_limit - prompt_tokens review tokens), so targets can grow to a whole
+            # planned chunk. The server also uses the model's token limit as the response's max_tokens.
+            limit = self.get_token_limit()
+            self.sizer = ChunkSizer.load(self.state.model, limit - prompt_tokens, limit, self.state.max_truncation_rate, CHUNK_SIZING_PATH)
+        try:
             total_products = len(self.state.reviews.keys())
 
-            tasks = [self._get_chunk_keywords_sentiment(session=session, prod_uuid=key, chunks=chunks) for key, chunks in self.state.reviews.items()]
+            tasks = [self._get_chunk_keywords_sentiment(client=client, scheduler=scheduler, prompt_tokens=prompt_tokens, prod_uuid=key, chunks=chunks, extracted=extracted, skip=skip) for key, chunks in self.state.reviews.items()]
 
-            results = await tqdm.gather(*tasks, total=total_products, desc="Extracting Keywords and Sentiment from product reviews", unit=" product")
+            with get_telemetry().stage("extract"):
+                results = await tqdm.gather(*tasks, total=total_products, desc="Extracting Keywords and Sentiment from product reviews", unit=" product")
 
             for res in results:
                 output.extend(res)
+        finally:
+            if self.response_cache is not None:
+                self.response_cache.close()
+                self.response_cache = None
+            if self.sizer is not None:
+                self.sizer.save()
+                self.sizer.log_summary()
+                self.sizer = None
 
+        scheduler.log_summary()
+        if self.invalid_keywords or self.repaired_reviews:
+            logger.info(f"Dropped {self.invalid_keywords} keywords with hallucinated review ids, re-extracted {self.repaired_reviews} reviews")
+        if self.dead_letters:
+            logger.warning(f"{len(self.dead_letters)} reviews failed extraction after retries, see the dead-letter list")
         return output
 
-    async def _get_chunk_keywords_sentiment(self, session: aiohttp.ClientSession, prod_uuid: str, chunks: deque[deque[Review]]):
+    async def _get_chunk_keywords_sentiment(self, client: APIClient, scheduler: RequestScheduler, prompt_tokens: int, prod_uuid: str, chunks: deque[deque[ReviewRecord]], extracted: asyncio.Queue | None = None, skip: set[str] | None = None):
         """
-            Process chunks for a single product via concurrent async API requests
+            Process chunks for a single product via concurrent async API requests, paced by the scheduler
         """
-        tasks = []
-        url = f"{self.state.end_point}/feed_model/{self.state.model.value}?prompt={self.state.prompt}"
+        url = f"/feed_model/{self.state.model.value}?prompt={self.state.prompt}"
 
-        for chunk in chunks:
-            serialized_reviews = [review.model_dump() for review in chunk]
-            tasks.append(self.fetch(session, url, serialized_reviews))
+        async def extract(chunk: list[ReviewRecord]) -> list[LLMOutput]:
+            key = self.chunk_key(chunk)
+            if skip and key in skip:
+                return []
+            res = await self._extract_chunk(client, scheduler, prompt_tokens, url, chunk)
+            if extracted is None:
+                return res
+            # A chunk with dead-lettered (or deferred) reviews isn't complete, it must not be journaled as done.
+            dead = {letter.review_id for letter in self.dead_letters} if self.dead_letters else set()
+            if self.governor is not None:
+                dead |= self.governor.deferred_ids
+            complete = not any(review.review_id in dead for review in chunk)
+            if res or complete:
+                await extracted.put(([key] if complete else [], res))
+            return []
 
-        responses = await asyncio.gather(*tasks, return_exceptions=True)
         output = []
+        for res in await asyncio.gather(*(extract(list(chunk)) for chunk in chunks)):
+            output.extend(res)
+        return output
 
-        for chunk, res in zip(chunks, responses):
-            if isinstance(res, Exception):
-                logger.error(res)
-                continue
-            
-            llmOut = LLMOutput(**res)
-            output.append(llmOut)
+    def chunk_key(self, chunk: list[ReviewRecord]) -> str:
+        """Hash identifying a chunk's extraction: the model, the system prompt and the chunk's reviews."""
+        return response_key(self.state.model, MODEL_SYS_PROMPTS[self.state.prompt], [review.model_dump() for review in chunk]).hex()
 
-        return output
+    async def _extract_chunk(self, client: APIClient, scheduler: RequestScheduler, prompt_tokens: int, url: str, chunk: list[ReviewRecord], repair: bool = True, admitted: bool = False) -> list[LLMOutput]:
+        """
+            Extracts one chunk, retrying transient failures with exponential backoff and jitter.
+
+            A chunk rejected for its size (or whose response hit the output limit) is split in two
+            token-balanced halves which are extracted on their own. Reviews that still fail end up
+            in self.dead_letters instead of being dropped silently.
+
+            Keywords whose review_id wasn't in the chunk are dropped. With repair, the reviews left without
+            any valid keyword are re-extracted once, on their own in small chunks.
+
+            admitted marks halves and repairs of a chunk the budget governor already admitted, its
+            reservation covers them, so they aren't reserved (or deferred) a second time.
+        """
+        cache_key: bytes | None = None
+        if self.response_cache is not None:
+            serialized_reviews = [review.model_dump() for review in chunk]
+            cache_key = response_key(self.state.model, MODEL_SYS_PROMPTS[self.state.prompt], serialized_reviews)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        if self.governor is None or admitted:
+            return await self._dispatch_chunk(client, scheduler, prompt_tokens, url, chunk, repair, cache_key)
+        estimate = self.governor.estimate(chunk)
+        if not self.governor.admit(*estimate):
+            logger.debug(f"Deferring chunk of {len(chunk)} reviews, it doesn't fit the remaining budget")
+            self.governor.defer(chunk)
+            return []
+        try:
+            return await self._dispatch_chunk(client, scheduler, prompt_tokens, url, chunk, repair, cache_key)
+        finally:
+            self.governor.release(*estimate)
 
-    def _get_embeddings(self, llmOutputs: deque[LLMOutput]) -> None:
+    async def _dispatch_chunk(self, client: APIClient, scheduler: RequestScheduler, prompt_tokens: int, url: str, chunk: list[ReviewRecord], repair: bool, cache_key: bytes | None) -> list[LLMOutput]:
         """
-            Function that updates the embeddings for each keyword
+            Sends a chunk as is or, with adaptive chunking, in pieces of the sizer's current target.
 
-            TODO: Batch API requests. 
+            Each piece is cut when the previous one is done, so it gets the target the last responses led to.
         """
+        if self.sizer is None:
+            return await self._send_chunk(client, scheduler, prompt_tokens, url, chunk, repair, cache_key)
 
-        for idx, llmOutput in enumerate(llmOutputs):
-            res = requests.post(f"{self.state.end_point}/get_embeddings/{self.state.embed_model.value}", json=llmOutput.model_dump())
-            if res.status_code != 200:
-                logger.exception(f"Failed to connect to fast api. Status code: {res.status_code} Response text: {res.text}")
+        dead_before = len(self.dead_letters)
+        outputs: list[LLMOutput] = []
+        start = 0
+        while start < len(chunk):
+            end = self.sizer.cut(chunk, start)
+            outputs += await self._send_chunk(client, scheduler, prompt_tokens, url, chunk[start:end], repair, None)
+            start = end
+        # Cached as the planned chunk, so a rerun hits whatever the pieces were
+        if cache_key is not None and len(self.dead_letters) == dead_before:
+            self.response_cache.put(cache_key, outputs)
+        return outputs
 
-            # Sanity check
+    async def _send_chunk(self, client: APIClient, scheduler: RequestScheduler, prompt_tokens: int, url: str, chunk: list[ReviewRecord], repair: bool, cache_key: bytes | None) -> list[LLMOutput]:
+        serialized_reviews = [review.model_dump() for review in chunk]
+        tokens = prompt_tokens + sum(review.token_count() for review in chunk)
+        error: Exception | None = None
+
+        for attempt in range(MAX_ATTEMPTS):
+            sent = time.perf_counter()
             try:
-                response_data = res.json()
-            except requests.exceptions.JSONDecodeError:
-                logger.exception(f"Failed to decode the JSON response. Status code: {res.status_code} Response text: {res.text}")
-            
+                async with scheduler.slot(tokens):
+                    sent = time.perf_counter()
+                    res = await client.post(url, serialized_reviews)
+                seconds = time.perf_counter() - sent
+                output_tokens = count_tokens([json.dumps(res)])[0] if self.governor or self.sizer else 0
+                if self.governor is not None:
+                    self.governor.charge(tokens, output_tokens)
+                # One LLMOutput per product in the chunk (packed chunks span several products)
+                outputs = [LLMOutput(**llmOut) for llmOut in res]
+                get_telemetry().add("extract", items=len(chunk), tokens=tokens)
+                if self.sizer is not None:
+                    keywords = sum(len(output.keywords) for output in outputs)
+                    self.sizer.observe(tokens - prompt_tokens, len(chunk), keywords, output_tokens, seconds)
+                invalid, uncovered = validate_review_ids(outputs, chunk)
+                self.invalid_keywords += invalid
+                if repair and invalid and uncovered:
+                    outputs += await self._repair_reviews(client, scheduler, prompt_tokens, url, uncovered)
+                if cache_key is not None:
+                    self.response_cache.put(cache_key, outputs)
+                return outputs
+            except APIRequestError as e:
+                error = e
+                if e.is_truncated:
+                    # The provider billed the input and a full max_tokens response, even though none of it is usable
+                    if self.governor is not None:
+                        self.governor.charge(tokens, MODEL_TOKEN_LIMITS[self.state.model])
+                    if self.sizer is not None:
+                        self.sizer.observe_truncation(time.perf_counter() - sent)
+                if e.is_token_limit:
+                    dead_before = len(self.dead_letters)
+                    outputs = await self._split_chunk(client, scheduler, prompt_tokens, url, chunk, e, repair)
+                    # Cache the halves' combined result too, so a rerun doesn't pay for the rejected request again
+                    if cache_key is not None and len(self.dead_letters) == dead_before:
+                        self.response_cache.put(cache_key, outputs)
+                    return outputs
+                if not e.is_transient:
+                    break
+                retry_after = e.retry_after
+            except TRANSPORT_ERRORS as e:
+                error = e
+                retry_after = None
+            except (ValidationError, TypeError) as e:
+                error = e # Malformed response body, retrying won't change it
+                break
+
+            if attempt + 1 < MAX_ATTEMPTS:
+                delay = backoff_delay(attempt, retry_after)
+                logger.debug(f"Retrying chunk of {len(chunk)} reviews in {delay:.1f}s: {error}")
+                await asyncio.sleep(delay)
+
+        logger.error(f"Giving up on chunk of {len(chunk)} reviews: {error}")
+        self.dead_letters.extend(
+            DeadLetter(review_id=review.review_id, product_id=review.product_id, error=str(error))
+            for review in chunk
+        )
+        return []
+
+    async def _repair_reviews(self, client: APIClient, scheduler: RequestScheduler, prompt_tokens: int, url: str, reviews: list[ReviewRecord]) -> list[LLMOutput]:
+        """Re-extracts reviews whose keywords all came back misattributed, in chunks of REPAIR_CHUNK_REVIEWS."""
+        logger.debug(f"Re-extracting {len(reviews)} reviews without valid keywords")
+        self.repaired_reviews += len(reviews)
+        results = await asyncio.gather(*(
+            self._extract_chunk(client, scheduler, prompt_tokens, url, reviews[start:start + REPAIR_CHUNK_REVIEWS], repair=False, admitted=True)
+            for start in range(0, len(reviews), REPAIR_CHUNK_REVIEWS)
+        ))
+        return [output for outputs in results for output in outputs]
+
+    async def _split_chunk(self, client: APIClient, scheduler: RequestScheduler, prompt_tokens: int, url: str, chunk: list[ReviewRecord], error: APIRequestError, repair: bool = True) -> list[LLMOutput]:
+        if len(chunk) == 1:
+            logger.error(f"Review {chunk[0].review_id} alone exceeds the model's limits: {error}")
+            self.dead_letters.append(DeadLetter(review_id=chunk[0].review_id, product_id=chunk[0].product_id, error=str(error)))
+            return []
+
+        half = sum(review.token_count() for review in chunk) / 2
+        running, split = 0, 1
+        for idx, review in enumerate(chunk[:-1], 1):
+            running += review.token_count()
+            split = idx
+            if running >= half:
+                break
+        logger.debug(f"Splitting chunk of {len(chunk)} reviews at {split}: {error.detail}")
+
+        left, right = await asyncio.gather(
+            self._extract_chunk(client, scheduler, prompt_tokens, url, chunk[:split], repair, admitted=True),
+            self._extract_chunk(client, scheduler, prompt_tokens, url, chunk[split:], repair, admitted=True)
+        )
+        return left + right
+
+    async def _embed_outputs(self, client: APIClient, llmOutputs: list[LLMOutput]) -> None:
+        """
+            Updates the embedding of every keyword.
+
+            Each distinct keyword string is looked up in the embedding cache, the rest are embedded once in
+            size-bounded batches sent concurrently, and the vectors are fanned back out to every Keyword.
+            With the cache, keywords are keyed by their normalized form (one vector per normalized keyword),
+            but the text that gets embedded is always a keyword as the model returned it.
+        """
+        cache: EmbeddingCache | None = get_embedding_cache() if self.state.embedding_cache else None
+        key = normalize_text if cache is not None else str
+        texts: dict[str, str] = {} # Key -> first keyword text seen with it, the one sent to be embedded
+        for llmOutput in llmOutputs:
+            for kw in llmOutput.keywords:
+                if kw.embedding is None:
+                    texts.setdefault(key(kw.keyword), kw.keyword)
+        if not texts:
+            return
+
+        vectors: dict[str, list[float]] = {}
+        if cache is not None:
+            vectors = cache.get_many(self.state.embed_model, EMBEDDING_DIMENSIONS, list(texts))
+
+        missing: list[str] = [texts[k] for k in texts if k not in vectors]
+        if missing:
+            with get_telemetry().stage("embed", items=len(missing), tokens=sum(count_tokens(missing))):
+                embedded = await self._embed_texts(client, missing)
+            embedded = {key(text): vector for text, vector in embedded.items()}
+            if cache is not None:
+                cache.put_many(self.state.embed_model, EMBEDDING_DIMENSIONS, embedded)
+            vectors |= embedded
+
+        total: int = 0
+        for llmOutput in llmOutputs:
+            for kw in llmOutput.keywords:
+                if kw.embedding is None:
+                    kw.embedding = vectors.get(key(kw.keyword))
+                    total += 1
+        logger.debug(f"Embedded {len(vectors)} of {len(texts)} distinct keywords, fanned out to {total} keywords")
+
+    async def embed_texts(self, texts: list[str]) -> dict[str, list[float]]:
+        """Embeds distinct texts in concurrent batches, returning text -> vector. Texts that failed are missing."""
+        async with APIClient.from_state(self.state) as client:
+            return await self._embed_texts(client, texts)
+
+    async def _embed_texts(self, client: APIClient, texts: list[str]) -> dict[str, list[float]]:
+        url = f"/embed_texts/{self.state.embed_model.value}"
+        semaphore = asyncio.Semaphore(self.state.max_concurrent_requests)
+        vectors: dict[str, list[float]] = {}
+
+        async def embed_batch(batch: list[str]) -> None:
+            async with semaphore:
+                vectors.update(await self._embed_batch(client, url, batch))
+
+        await asyncio.gather(*(embed_batch(batch) for batch in embedding_batches(texts)))
+        return vectors
+
+    async def _embed_batch(self, client: APIClient, url: str, batch: list[str]) -> dict[str, list[float]]:
+        error: Exception | None = None
+        for attempt in range(MAX_ATTEMPTS):
             try:
-                keyword_embeddings = response_data.get('keywords', [])
-                if len(keyword_embeddings) != len(llmOutput.keywords):
-                    logger.exception(f"Mismatch between keywords and embeddings count in response for llmOutput at index {idx}")
-                    continue
-                
-                for keyword_obj, embedding_data in zip(llmOutput.keywords, keyword_embeddings):
-                    keyword_obj.embedding = embedding_data.get('embedding')
-            except KeyError as e:
-                logger.exception(f"Missing expected key in the api response {e}")
-
-            # You need to index this. Otherwise the calling function will not be updated
-            llmOutputs[idx] = llmOutput
-
-    async def fetch(self, session: aiohttp.ClientSession, url: str, json_data: any):
-        """Handles async requests and error handling"""
-        async with session.post(url, json=json_data) as res:
-            if res.status != 200:
-                res_json = await res.json()
-                return Exception(f"API failed: {res_json.get('detail', 'Unknown error')}")
-            return await res.json()
\ No newline at end of file
+                res = await client.post(url, {"texts": batch})
+                embeddings = res["embeddings"]
+                if len(embeddings) != len(batch):
+                    raise ValueError(f"Received {len(embeddings)} embeddings for {len(batch)} texts")
+                return dict(zip(batch, embeddings))
+            except APIRequestError as e:
+                error = e
+                if e.is_token_limit and len(batch) > 1:
+                    # Shouldn't happen with the batch bounds, but never lose a batch to it.
+                    mid = len(batch) // 2
+                    left, right = await asyncio.gather(self._embed_batch(client, url, batch[:mid]), self._embed_batch(client, url, batch[mid:]))
+                    return left | right
+                if not e.is_transient:
+                    break
+                retry_after = e.retry_after
+            except TRANSPORT_ERRORS as e:
+                error = e
+                retry_after = None
+            except (KeyError, ValueError) as e:
+                error = e
+                break
+
+            if attempt + 1 < MAX_ATTEMPTS:
+                await asyncio.sleep(backoff_delay(attempt, retry_after))
+
+        logger.error(f"Failed to embed a batch of {len(batch)} keywords: {error}")
+        return {}
+
+
+def validate_review_ids(outputs: list[LLMOutput], chunk: list[ReviewRecord]) -> tuple[int, list[ReviewRecord]]:
+    """
+        Drops keywords whose review_id isn't one of the chunk's reviews (the model made it up) and
+        re-attributes the rest to their review's product.
+
+        Returns how many keywords were dropped and the chunk's reviews left without any valid keyword.
+    """
+    review_products: dict[str, str] = {review.review_id: review.product_id for review in chunk}
+    covered: set[str] = set()
+    invalid: int = 0
+    for output in outputs:
+        valid = deque()
+        for kw in output.keywords:
+            product_id = review_products.get(kw.review_id)
+            if product_id is None:
+                invalid += 1
+                continue
+            kw.product_id = product_id
+            covered.add(kw.review_id)
+            valid.append(kw)
+        output.keywords = valid
+    if invalid:
+        logger.debug(f"Dropped {invalid} keywords with review ids outside their chunk")
+    return invalid, [review for review in chunk if review.review_id not in covered]
+
+
+def embedding_batches(texts: list[str]) -> Iterator[list[str]]:
+    """Splits texts into batches of at most EMBED_BATCH_SIZE texts and EMBED_BATCH_TOKENS tokens."""
+    batch: list[str] = []
+    batch_tokens: int = 0
+    for text, tokens in zip(texts, count_tokens(texts)):
+        if batch and (len(batch) == EMBED_BATCH_SIZE or batch_tokens + tokens > EMBED_BATCH_TOKENS):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        yield batch
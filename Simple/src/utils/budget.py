@@ -0,0 +1,175 @@
+from Simple.src.types.budget import BudgetPolicy, ProductPriority, BudgetReport
+from Simple.src.types.models import ModelPrice
+from Simple.src.types.reviews import ReviewRecord
+
+from collections import deque
+from datetime import date
+from pathlib import Path
+from loguru import logger
+
+import json
+
+SPEND_LEDGER_PATH: Path = Path(__file__).parents[2] / "data" / "cache" / "spend.json"
+OUTPUT_TOKENS_PER_REVIEW: int = 60 # Estimated response size: a few keywords with their review id and sentiment
+
+Chunks = dict[str, deque[deque[ReviewRecord]]]
+
+
+def prioritize(reviews: Chunks, priority: ProductPriority) -> Chunks:
+    """Orders products (chunk groups) by priority. Chunks are dispatched in this order."""
+    if priority is ProductPriority.MOST_REVIEWS:
+        return dict(sorted(reviews.items(), key=lambda item: -sum(len(chunk) for chunk in item[1])))
+    return reviews
+
+
+class SpendLedger:
+    """Estimated spend per calendar month, persisted so the monthly cap holds across runs."""
+    def __init__(self, path: Path = SPEND_LEDGER_PATH):
+        self.path: Path = path
+        self.months: dict[str, dict[str, float]] = json.loads(path.read_text()) if path.exists() else {}
+
+    @staticmethod
+    def period() -> str:
+        return date.today().strftime("%Y-%m")
+
+    def spent(self, period: str) -> tuple[float, int]:
+        month = self.months.get(period, {})
+        return month.get("usd", 0.0), int(month.get("tokens", 0))
+
+    def book(self, period: str, usd: float, tokens: int) -> None:
+        month = self.months.setdefault(period, {"usd": 0.0, "tokens": 0})
+        month["usd"] += usd
+        month["tokens"] += tokens
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.months, indent=2))
+        tmp.replace(self.path)
+
+
+class BudgetGovernor:
+    """
+        Keeps an extraction run within what's left of the monthly token and dollar budgets.
+
+        plan() picks the chunks the estimate says fit, in product priority order, and defers the rest.
+        While extracting, every chunk has to fit what's actually left (estimated from the responses) before
+        it is sent, so retries and splits can't overrun the budget either. Deferred reviews are simply not
+        extracted: they stay unseen for the watermark and get picked up by a later run.
+    """
+    def __init__(
+            self,
+            price: ModelPrice,
+            prompt_tokens: int,
+            max_usd: float | None = None,
+            max_tokens: int | None = None,
+            policy: BudgetPolicy = BudgetPolicy.STOP,
+            ledger: SpendLedger | None = None
+            ):
+        self.price: ModelPrice = price
+        self.prompt_tokens: int = prompt_tokens
+        self.policy: BudgetPolicy = policy
+        self.ledger: SpendLedger = ledger or SpendLedger()
+        period = self.ledger.period()
+        spent_usd, spent_tokens = self.ledger.spent(period)
+        self.report = BudgetReport(
+            period=period,
+            remaining_usd=max(0.0, max_usd - spent_usd) if max_usd is not None else None,
+            remaining_tokens=max(0, max_tokens - spent_tokens) if max_tokens is not None else None
+        )
+        self.deferred_ids: set[str] = set()
+        self._deferred_products: set[str] = set()
+        self._reserved_usd: float = 0.0  # Estimates of the chunks in flight
+        self._reserved_tokens: int = 0
+
+    def cost(self, input_tokens: int, output_tokens: int) -> float:
+        return (input_tokens * self.price.input_per_mtok + output_tokens * self.price.output_per_mtok) / 1_000_000
+
+    def estimate(self, chunk: list[ReviewRecord]) -> tuple[int, int]:
+        """Estimated (input, output) tokens of extracting a chunk, from the chunker's counts."""
+        return (
+            self.prompt_tokens + sum(review.token_count() for review in chunk),
+            OUTPUT_TOKENS_PER_REVIEW * len(chunk)
+        )
+
+    def _fits(self, input_tokens: int, output_tokens: int, usd: float, tokens: int) -> bool:
+        """Whether spending on top of (usd, tokens) stays within the remaining budget."""
+        if self.report.remaining_tokens is not None and tokens + input_tokens + output_tokens > self.report.remaining_tokens:
+            return False
+        if self.report.remaining_usd is not None and usd + self.cost(input_tokens, output_tokens) > self.report.remaining_usd:
+            return False
+        return True
+
+    def plan(self, reviews: Chunks) -> Chunks:
+        """The chunks (of products in priority order) that the estimate says fit the budget."""
+        selected: Chunks = {}
+        usd, tokens = 0.0, 0
+
+        def take(prod_id: str, chunk: deque[ReviewRecord]) -> bool:
+            nonlocal usd, tokens
+            input_tokens, output_tokens = self.estimate(chunk)
+            if not self._fits(input_tokens, output_tokens, usd, tokens):
+                return False
+            usd += self.cost(input_tokens, output_tokens)
+            tokens += input_tokens + output_tokens
+            selected.setdefault(prod_id, deque()).append(chunk)
+            return True
+
+        if self.policy is BudgetPolicy.STOP:
+            for prod_id, chunks in reviews.items():
+                estimates = [self.estimate(chunk) for chunk in chunks]
+                input_tokens, output_tokens = sum(e[0] for e in estimates), sum(e[1] for e in estimates)
+                if not self._fits(input_tokens, output_tokens, usd, tokens):
+                    break
+                for chunk in chunks:
+                    take(prod_id, chunk)
+        else:
+            # Breadth first: one chunk of every product, then their remaining chunks
+            for prod_id, chunks in reviews.items():
+                if chunks:
+                    take(prod_id, chunks[0])
+            for prod_id, chunks in reviews.items():
+                for chunk in list(chunks)[1:]:
+                    take(prod_id, chunk)
+            selected = {prod_id: selected[prod_id] for prod_id in reviews if prod_id in selected}
+
+        self.report.planned_chunks = sum(len(chunks) for chunks in selected.values())
+        for prod_id, chunks in reviews.items():
+            kept = {id(chunk) for chunk in selected.get(prod_id, ())}
+            for chunk in chunks:
+                if id(chunk) not in kept:
+                    self.defer(chunk)
+        logger.info(
+            f"Budget plan: {self.report.planned_chunks} chunks (~${usd:.2f}, {tokens} tokens), "
+            f"{self.report.deferred_chunks} chunks of {self.report.deferred_products} products deferred"
+        )
+        return selected
+
+    def defer(self, chunk: list[ReviewRecord]) -> None:
+        self.report.deferred_chunks += 1
+        self.report.deferred_reviews += len(chunk)
+        self.deferred_ids.update(review.review_id for review in chunk)
+        self._deferred_products.update(review.product_id for review in chunk)
+        self.report.deferred_products = len(self._deferred_products)
+
+    def admit(self, input_tokens: int, output_tokens: int) -> bool:
+        """Reserves a chunk's estimate if it fits what's left after the spend so far and the chunks in flight."""
+        spent_tokens = self.report.input_tokens + self.report.output_tokens + self._reserved_tokens
+        if not self._fits(input_tokens, output_tokens, self.report.usd + self._reserved_usd, spent_tokens):
+            return False
+        self._reserved_usd += self.cost(input_tokens, output_tokens)
+        self._reserved_tokens += input_tokens + output_tokens
+        return True
+
+    def release(self, input_tokens: int, output_tokens: int) -> None:
+        self._reserved_usd -= self.cost(input_tokens, output_tokens)
+        self._reserved_tokens -= input_tokens + output_tokens
+
+    def charge(self, input_tokens: int, output_tokens: int) -> None:
+        """Books a completed request, its output tokens estimated from the response."""
+        self.report.input_tokens += input_tokens
+        self.report.output_tokens += output_tokens
+        self.report.usd += self.cost(input_tokens, output_tokens)
+
+    def close(self) -> None:
+        """Books the run's spend in the ledger."""
+        self.ledger.book(self.report.period, self.report.usd, self.report.input_tokens + self.report.output_tokens)
+        logger.info(f"Budget: {self.report}")
@@ -0,0 +1,151 @@
+from Simple.src.types.chunking import SizingStats
+from Simple.src.types.models import ModelType
+from Simple.src.types.reviews import ReviewRecord
+
+from pathlib import Path
+from loguru import logger
+
+import json
+
+CHUNK_SIZING_PATH: Path = Path(__file__).parents[2] / "data" / "cache" / "chunk_sizing.json"
+MIN_TARGET_TOKENS: int = 128
+WINDOW: int = 8                     # Requests per sizing decision
+GROWTH: float = 1.25                # Target multiplier while reviews per second keep improving
+BACKOFF: float = 0.7                # Target multiplier when too many responses were truncated
+OUTPUT_HEADROOM: float = 0.8        # Predicted response size is kept under this share of the output limit
+SLOWDOWN_TOLERANCE: float = 0.05    # Throughput drop that counts as bigger chunks being slower
+EWMA_ALPHA: float = 0.2
+
+
+def _ewma(average: float | None, value: float) -> float:
+    return value if average is None else average + EWMA_ALPHA * (value - average)
+
+
+class ChunkSizer:
+    """
+        Learns, per model, how many review tokens to send per request.
+
+        Every response updates moving averages of keywords per input token, output tokens per keyword and
+        latency per token. Every WINDOW requests the target is adjusted: backed off when more than
+        max_truncation_rate of them were cut off at the output limit, otherwise grown while reviews per
+        second keep improving, up to the input limit and to what the keyword rate predicts fits the output limit.
+        When a bigger target turns out slower, the sizer returns to the best one and only probes halfway
+        towards the slower size after that.
+
+        Chunks are planned at the full input limit and cut to the current target as they are dispatched.
+        What was learned is saved per model, so the next run starts from it.
+    """
+    def __init__(
+            self,
+            model: ModelType,
+            input_limit: int,
+            output_limit: int,
+            max_truncation_rate: float = 0.05,
+            stats: SizingStats | None = None,
+            path: Path = CHUNK_SIZING_PATH
+            ):
+        self.model: ModelType = model
+        self.input_limit: int = input_limit    # Review tokens a request can hold next to the prompt
+        self.output_limit: int = output_limit  # The response's max_tokens
+        self.max_truncation_rate: float = max_truncation_rate
+        self.stats: SizingStats = stats or SizingStats(target_tokens=input_limit)
+        self.path: Path = path
+        self.stats.target_tokens = self._clamp(self.stats.target_tokens)
+        self._window: list[tuple[int, float, bool]] = []   # (reviews extracted, seconds, truncated) per request
+        self._best: tuple[int, float] | None = None        # (target, reviews per second) of the fastest window so far
+        self._slower_at: int | None = None                 # Smallest target measured slower than the best
+
+    @classmethod
+    def load(cls, model: ModelType, input_limit: int, output_limit: int, max_truncation_rate: float = 0.05, path: Path = CHUNK_SIZING_PATH) -> "ChunkSizer":
+        saved = json.loads(path.read_text()).get(model.name) if path.exists() else None
+        stats = SizingStats(**saved) if saved else None
+        return cls(model, input_limit, output_limit, max_truncation_rate, stats, path)
+
+    def save(self) -> None:
+        models = json.loads(self.path.read_text()) if self.path.exists() else {}
+        models[self.model.name] = self.stats.model_dump()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(models, indent=2))
+        tmp.replace(self.path)
+
+    @property
+    def target(self) -> int:
+        return self.stats.target_tokens
+
+    def ceiling(self) -> int:
+        """Largest target allowed: the input limit, and the size whose predicted response fits the output limit."""
+        ceiling = self.input_limit
+        if self.stats.keywords_per_token and self.stats.output_tokens_per_keyword:
+            output_per_token = self.stats.keywords_per_token * self.stats.output_tokens_per_keyword
+            ceiling = min(ceiling, int(self.output_limit * OUTPUT_HEADROOM / output_per_token))
+        return max(self._floor(), ceiling)
+
+    def _floor(self) -> int:
+        return min(MIN_TARGET_TOKENS, self.input_limit)
+
+    def _clamp(self, target: float) -> int:
+        return int(max(self._floor(), min(target, self.ceiling())))
+
+    def cut(self, reviews: list[ReviewRecord], start: int = 0) -> int:
+        """End of the piece starting at start: as many reviews as fit the target, at least one."""
+        end, tokens = start, 0
+        while end < len(reviews) and (end == start or tokens + reviews[end].token_count() <= self.target):
+            tokens += reviews[end].token_count()
+            end += 1
+        return end
+
+    def observe(self, review_tokens: int, reviews: int, keywords: int, output_tokens: int, seconds: float) -> None:
+        """A completed request of review_tokens, which returned keywords in output_tokens after seconds."""
+        if review_tokens:
+            self.stats.keywords_per_token = _ewma(self.stats.keywords_per_token, keywords / review_tokens)
+            self.stats.seconds_per_token = _ewma(self.stats.seconds_per_token, seconds / review_tokens)
+        if keywords:
+            self.stats.output_tokens_per_keyword = _ewma(self.stats.output_tokens_per_keyword, output_tokens / keywords)
+        self._record(reviews, seconds, truncated=False)
+
+    def observe_truncation(self, seconds: float) -> None:
+        """A request whose response was cut off at the output limit, nothing of it could be used."""
+        self._record(0, seconds, truncated=True)
+
+    def _record(self, reviews: int, seconds: float, truncated: bool) -> None:
+        self.stats.requests += 1
+        self.stats.truncation_rate = _ewma(self.stats.truncation_rate, float(truncated))
+        self._window.append((reviews, seconds, truncated))
+        if len(self._window) >= WINDOW:
+            self._adjust()
+
+    def _adjust(self) -> None:
+        truncation_rate = sum(truncated for *_, truncated in self._window) / len(self._window)
+        seconds = sum(seconds for _, seconds, _ in self._window)
+        throughput = sum(reviews for reviews, *_ in self._window) / seconds if seconds else 0.0
+        self._window = []
+
+        target = self.stats.target_tokens
+        if truncation_rate > self.max_truncation_rate:
+            new_target = target * BACKOFF
+            self._best = self._slower_at = None  # Measured with truncations, start over
+        elif self._best is not None and target > self._best[0] and throughput < self._best[1] * (1 - SLOWDOWN_TOLERANCE):
+            new_target = self._best[0]
+            self._slower_at = target if self._slower_at is None else min(self._slower_at, target)
+        else:
+            if self._best is None or throughput >= self._best[1] or target == self._best[0]:
+                self._best = (target, throughput)
+            new_target = target * GROWTH
+            if self._slower_at is not None:
+                new_target = min(new_target, (target + self._slower_at) / 2)
+
+        self.stats.target_tokens = self._clamp(new_target)
+        if self.stats.target_tokens != target:
+            logger.debug(
+                f"Chunk target {target} -> {self.stats.target_tokens} tokens "
+                f"({truncation_rate:.0%} truncated, {throughput:.2f} reviews/s per request)"
+            )
+
+    def log_summary(self) -> None:
+        logger.info(
+            f"Chunk sizing for {self.model.name}: target {self.target} of {self.input_limit} tokens, "
+            f"truncation rate {self.stats.truncation_rate:.1%}, "
+            f"{self.stats.keywords_per_token or 0:.3f} keywords/token, "
+            f"{(self.stats.seconds_per_token or 0) * 1000:.2f} ms/token"
+        )
@@ -0,0 +1,109 @@
+from Simple.src.types.models import EmbeddingModel
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import sqlite3
+
+EMBEDDING_CACHE_PATH: Path = Path(__file__).parents[2] / "data" / "cache" / "embeddings.sqlite"
+LRU_ENTRIES: int = 50_000  # ~300MB of 1536-d float32 vectors
+_SQL_BATCH: int = 500
+
+_caches: dict[Path, "EmbeddingCache"] = {}
+
+
+def normalize_text(text: str) -> str:
+    """Cache key form of a text. Case and whitespace don't change what a keyword means."""
+    return " ".join(text.lower().split())
+
+
+class EmbeddingCache:
+    """
+        Two-tier cache of (embedding model, dimensions, normalized text) -> vector.
+
+        An in-memory LRU sits in front of an SQLite store of float32 blobs, so vectors survive across runs
+        and datasets. Hits per tier and misses are counted until reset_stats(), for per-run reporting.
+    """
+    def __init__(self, path: Path = EMBEDDING_CACHE_PATH, lru_entries: int = LRU_ENTRIES):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path: Path = path
+        self.lru_entries: int = lru_entries
+        self._lru: OrderedDict[tuple[str, int, str], np.ndarray] = OrderedDict()
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, dimensions INTEGER NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, dimensions, text)) WITHOUT ROWID"
+        )
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.memory_hits: int = 0
+        self.disk_hits: int = 0
+        self.misses: int = 0
+
+    def _remember(self, key: tuple[str, int, str], vector: np.ndarray) -> None:
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.lru_entries:
+            self._lru.popitem(last=False)
+
+    def get_many(self, model: EmbeddingModel, dimensions: int, texts: Iterable[str]) -> dict[str, list[float]]:
+        """Cached vectors of the given (normalized) texts. Texts missing from both tiers are left out."""
+        found: dict[str, list[float]] = {}
+        on_disk: list[str] = []
+        for text in dict.fromkeys(texts):
+            vector = self._lru.get((model.value, dimensions, text))
+            if vector is None:
+                on_disk.append(text)
+                continue
+            self._lru.move_to_end((model.value, dimensions, text))
+            found[text] = vector.tolist()
+        self.memory_hits += len(found)
+
+        disk_found: int = 0
+        for start in range(0, len(on_disk), _SQL_BATCH):
+            batch = on_disk[start:start + _SQL_BATCH]
+            rows = self._conn.execute(
+                f"SELECT text, vector FROM embeddings WHERE model = ? AND dimensions = ? AND text IN ({','.join('?' * len(batch))})",
+                (model.value, dimensions, *batch)
+            )
+            for text, blob in rows:
+                vector = np.frombuffer(blob, dtype=np.float32)
+                self._remember((model.value, dimensions, text), vector)
+                found[text] = vector.tolist()
+                disk_found += 1
+
+        self.disk_hits += disk_found
+        self.misses += len(on_disk) - disk_found
+        return found
+
+    def put_many(self, model: EmbeddingModel, dimensions: int, vectors: dict[str, list[float]]) -> None:
+        rows = []
+        for text, values in vectors.items():
+            vector = np.asarray(values, dtype=np.float32)
+            self._remember((model.value, dimensions, text), vector)
+            rows.append((model.value, dimensions, text, vector.tobytes()))
+        self._conn.executemany("INSERT OR REPLACE INTO embeddings (model, dimensions, text, vector) VALUES (?, ?, ?, ?)", rows)
+        self._conn.commit()
+
+    def summary(self) -> str:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        if not lookups:
+            return "no lookups"
+        return (
+            f"{(self.memory_hits + self.disk_hits) / lookups:.1%} hit rate over {lookups} lookups "
+            f"({self.memory_hits} memory, {self.disk_hits} disk, {self.misses} misses)"
+        )
+
+
+def get_embedding_cache(path: Path = EMBEDDING_CACHE_PATH) -> EmbeddingCache:
+    """Returns this process's cache for the given path, shared by extraction and aggregation."""
+    cache = _caches.get(path)
+    if cache is None:
+        cache = _caches[path] = EmbeddingCache(path)
+    return cache
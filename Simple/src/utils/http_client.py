@@ -0,0 +1,130 @@
+from Simple.src.utils.retry import APIRequestError
+from Simple.src.utils.telemetry import get_telemetry
+
+from typing import Any
+
+import asyncio
+import aiohttp
+
+try:
+    import httpx # Only needed for the optional HTTP/2 transport
+except ImportError:
+    httpx = None
+
+POOL_CONNECTIONS: int = 100        # Pooled connections over all hosts
+KEEPALIVE_SECONDS: float = 60.0    # Idle connections are kept this long for reuse
+CONNECT_TIMEOUT: float = 10.0
+DNS_CACHE_SECONDS: int = 300
+
+# Failures below the HTTP layer (refused/reset connections, timeouts), worth retrying
+TRANSPORT_ERRORS: tuple[type[Exception], ...] = (aiohttp.ClientError, asyncio.TimeoutError) + ((httpx.TransportError,) if httpx else ())
+
+
+def _retry_after(value: str | None) -> float | None:
+    """Seconds of a Retry-After header, None if it's missing or an HTTP date."""
+    return float(value) if value and value.replace(".", "", 1).isdigit() else None
+
+
+class APIClient:
+    """
+        The HTTP client for all HearSay -> FastAPI traffic: one keep-alive connection pool, capped per host,
+        with a connect and an overall request timeout.
+
+        By default requests go over aiohttp (HTTP/1.1, one request per connection at a time). With http2 set
+        they go over an httpx client that negotiates HTTP/2 where the server offers it, multiplexing requests
+        over fewer connections; this needs httpx's `http2` extra (h2).
+
+        A client is bound to the event loop it was opened in. Open one per asyncio.run() and share it
+        between every request of that run, so connections are reused instead of handshaking per call.
+
+        Usage:
+            async with APIClient(end_point) as client:
+                body = await client.post("/feed_model/...", json=chunk)
+    """
+    def __init__(self, end_point: str, connections_per_host: int = 32, request_timeout: float = 300.0, http2: bool = False):
+        self.end_point: str = end_point.rstrip("/")
+        self.connections_per_host: int = connections_per_host
+        self.request_timeout: float = request_timeout
+        self.http2: bool = http2
+        self._session: aiohttp.ClientSession | None = None
+        self._http2_client: "httpx.AsyncClient | None" = None
+
+    @classmethod
+    def from_state(cls, state) -> "APIClient":
+        return cls(state.end_point, state.http_connections_per_host, state.request_timeout, state.http2)
+
+    async def __aenter__(self) -> "APIClient":
+        if self.http2:
+            if httpx is None:
+                raise RuntimeError("http2 requires httpx with the http2 extra: pip install 'httpx[http2]'")
+            self._http2_client = httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(self.request_timeout, connect=CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=self.connections_per_host,
+                    max_keepalive_connections=self.connections_per_host,
+                    keepalive_expiry=KEEPALIVE_SECONDS
+                )
+            )
+            return self
+
+        connector = aiohttp.TCPConnector(
+            limit=POOL_CONNECTIONS,
+            limit_per_host=self.connections_per_host,
+            keepalive_timeout=KEEPALIVE_SECONDS,
+            ttl_dns_cache=DNS_CACHE_SECONDS
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout, connect=CONNECT_TIMEOUT)
+        )
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        if self._http2_client is not None:
+            await self._http2_client.aclose()
+            self._http2_client = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get(self, path: str) -> Any:
+        return await self.request("GET", path)
+
+    async def post(self, path: str, json: Any) -> Any:
+        return await self.request("POST", path, json)
+
+    async def request(self, method: str, path: str, json: Any = None) -> Any:
+        """Sends a request and returns the decoded JSON body. Raises APIRequestError on a non-200 status."""
+        endpoint = path.split("?", 1)[0].strip("/").split("/", 1)[0]
+        with get_telemetry().request(endpoint):
+            return await self._send(method, path, json)
+
+    async def _send(self, method: str, path: str, json: Any) -> Any:
+        if self._http2_client is not None:
+            return await self._send_http2(method, path, json)
+        async with self._session.request(method, f"{self.end_point}{path}", json=json) as res:
+            if res.status != 200:
+                try:
+                    detail = (await res.json()).get("detail", "Unknown error")
+                except (aiohttp.ContentTypeError, ValueError, AttributeError):
+                    detail = await res.text()
+                raise APIRequestError(res.status, str(detail), _retry_after(res.headers.get("Retry-After")))
+            return await res.json()
+
+    async def _send_http2(self, method: str, path: str, json: Any) -> Any:
+        res = await self._http2_client.request(method, f"{self.end_point}{path}", json=json)
+        if res.status_code != 200:
+            try:
+                detail = res.json().get("detail", "Unknown error")
+            except (ValueError, AttributeError):
+                detail = res.text
+            raise APIRequestError(res.status_code, str(detail), _retry_after(res.headers.get("Retry-After")))
+        return res.json()
+
+    def request_sync(self, method: str, path: str, json: Any = None) -> Any:
+        """A single request from synchronous code, on a client opened just for it."""
+        async def send() -> Any:
+            async with self:
+                return await self.request(method, path, json)
+        return asyncio.run(send())
@@ -0,0 +1,92 @@
+from Simple.src.types.API import LLMOutput
+from Simple.src.types.models import ModelType
+
+from pathlib import Path
+from loguru import logger
+
+import hashlib
+import json
+import sqlite3
+import time
+
+RESPONSE_CACHE_PATH: Path = Path(__file__).parents[2] / "data" / "cache" / "responses.sqlite"
+MAX_ENTRIES: int = 100_000  # One entry per extracted chunk
+
+
+def response_key(model: ModelType, prompt: str, serialized_chunk: list[dict]) -> bytes:
+    """Content address of a /feed_model call: the model, the system prompt's text and the chunk's reviews."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(model.value.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(prompt.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(json.dumps(serialized_chunk, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+    return digest.digest()
+
+
+class ResponseCache:
+    """
+        Persistent map of response_key -> the parsed LLMOutputs of that /feed_model call.
+
+        Re-running extraction over an unchanged dataset (e.g. to try another clustering) then costs nothing.
+        Entries are evicted least recently used first once the cache holds more than max_entries.
+    """
+    def __init__(self, path: Path = RESPONSE_CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path: Path = path
+        self.max_entries: int = max_entries
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key BLOB PRIMARY KEY, outputs TEXT NOT NULL, last_used REAL NOT NULL) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def __enter__(self) -> "ResponseCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.evict()
+        self._conn.commit()
+        self._conn.close()
+        logger.info(f"Response cache: {self.hits} hits, {self.misses} misses ({self.hit_rate:.1%} hit rate)")
+
+    def get(self, key: bytes) -> list[LLMOutput] | None:
+        row = self._conn.execute("SELECT outputs FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        return [LLMOutput.model_validate(output) for output in json.loads(row[0])]
+
+    def put(self, key: bytes, outputs: list[LLMOutput]) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, outputs, last_used) VALUES (?, ?, ?)",
+            (key, json.dumps([output.model_dump(mode="json") for output in outputs]), time.time())
+        )
+        self._conn.commit()
+
+    def evict(self) -> int:
+        """Drops the least recently used entries above max_entries. Returns how many were dropped."""
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        excess = count - self.max_entries
+        if excess <= 0:
+            return 0
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)", (excess,)
+        )
+        logger.debug(f"Evicted {excess} responses from {self.path}")
+        return excess
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
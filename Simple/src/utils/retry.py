@@ -0,0 +1,46 @@
+from pydantic import BaseModel
+
+import random
+
+MAX_ATTEMPTS: int = 5
+BASE_DELAY: float = 1.0    # Seconds, doubled on every attempt
+MAX_DELAY: float = 30.0
+
+TOKEN_LIMIT_STATUS: int = 413                          # Chunk (or its response) doesn't fit the model, split it
+TRUNCATION_DETAIL: str = "MAX TOKEN REACHED"           # 413 detail when the response, not the input, hit the limit
+TRANSIENT_STATUSES: set[int] = {429, 500, 502, 503, 504}
+
+
+class APIRequestError(Exception):
+    """A request to the HearSay API failed with a non-200 status."""
+    def __init__(self, status: int, detail: str, retry_after: float | None = None):
+        super().__init__(f"API failed ({status}): {detail}")
+        self.status: int = status
+        self.detail: str = detail
+        self.retry_after: float | None = retry_after # Seconds, from the Retry-After header
+
+    @property
+    def is_token_limit(self) -> bool:
+        return self.status == TOKEN_LIMIT_STATUS
+
+    @property
+    def is_truncated(self) -> bool:
+        """The model's response was cut off at the output limit."""
+        return self.is_token_limit and TRUNCATION_DETAIL in self.detail
+
+    @property
+    def is_transient(self) -> bool:
+        return self.status in TRANSIENT_STATUSES
+
+
+class DeadLetter(BaseModel):
+    """Reviews which still failed after every retry and split."""
+    review_id: str
+    product_id: str
+    error: str
+
+
+def backoff_delay(attempt: int, retry_after: float | None = None) -> float:
+    """Exponential backoff with full jitter, never shorter than what the server asked for."""
+    delay = random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+    return max(delay, retry_after or 0.0)
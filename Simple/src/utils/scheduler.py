@@ -0,0 +1,79 @@
+from Simple.src.types.models import RateLimit
+
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from loguru import logger
+
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+        Continuously refilling token bucket holding at most one minute's worth of budget.
+
+        Waiters are served in arrival order, so a large request can't be starved by a stream of small ones.
+    """
+    def __init__(self, per_minute: int):
+        self.capacity: float = float(per_minute)
+        self.rate: float = per_minute / 60.0
+        self.tokens: float = self.capacity
+        self._updated: float = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float) -> float:
+        """Waits until `amount` is available and takes it. Returns the seconds spent waiting."""
+        # More than a minute's budget can never accumulate, such a request just waits for a full bucket.
+        amount = min(amount, self.capacity)
+        waited: float = 0.0
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                delay = (amount - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self.tokens -= amount
+        return waited
+
+
+class RequestScheduler:
+    """
+        Paces model requests under a global concurrency cap and a model's requests/min and tokens/min limits.
+
+        Usage:
+            async with scheduler.slot(tokens):
+                await session.post(...)
+    """
+    def __init__(self, rate_limit: RateLimit, max_concurrency: int):
+        self.rate_limit: RateLimit = rate_limit
+        self._requests = TokenBucket(rate_limit.requests_per_minute)
+        self._tokens = TokenBucket(rate_limit.tokens_per_minute)
+        self._concurrency = asyncio.Semaphore(max_concurrency)
+        self.in_flight: int = 0
+        self.sent: int = 0
+        self.throttled_seconds: float = 0.0
+
+    @asynccontextmanager
+    async def slot(self, tokens: int) -> AsyncIterator[None]:
+        async with self._concurrency:
+            waited = await self._requests.acquire(1)
+            waited += await self._tokens.acquire(tokens)
+            self.throttled_seconds += waited
+            self.in_flight += 1
+            self.sent += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+
+    def log_summary(self) -> None:
+        logger.info(
+            f"Sent {self.sent} requests under {self.rate_limit.requests_per_minute} req/min, "
+            f"{self.rate_limit.tokens_per_minute} tokens/min ({self.throttled_seconds:.1f}s spent throttled)"
+        )
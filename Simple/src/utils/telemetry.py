@@ -0,0 +1,219 @@
+from contextlib import contextmanager
+from collections import Counter
+from pathlib import Path
+from typing import Any, Iterable, Iterator, TypeVar
+
+import bisect
+import json
+import time
+
+T = TypeVar("T")
+
+# Upper bounds (seconds) of the request latency histogram buckets, +Inf is implied
+LATENCY_BUCKETS: tuple[float, ...] = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+METRIC_PREFIX: str = "hearsay"
+
+
+class StageStats:
+    """Time spent in a pipeline stage and what went through it. Concurrent work adds up (busy seconds)."""
+    def __init__(self):
+        self.seconds: float = 0.0
+        self.calls: int = 0
+        self.items: int = 0
+        self.tokens: int = 0
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "seconds": round(self.seconds, 4),
+            "calls": self.calls,
+            "items": self.items,
+            "tokens": self.tokens,
+            "items_per_second": round(self.items / self.seconds, 2) if self.seconds else None,
+            "tokens_per_second": round(self.tokens / self.seconds, 2) if self.seconds else None,
+        }
+
+
+class RequestStats:
+    """Latency histogram, outcome counts and in-flight gauge of one API endpoint."""
+    def __init__(self):
+        self.buckets: list[int] = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.seconds: float = 0.0
+        self.count: int = 0
+        self.errors: Counter[str] = Counter()   # Status code (or "transport") -> failed requests
+        self.in_flight: int = 0
+        self.max_in_flight: int = 0
+
+    def observe(self, seconds: float, error: str | None) -> None:
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.seconds += seconds
+        self.count += 1
+        if error is not None:
+            self.errors[error] += 1
+
+    def quantile(self, q: float) -> float | None:
+        """Upper bound of the bucket holding the q-quantile, None past the last bound."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "requests": self.count,
+            "errors": dict(self.errors),
+            "error_rate": round(sum(self.errors.values()) / self.count, 4) if self.count else 0.0,
+            "mean_seconds": round(self.seconds / self.count, 4) if self.count else None,
+            "p50_seconds": self.quantile(0.5),
+            "p95_seconds": self.quantile(0.95),
+            "max_in_flight": self.max_in_flight,
+            "buckets": dict(zip([*map(str, LATENCY_BUCKETS), "+Inf"], self.buckets)),
+        }
+
+
+class QueueStats:
+    def __init__(self):
+        self.samples: int = 0
+        self.total: int = 0
+        self.max: int = 0
+
+    def summary(self) -> dict[str, Any]:
+        return {"mean_depth": round(self.total / self.samples, 2) if self.samples else 0.0, "max_depth": self.max}
+
+
+class Telemetry:
+    """
+        Per-run instrumentation of parse -> chunk -> extract -> embed -> save (and label).
+
+        Stages record busy time, items and tokens; every API request records its latency, outcome and how
+        many were in flight; pipeline queues are sampled for their depth. summary() gives the run's numbers,
+        which can be written as JSON and as a Prometheus textfile.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.started: float = time.time()
+        self.stages: dict[str, StageStats] = {}
+        self.requests: dict[str, RequestStats] = {}
+        self.queues: dict[str, QueueStats] = {}
+
+    def _stage(self, name: str) -> StageStats:
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats()
+        return stats
+
+    @contextmanager
+    def stage(self, name: str, items: int = 0, tokens: int = 0) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, items, tokens, seconds=time.perf_counter() - start, calls=1)
+
+    def add(self, name: str, items: int = 0, tokens: int = 0, seconds: float = 0.0, calls: int = 0) -> None:
+        stats = self._stage(name)
+        stats.seconds += seconds
+        stats.calls += calls
+        stats.items += items
+        stats.tokens += tokens
+
+    def timed_iter(self, name: str, iterable: Iterable[T]) -> Iterator[T]:
+        """Yields from iterable, charging the time spent producing each item (one item each) to the stage."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(name, seconds=time.perf_counter() - start)
+                return
+            self.add(name, items=1, seconds=time.perf_counter() - start, calls=1)
+            yield item
+
+    @contextmanager
+    def request(self, endpoint: str) -> Iterator[None]:
+        stats = self.requests.get(endpoint)
+        if stats is None:
+            stats = self.requests[endpoint] = RequestStats()
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+        start = time.perf_counter()
+        error: str | None = None
+        try:
+            yield
+        except Exception as e:
+            error = str(getattr(e, "status", "transport"))
+            raise
+        finally:
+            stats.in_flight -= 1
+            stats.observe(time.perf_counter() - start, error)
+
+    def sample_queue(self, name: str, depth: int) -> None:
+        stats = self.queues.get(name)
+        if stats is None:
+            stats = self.queues[name] = QueueStats()
+        stats.samples += 1
+        stats.total += depth
+        stats.max = max(stats.max, depth)
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "started": self.started,
+            "wall_seconds": round(time.time() - self.started, 3),
+            "stages": {name: stats.summary() for name, stats in self.stages.items()},
+            "requests": {endpoint: stats.summary() for endpoint, stats in self.requests.items()},
+            "queues": {name: stats.summary() for name, stats in self.queues.items()},
+        }
+
+    def write_summary(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.summary(), indent=2))
+
+    def write_prometheus(self, path: Path) -> None:
+        """Writes the run's metrics in the Prometheus text format, atomically (for node_exporter's textfile collector)."""
+        p = METRIC_PREFIX
+        lines: list[str] = []
+
+        def family(name: str, kind: str, samples: Iterable[tuple[str, float]]) -> None:
+            # Every sample of a family has to follow its TYPE line
+            lines.append(f"# TYPE {p}_{name} {kind}")
+            lines.extend(f"{p}_{name}{labels} {value}" for labels, value in samples)
+
+        family("stage_seconds", "gauge", ((f'{{stage="{n}"}}', st.seconds) for n, st in self.stages.items()))
+        family("stage_items", "gauge", ((f'{{stage="{n}"}}', st.items) for n, st in self.stages.items()))
+        family("stage_tokens", "gauge", ((f'{{stage="{n}"}}', st.tokens) for n, st in self.stages.items()))
+
+        histogram: list[tuple[str, float]] = []
+        for endpoint, stats in self.requests.items():
+            cumulative = 0
+            for bound, count in zip([*map(str, LATENCY_BUCKETS), "+Inf"], stats.buckets):
+                cumulative += count
+                histogram.append((f'_bucket{{endpoint="{endpoint}",le="{bound}"}}', cumulative))
+            histogram.append((f'_sum{{endpoint="{endpoint}"}}', stats.seconds))
+            histogram.append((f'_count{{endpoint="{endpoint}"}}', stats.count))
+        family("request_duration_seconds", "histogram", histogram)
+        family("request_errors", "gauge", (
+            (f'{{endpoint="{endpoint}",status="{status}"}}', count)
+            for endpoint, stats in self.requests.items() for status, count in stats.errors.items()
+        ))
+        family("requests_max_in_flight", "gauge", ((f'{{endpoint="{e}"}}', st.max_in_flight) for e, st in self.requests.items()))
+        family("queue_max_depth", "gauge", ((f'{{queue="{n}"}}', st.max) for n, st in self.queues.items()))
+        family("run_timestamp_seconds", "gauge", [("", self.started)])
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text("\n".join(lines) + "\n")
+        tmp.replace(path)
+
+
+_telemetry = Telemetry()
+
+
+def get_telemetry() -> Telemetry:
+    """This process's telemetry, shared by the parser, the API interface and the aggregator."""
+    return _telemetry
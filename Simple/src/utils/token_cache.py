@@ -0,0 +1,80 @@
+from pathlib import Path
+from typing import Sequence
+from loguru import logger
+
+import hashlib
+import sqlite3
+import time
+
+TOKEN_CACHE_PATH: Path = Path(__file__).parents[2] / "data" / "cache" / "token_counts.sqlite"
+_SQL_BATCH: int = 500 # Stays under SQLite's bound-parameter limit
+
+
+def content_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class TokenCountCache:
+    """
+        Persistent map of (content hash, encoding name) -> token count.
+
+        Lets repeat runs over the same data skip tokenization entirely, whatever the prompt or model.
+        Hits, misses and time spent in lookups are tracked for the run summary.
+    """
+    def __init__(self, path: Path = TOKEN_CACHE_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path: Path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS token_counts ("
+            "hash BLOB NOT NULL, encoding TEXT NOT NULL, count INTEGER NOT NULL, "
+            "PRIMARY KEY (hash, encoding)) WITHOUT ROWID"
+        )
+        self.hits: int = 0
+        self.misses: int = 0
+        self.lookup_seconds: float = 0.0
+
+    def __enter__(self) -> "TokenCountCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._conn.commit()
+        self._conn.close()
+        logger.debug(f"Token cache {self.path}: {self.hits} hits, {self.misses} misses, {self.lookup_seconds:.3f}s in lookups")
+
+    def get_many(self, hashes: Sequence[bytes], encoding: str) -> list[int | None]:
+        """Cached counts in input order, None where the hash hasn't been seen."""
+        start = time.perf_counter()
+        found: dict[bytes, int] = {}
+        unique = list(set(hashes))
+        for start_idx in range(0, len(unique), _SQL_BATCH):
+            batch = unique[start_idx:start_idx + _SQL_BATCH]
+            rows = self._conn.execute(
+                f"SELECT hash, count FROM token_counts WHERE encoding = ? AND hash IN ({','.join('?' * len(batch))})",
+                (encoding, *batch)
+            )
+            found.update(rows)
+        self.lookup_seconds += time.perf_counter() - start
+
+        counts = [found.get(h) for h in hashes]
+        hits = sum(count is not None for count in counts)
+        self.hits += hits
+        self.misses += len(counts) - hits
+        return counts
+
+    def put_many(self, hashes: Sequence[bytes], counts: Sequence[int], encoding: str) -> None:
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO token_counts (hash, encoding, count) VALUES (?, ?, ?)",
+            ((h, encoding, count) for h, count in zip(hashes, counts))
+        )
+        self._conn.commit()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
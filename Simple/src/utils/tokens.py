@@ -0,0 +1,81 @@
+from Simple.src.types.reviews import ReviewRecord
+from .token_cache import TokenCountCache, content_hash
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Sequence
+
+import multiprocessing
+import tiktoken
+
+DEFAULT_ENCODING: str = "cl100k_base"
+ENCODE_THREADS: int = min(8, multiprocessing.cpu_count())
+MIN_PARALLEL_BATCH: int = 64 # Below this, thread hand-off costs more than it saves.
+
+# One encoder (and encode thread pool) per process. Pool workers each build their own on first use.
+_encoders: dict[str, tiktoken.Encoding] = {}
+_executor: ThreadPoolExecutor | None = None
+
+
+def get_encoder(encoding: str = DEFAULT_ENCODING) -> tiktoken.Encoding:
+    """Returns this process's cached encoder for the given encoding name."""
+    enc = _encoders.get(encoding)
+    if enc is None:
+        enc = _encoders[encoding] = tiktoken.get_encoding(encoding)
+    return enc
+
+
+def count_tokens(texts: Sequence[str], encoding: str = DEFAULT_ENCODING) -> list[int]:
+    """
+        Counts the tokens of many texts at once.
+
+        tiktoken releases the GIL while encoding, so large batches are split into one slice per thread
+        of a long-lived pool. (encode_ordinary_batch spins up a fresh thread pool on every call, which
+        costs more than it saves for product-sized batches.)
+    """
+    global _executor
+    enc = get_encoder(encoding)
+
+    if ENCODE_THREADS == 1 or len(texts) < MIN_PARALLEL_BATCH:
+        return [len(enc.encode_ordinary(text)) for text in texts]
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=ENCODE_THREADS, thread_name_prefix="tokenizer")
+
+    step = -(-len(texts) // ENCODE_THREADS)
+    slices = (texts[start:start + step] for start in range(0, len(texts), step))
+    counts: list[int] = []
+    for part in _executor.map(lambda part: [len(enc.encode_ordinary(text)) for text in part], slices):
+        counts.extend(part)
+    return counts
+
+
+def tokenize_reviews(reviews: Sequence[ReviewRecord], encoding: str = DEFAULT_ENCODING, cache: TokenCountCache | None = None) -> None:
+    """
+        Tokenization stage: stores the token count on every review which doesn't have one yet.
+
+        With a cache, counts of previously seen texts are read back instead of re-encoded,
+        and the newly encoded ones are added to it.
+        After this, chunking only needs ReviewRecord.token_count(), which is then a plain attribute read.
+    """
+    missing = [review for review in reviews if review.cached_token_count is None]
+    if not missing:
+        return
+
+    if cache is not None:
+        hashes = [content_hash(review.text) for review in missing]
+        uncached: list[int] = []
+        for idx, count in enumerate(cache.get_many(hashes, encoding)):
+            if count is None:
+                uncached.append(idx)
+            else:
+                missing[idx].cached_token_count = count
+        if not uncached:
+            return
+        missing = [missing[idx] for idx in uncached]
+        hashes = [hashes[idx] for idx in uncached]
+
+    counts = count_tokens([review.text for review in missing], encoding)
+    for review, count in zip(missing, counts):
+        review.cached_token_count = count
+    if cache is not None:
+        cache.put_many(hashes, counts, encoding)
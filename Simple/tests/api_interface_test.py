@@ -0,0 +1,190 @@
+from Simple.src.types.API import LLMOutput
+from Simple.src.types.models import EmbeddingModel, ModelType, RateLimit
+from Simple.src.types.reviews import ReviewRecord
+from Simple.src.utils import api_interface, retry
+from Simple.src.utils.api_interface import APIInterface
+from Simple.src.utils.http_client import APIClient
+from Simple.data.keyword_writer import KeywordWriter
+
+from contextlib import contextmanager
+from collections import deque
+from types import SimpleNamespace
+from aiohttp import web
+
+import threading
+import csv
+import asyncio
+
+@contextmanager
+def _server(route: str, handler, more_routes: dict | None = None):
+    """Serves POST routes (route -> handler) from a background event loop, yielding its base url."""
+    loop = asyncio.new_event_loop()
+    app = web.Application()
+    for path, route_handler in {route: handler, **(more_routes or {})}.items():
+        app.router.add_post(path, route_handler)
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+    finally:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+def _state(end_point: str, **kwargs) -> SimpleNamespace:
+    return SimpleNamespace(
+        end_point=end_point,
+        model=ModelType.CLAUDE,
+        embed_model=EmbeddingModel.TEXT_SMALL3,
+        prompt="default",
+        rate_limits={ModelType.CLAUDE: RateLimit(requests_per_minute=100_000, tokens_per_minute=10**8)},
+        max_concurrent_requests=4,
+        http_connections_per_host=8,
+        request_timeout=10.0,
+        http2=False,
+        **{"embedding_cache": False, "response_cache": False, "adaptive_chunking": False, **kwargs}
+    )
+
+def _embed(api: APIInterface, outputs) -> None:
+    async def run():
+        async with APIClient.from_state(api.state) as client:
+            await api._embed_outputs(client, list(outputs))
+    asyncio.run(run())
+
+def _review(idx: int) -> ReviewRecord:
+    return ReviewRecord(review_id=str(idx), product_id="p", rating=5, summary="", text=f"review {idx}", date=0, cached_token_count=10)
+
+def _run_extraction(api: APIInterface) -> list[LLMOutput]:
+    async def run():
+        async with APIClient.from_state(api.state) as client:
+            return await api._extract_keywords_sentiment(client)
+    return list(asyncio.run(run()))
+
+def _extract(handler, chunks: list[list[ReviewRecord]]) -> tuple[list[LLMOutput], APIInterface]:
+    with _server("/feed_model/{model}", handler) as end_point:
+        api = APIInterface(_state(end_point, reviews={"p": deque(deque(chunk) for chunk in chunks)}))
+        output = _run_extraction(api)
+    return output, api
+
+def _keywords_for(reviews: list[dict]) -> list[dict]:
+    return [{"product_id": "p", "keywords": [
+        {"product_id": "p", "review_id": r["review_id"], "keyword": "k", "sentiment": 1.0} for r in reviews
+    ]}]
+
+def _extracted_ids(output: list[LLMOutput]) -> list[str]:
+    return sorted(kw.review_id for out in output for kw in out.keywords)
+
+## extraction retry tests
+def test_token_limit_splits_chunk_until_it_fits():
+    sizes = []
+    async def handler(request):
+        reviews = await request.json()
+        sizes.append(len(reviews))
+        if len(reviews) > 2:
+            return web.json_response({"detail": "too big"}, status=413)
+        return web.json_response(_keywords_for(reviews))
+
+    output, api = _extract(handler, [[_review(i) for i in range(7)]])
+    assert _extracted_ids(output) == [str(i) for i in range(7)]
+    assert api.dead_letters == []
+    assert sizes[0] == 7 and max(sizes[1:]) <= 4
+
+def test_transient_errors_are_retried_and_failures_dead_lettered(monkeypatch):
+    monkeypatch.setattr(retry, "BASE_DELAY", 0.001)
+    attempts: dict[str, int] = {}
+    async def handler(request):
+        reviews = await request.json()
+        first = reviews[0]["review_id"]
+        attempts[first] = attempts.get(first, 0) + 1
+        if first == "0" and attempts[first] < 3:
+            return web.json_response({"detail": "overloaded"}, status=503)
+        if first == "5":
+            return web.json_response({"detail": "bad request"}, status=400)
+        return web.json_response(_keywords_for(reviews))
+
+    output, api = _extract(handler, [[_review(0), _review(1)], [_review(5), _review(6)]])
+    assert _extracted_ids(output) == ["0", "1"]
+    assert attempts == {"0": 3, "5": 1} # Non-transient errors aren't retried
+    assert [(d.review_id, d.product_id) for d in api.dead_letters] == [("5", "p"), ("6", "p")]
+    assert "bad request" in api.dead_letters[0].error
+
+def test_backoff_honours_retry_after():
+    assert retry.backoff_delay(0, retry_after=7.5) == 7.5
+    assert 0 <= retry.backoff_delay(10) <= retry.MAX_DELAY
+
+## embedding tests
+def test_embeddings_dedupe_batch_and_fan_out(monkeypatch):
+    monkeypatch.setattr(api_interface, "EMBED_BATCH_SIZE", 2)
+    batches = []
+    async def handler(request):
+        texts = (await request.json())["texts"]
+        batches.append(texts)
+        return web.json_response({"model": "m", "embeddings": [[float(len(text))] for text in texts]})
+
+    outputs = deque(
+        LLMOutput(product_id=f"p{i}", keywords=[
+            {"product_id": f"p{i}", "review_id": str(j), "keyword": word, "sentiment": 0.0}
+            for j, word in enumerate(["taste", "price", "smell", "taste", "bag"])
+        ])
+        for i in range(3)
+    )
+    with _server("/embed_texts/{model}", handler) as end_point:
+        _embed(APIInterface(_state(end_point)), outputs)
+
+    assert sorted(text for batch in batches for text in batch) == ["bag", "price", "smell", "taste"]
+    assert all(len(batch) <= 2 for batch in batches)
+    assert all(kw.embedding == [float(len(kw.keyword))] for out in outputs for kw in out.keywords)
+
+## pipeline tests
+def test_pipeline_embeds_and_writes_every_chunk(tmp_path):
+    async def extract(request):
+        return web.json_response(_keywords_for(await request.json()))
+    async def embed(request):
+        texts = (await request.json())["texts"]
+        return web.json_response({"model": "m", "embeddings": [[1.0] for _ in texts]})
+
+    chunks = [[_review(i), _review(i + 1)] for i in range(0, 40, 2)]
+    with _server("/feed_model/{model}", extract, {"/embed_texts/{model}": embed}) as end_point:
+        api = APIInterface(_state(end_point, duplicates={"0": ["100"]}, reviews={"p": deque(deque(chunk) for chunk in chunks)}))
+        with KeywordWriter(tmp_path, "run") as writer:
+            output = api.get_llmOutput(writer=writer)
+
+    assert _extracted_ids(list(output)) == sorted([str(i) for i in range(40)] + ["100"])
+    assert all(kw.embedding == [1.0] for out in output for kw in out.keywords)
+    with writer.keyword_path.open() as kf:
+        assert sorted(row["review_id"] for row in csv.DictReader(kf)) == _extracted_ids(list(output))
+    assert writer.product_path.read_text().split() == ["product_id", "p"]
+
+## review id validation tests
+def test_validation_drops_unknown_review_ids():
+    chunk = [_review(1), _review(2)]
+    outputs = [LLMOutput(product_id="p", keywords=[
+        {"product_id": "p", "review_id": "1", "keyword": "taste", "sentiment": 1.0},
+        {"product_id": "p", "review_id": "7", "keyword": "price", "sentiment": 1.0},
+    ])]
+    invalid, uncovered = api_interface.validate_review_ids(outputs, chunk)
+    assert invalid == 1
+    assert [review.review_id for review in uncovered] == ["2"]
+    assert [kw.review_id for kw in outputs[0].keywords] == ["1"]
+
+def test_only_misattributed_reviews_are_re_extracted():
+    sent = []
+    async def handler(request):
+        reviews = await request.json()
+        sent.append([r["review_id"] for r in reviews])
+        keywords = _keywords_for(reviews)
+        if len(reviews) > api_interface.REPAIR_CHUNK_REVIEWS:
+            # First pass: the model got the ids of every review after the first two wrong
+            for kw in keywords[0]["keywords"][2:]:
+                kw["review_id"] = "x" + kw["review_id"]
+        return web.json_response(keywords)
+
+    output, api = _extract(handler, [[_review(i) for i in range(10)]])
+    assert _extracted_ids(output) == [str(i) for i in range(10)]
+    assert (api.invalid_keywords, api.repaired_reviews) == (8, 8)
+    assert sorted(map(len, sent[1:])) == [4, 4]
@@ -0,0 +1,118 @@
+from Simple.src.utils.budget import BudgetGovernor, SpendLedger, prioritize
+from Simple.src.utils.api_interface import APIInterface
+from Simple.src.utils.tokens import count_tokens
+from Simple.src.types.budget import BudgetPolicy, ProductPriority
+from Simple.src.types.models import ModelPrice, ModelType, MODEL_SYS_PROMPTS, MODEL_TOKEN_LIMITS
+from Simple.src.types.reviews import ReviewRecord
+from Simple.tests.api_interface_test import _server, _state, _review, _keywords_for, _extracted_ids, _run_extraction
+
+from collections import deque
+from aiohttp import web
+
+PRICE = ModelPrice(input_per_mtok=1.0, output_per_mtok=2.0)
+
+def _chunk(product_id: str, ids: range) -> deque[ReviewRecord]:
+    # 10 input tokens each, plus the estimated 60 output tokens: 70 tokens per review
+    return deque(
+        ReviewRecord(review_id=f"{product_id}{idx}", product_id=product_id, rating=5, summary="", text="", date=0, cached_token_count=10)
+        for idx in ids
+    )
+
+def _reviews() -> dict[str, deque[deque[ReviewRecord]]]:
+    return {
+        "small": deque([_chunk("small", range(1))]),
+        "big": deque([_chunk("big", range(2)), _chunk("big", range(2, 4))]),
+    }
+
+def _governor(tmp_path, policy: BudgetPolicy = BudgetPolicy.STOP, **caps) -> BudgetGovernor:
+    return BudgetGovernor(PRICE, prompt_tokens=0, policy=policy, ledger=SpendLedger(tmp_path / "spend.json"), **caps)
+
+def test_products_with_most_reviews_come_first():
+    assert list(prioritize(_reviews(), ProductPriority.MOST_REVIEWS)) == ["big", "small"]
+    assert list(prioritize(_reviews(), ProductPriority.INPUT_ORDER)) == ["small", "big"]
+
+def test_stop_takes_whole_products_until_one_does_not_fit(tmp_path):
+    governor = _governor(tmp_path, max_tokens=300)
+    plan = governor.plan(prioritize(_reviews(), ProductPriority.MOST_REVIEWS))
+    assert list(plan) == ["big"] and len(plan["big"]) == 2
+    assert governor.deferred_ids == {"small0"}
+    assert governor.report.deferred_products == 1
+
+def test_degrade_covers_every_product_first(tmp_path):
+    governor = _governor(tmp_path, BudgetPolicy.DEGRADE, max_tokens=300)
+    plan = governor.plan(prioritize(_reviews(), ProductPriority.MOST_REVIEWS))
+    assert {prod_id: len(chunks) for prod_id, chunks in plan.items()} == {"big": 1, "small": 1}
+    assert governor.deferred_ids == {"big2", "big3"}
+
+def test_dollar_cap(tmp_path):
+    # 140 input + 2 * 140 output = $0.00042 a two review chunk, $0.00021 the single review one
+    governor = _governor(tmp_path, max_usd=0.0005)
+    assert list(governor.plan(_reviews())) == ["small"]
+
+def test_spend_is_carried_over_within_the_month(tmp_path):
+    governor = _governor(tmp_path, max_tokens=1_000)
+    governor.charge(600, 100)
+    governor.close()
+    assert _governor(tmp_path, max_tokens=1_000).report.remaining_tokens == 300
+    assert _governor(tmp_path).report.remaining_tokens is None
+
+def test_chunks_past_the_budget_are_deferred_while_extracting(tmp_path):
+    sent = []
+    async def handler(request):
+        reviews = await request.json()
+        sent.append(len(reviews))
+        return web.json_response(_keywords_for(reviews))
+
+    prompt_tokens = count_tokens([MODEL_SYS_PROMPTS["default"]])[0]
+    chunks = deque([deque(_review(i) for i in range(2)), deque(_review(i) for i in range(2, 4))])
+    governor = BudgetGovernor(PRICE, prompt_tokens, max_tokens=prompt_tokens + 2 * 70 + 10, ledger=SpendLedger(tmp_path / "spend.json"))
+    with _server("/feed_model/{model}", handler) as end_point:
+        api = APIInterface(_state(end_point, reviews={"p": chunks}))
+        api.governor = governor  # Both chunks are admitted concurrently, only one fits
+        output = _run_extraction(api)
+
+    assert sent == [2]
+    assert len(_extracted_ids(output)) == 2 and len(governor.deferred_ids) == 2
+    assert not set(_extracted_ids(output)) & governor.deferred_ids
+    assert governor.report.input_tokens == prompt_tokens + 20
+
+def test_halves_of_an_admitted_chunk_are_not_deferred(tmp_path):
+    sent = []
+    async def handler(request):
+        reviews = await request.json()
+        sent.append(len(reviews))
+        if len(reviews) > 1:
+            return web.json_response({"detail": "too big"}, status=413)
+        return web.json_response(_keywords_for(reviews))
+
+    prompt_tokens = count_tokens([MODEL_SYS_PROMPTS["default"]])[0]
+    # Room for the chunk, but not for its halves on top of the chunk's own reservation
+    governor = BudgetGovernor(PRICE, prompt_tokens, max_tokens=prompt_tokens + 2 * 70 + 10, ledger=SpendLedger(tmp_path / "spend.json"))
+    with _server("/feed_model/{model}", handler) as end_point:
+        api = APIInterface(_state(end_point, reviews={"p": deque([deque(_review(i) for i in range(2))])}))
+        api.governor = governor
+        output = _run_extraction(api)
+
+    assert sorted(sent) == [1, 1, 2]
+    assert _extracted_ids(output) == ["0", "1"] and not governor.deferred_ids
+
+def test_truncated_responses_are_charged(tmp_path):
+    async def handler(request):
+        reviews = await request.json()
+        if len(reviews) > 1:
+            return web.json_response({"detail": "Claude: MAX TOKEN REACHED"}, status=413)
+        return web.json_response(_keywords_for(reviews))
+
+    prompt_tokens = count_tokens([MODEL_SYS_PROMPTS["default"]])[0]
+    governor = BudgetGovernor(PRICE, prompt_tokens, max_tokens=10**6, ledger=SpendLedger(tmp_path / "spend.json"))
+    with _server("/feed_model/{model}", handler) as end_point:
+        api = APIInterface(_state(end_point, reviews={"p": deque([deque(_review(i) for i in range(2))])}))
+        api.governor = governor
+        _run_extraction(api)
+
+    # The truncated request (input plus a max_tokens response), then its two halves
+    assert governor.report.input_tokens == (prompt_tokens + 20) + 2 * (prompt_tokens + 10)
+    assert governor.report.output_tokens > MODEL_TOKEN_LIMITS[ModelType.CLAUDE]
+    governor.close()
+    next_run = BudgetGovernor(PRICE, prompt_tokens, max_tokens=10**6, ledger=SpendLedger(tmp_path / "spend.json"))
+    assert next_run.report.remaining_tokens < 10**6 - MODEL_TOKEN_LIMITS[ModelType.CLAUDE]
@@ -0,0 +1,96 @@
+from Simple.src.utils.chunk_sizer import ChunkSizer, WINDOW
+from Simple.src.utils import api_interface
+from Simple.src.utils.api_interface import APIInterface
+from Simple.src.utils.retry import APIRequestError
+from Simple.src.types.models import ModelType
+from Simple.src.types.reviews import ReviewRecord
+from Simple.src.types.chunking import ChunkStrategy
+from Simple.data.chunking import plan_chunks
+from Simple.tests.api_interface_test import _server, _state, _keywords_for, _extracted_ids, _run_extraction
+
+from collections import deque
+from aiohttp import web
+
+def _sizer(tmp_path, **kwargs) -> ChunkSizer:
+    return ChunkSizer(ModelType.CLAUDE, input_limit=2000, output_limit=2000, path=tmp_path / "sizing.json", **kwargs)
+
+def _large_review(idx: int) -> ReviewRecord:
+    return ReviewRecord(review_id=str(idx), product_id="p", rating=5, summary="", text=f"review {idx}", date=0, cached_token_count=100)
+
+def _window(sizer: ChunkSizer, reviews_per_second: float, truncated: int = 0) -> None:
+    """One sizing window of requests at the current target, a few keywords each."""
+    for idx in range(WINDOW):
+        if idx < truncated:
+            sizer.observe_truncation(1.0)
+        else:
+            sizer.observe(sizer.target, reviews=int(reviews_per_second), keywords=10, output_tokens=100, seconds=1.0)
+
+def test_truncation_detail_is_told_apart_from_an_oversized_input():
+    assert APIRequestError(413, "Claude: MAX TOKEN REACHED").is_truncated
+    assert not APIRequestError(413, "Input content exceeded token limit of 2048!").is_truncated
+
+def test_too_many_truncations_shrink_the_target(tmp_path):
+    sizer = _sizer(tmp_path, max_truncation_rate=0.1)
+    _window(sizer, 10, truncated=2)
+    assert sizer.target == 1400
+    _window(sizer, 10, truncated=0)
+    assert sizer.target == 1750
+
+def test_target_stays_under_the_predicted_output_limit(tmp_path):
+    sizer = _sizer(tmp_path)
+    # 0.5 keywords per token at 10 output tokens each: 320 tokens of reviews fill 80% of a 2000 token response
+    for _ in range(WINDOW):
+        sizer.observe(200, reviews=5, keywords=100, output_tokens=1000, seconds=1.0)
+    assert sizer.ceiling() == 320
+    assert sizer.target == 320
+
+def test_slower_bigger_chunks_fall_back_to_the_fastest_target(tmp_path):
+    sizer = _sizer(tmp_path, stats=None)
+    sizer.stats.target_tokens = 800
+    _window(sizer, 10)
+    assert sizer.target == 1000
+    _window(sizer, 5)
+    assert sizer.target == 800
+    _window(sizer, 10)
+    assert sizer.target == 900  # Halfway to the size that was slower
+
+def test_target_grows_to_a_whole_planned_chunk(tmp_path):
+    token_limit, prompt_tokens = 2048, 150
+    planned = plan_chunks([10] * 400, token_limit, prompt_tokens, ChunkStrategy.GREEDY)
+    planned_tokens = 10 * len(planned[0])
+    sizer = ChunkSizer(ModelType.CLAUDE, token_limit - prompt_tokens, token_limit, path=tmp_path / "sizing.json")
+    sizer.stats.target_tokens = 200
+
+    for _ in range(20):
+        # Fixed overhead per request: bigger requests keep getting more reviews through per second
+        for _ in range(WINDOW):
+            sizer.observe(sizer.target, reviews=sizer.target // 10, keywords=10, output_tokens=100, seconds=1.0)
+    assert sizer.target >= planned_tokens > token_limit - 2 * prompt_tokens
+
+def test_learned_sizing_is_carried_over_per_model(tmp_path):
+    sizer = _sizer(tmp_path)
+    _window(sizer, 10, truncated=WINDOW)
+    sizer.save()
+    loaded = ChunkSizer.load(ModelType.CLAUDE, 2000, 2000, path=tmp_path / "sizing.json")
+    assert loaded.target == 1400 and loaded.stats.requests == WINDOW
+    assert ChunkSizer.load(ModelType.GPT4, 2000, 2000, path=tmp_path / "sizing.json").target == 2000
+
+def test_chunks_are_cut_to_the_target_at_dispatch(tmp_path, monkeypatch):
+    monkeypatch.setattr(api_interface, "CHUNK_SIZING_PATH", tmp_path / "sizing.json")
+    sizer = _sizer(tmp_path)
+    sizer.stats.target_tokens = 200  # Two 100 token reviews per request
+    sizer.save()
+
+    sent = []
+    async def handler(request):
+        reviews = await request.json()
+        sent.append(len(reviews))
+        return web.json_response(_keywords_for(reviews))
+
+    with _server("/feed_model/{model}", handler) as end_point:
+        state = _state(end_point, adaptive_chunking=True, max_truncation_rate=0.05,
+                       reviews={"p": deque([deque(map(_large_review, range(5)))])})
+        output = _run_extraction(APIInterface(state))
+
+    assert sent == [2, 2, 1]
+    assert _extracted_ids(output) == ["0", "1", "2", "3", "4"]
@@ -0,0 +1,115 @@
+from Simple.data import chunking
+from Simple.data.chunking import ChunkEngine, greedy_ranges, plan_chunks
+from Simple.src.types.chunking import ChunkStrategy
+from Simple.src.types.reviews import ReviewRecord
+
+import random
+
+def _product(prod_id: str, counts: list[int]) -> list[ReviewRecord]:
+    reviews = []
+    for idx, count in enumerate(counts):
+        review = ReviewRecord(review_id=f"{prod_id}-{idx}", product_id=prod_id, rating=5, summary="", text="", date=0)
+        review.cached_token_count = count
+        reviews.append(review)
+    return reviews
+
+## greedy planning tests
+def test_greedy_ranges_splits_in_order():
+    # limit 100 with a 20 token prompt leaves 80 tokens per chunk
+    assert greedy_ranges([30, 30, 30, 50, 10], token_limit=100, prompt_tokens=20) == [(0, 2), (2, 4), (4, 5)]
+
+def test_greedy_ranges_oversized_review_gets_own_chunk():
+    assert greedy_ranges([500, 10], token_limit=100, prompt_tokens=20) == [(0, 1), (1, 2)]
+
+def test_greedy_ranges_empty():
+    assert greedy_ranges([], token_limit=100, prompt_tokens=20) == []
+
+## bin-packing tests
+def test_packing_strategies_respect_capacity_and_cover_every_review():
+    rng = random.Random(1)
+    counts = [rng.randint(1, 70) for _ in range(300)]
+    greedy = plan_chunks(counts, token_limit=120, prompt_tokens=20, strategy=ChunkStrategy.GREEDY)
+
+    for strategy in (ChunkStrategy.FIRST_FIT_DECREASING, ChunkStrategy.BEST_FIT_DECREASING):
+        chunks = plan_chunks(counts, token_limit=120, prompt_tokens=20, strategy=strategy)
+        assert sorted(i for chunk in chunks for i in chunk) == list(range(len(counts)))
+        assert all(sum(counts[i] for i in chunk) <= 100 for chunk in chunks)
+        assert all(chunk == sorted(chunk) for chunk in chunks)
+        assert len(chunks) < len(greedy)
+
+def test_packing_fills_gaps_greedy_leaves():
+    # Greedy: [60] [60] [30, 30] -> 3 chunks, decreasing strategies pair each 60 with a 30.
+    counts = [60, 60, 30, 30]
+    assert len(plan_chunks(counts, 100, 10, ChunkStrategy.GREEDY)) == 3
+    assert plan_chunks(counts, 100, 10, ChunkStrategy.FIRST_FIT_DECREASING) == [[0, 2], [1, 3]]
+    assert plan_chunks(counts, 100, 10, ChunkStrategy.BEST_FIT_DECREASING) == [[0, 2], [1, 3]]
+
+def test_packing_oversized_review_gets_own_chunk():
+    assert plan_chunks([500, 10], 100, 20, ChunkStrategy.BEST_FIT_DECREASING) == [[0], [1]]
+
+def test_engine_report_counts_saved_requests():
+    with ChunkEngine(token_limit=110, prompt_tokens=10, strategy=ChunkStrategy.BEST_FIT_DECREASING, processes=1) as engine:
+        engine.add("p", _product("p", [60, 60, 30, 30]))
+        engine.flush()
+    assert engine.report.chunks == 2
+    assert engine.report.greedy_chunks == 3
+    assert engine.report.requests_saved == 1
+    assert engine.report.prompt_overhead_tokens == 20
+    assert engine.report.fill_ratio == 0.9
+
+## engine tests
+def test_parallel_engine_matches_inline(monkeypatch):
+    rng = random.Random(0)
+    products = [(f"p{i}", _product(f"p{i}", [rng.randint(1, 60) for _ in range(rng.randint(1, 40))])) for i in range(50)]
+
+    with ChunkEngine(token_limit=120, prompt_tokens=20, processes=1) as engine:
+        for prod_id, reviews in products:
+            engine.add(prod_id, reviews)
+        inline = engine.flush()
+
+    monkeypatch.setattr(chunking, "PARALLEL_THRESHOLD", 0)
+    with ChunkEngine(token_limit=120, prompt_tokens=20, processes=2) as engine:
+        for prod_id, reviews in products:
+            engine.add(prod_id, reviews)
+        parallel = engine.flush()
+
+    as_ids = lambda result: [(prod_id, [[r.review_id for r in chunk] for chunk in chunks]) for prod_id, chunks in result]
+    assert as_ids(parallel) == as_ids(inline)
+
+    monkeypatch.setattr(chunking, "PARALLEL_THRESHOLD", 0)
+    with ChunkEngine(token_limit=120, prompt_tokens=20, strategy=ChunkStrategy.FIRST_FIT_DECREASING, processes=2) as engine:
+        for prod_id, reviews in products:
+            engine.add(prod_id, reviews)
+        packed = engine.flush()
+    assert engine.report.chunks < engine.report.greedy_chunks
+    assert sum(len(chunk) for _, chunks in packed for chunk in chunks) == engine.report.reviews
+
+def test_chunks_reference_parent_reviews():
+    reviews = _product("p", [10, 10, 10])
+    with ChunkEngine(token_limit=40, prompt_tokens=20, processes=1) as engine:
+        engine.add("p", reviews)
+        [(prod_id, chunks)] = engine.flush()
+    assert prod_id == "p"
+    assert chunks[0][0] is reviews[0]
+
+## cross-product packing tests
+def test_cross_product_packs_long_tail_products():
+    products = [(f"p{i}", _product(f"p{i}", [10, 10])) for i in range(10)]
+    products.append(("big", _product("big", [60, 60, 60])))
+
+    with ChunkEngine(token_limit=110, prompt_tokens=10, cross_product=True, processes=1) as engine:
+        for prod_id, reviews in products:
+            engine.add(prod_id, reviews)
+        result = dict(engine.flush())
+
+    assert list(result["big"]) and all(r.product_id == "big" for chunk in result["big"] for r in chunk)
+    packed = result[f"{chunking.PACKED_KEY_PREFIX}0"]
+    # 10 products of 20 tokens fit 5 to a 100 token chunk
+    assert len(packed) == 2
+    for chunk in packed:
+        # A product's reviews are never split across packed chunks
+        ids = [r.product_id for r in chunk]
+        assert all(ids.count(prod_id) == 2 for prod_id in set(ids))
+    assert engine.report.packed_products == 10
+    assert engine.report.chunks == 5
+    assert engine.report.requests_saved == 8
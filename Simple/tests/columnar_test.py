@@ -0,0 +1,71 @@
+from Simple.data.parsers import AmazonParser
+from Simple.data import columnar
+from Simple.data.columnar import ColumnarStore
+from Simple.src.types.reviews import ReviewFilter
+
+import pyarrow.parquet as pq
+import csv
+
+HEADER = ["Id", "ProductId", "UserId", "ProfileName", "HelpfulnessNumerator", "HelpfulnessDenominator", "Score", "Time", "Summary", "Text"]
+
+def _write_dataset(path, rows: int):
+    path.mkdir(parents=True)
+    with open(path / "Reviews.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for i in range(1, rows + 1):
+            writer.writerow([i, f"P{i % 5}", "user", "name", 0, 0, i % 5 + 1, 1000 + i, f"summary {i}", f"Text, with \"quotes\"\nand newline {i}"])
+    return path
+
+def _ids(parser):
+    return sorted(int(review.review_id) for review in parser._parse())
+
+def test_columnar_reads_same_reviews_as_csv(tmp_path):
+    source = _write_dataset(tmp_path / "amazon", 50)
+    csv_reviews = {r.review_id: r for r in AmazonParser(source, 1000)._parse()}
+    col_reviews = {r.review_id: r for r in AmazonParser(source, 1000, use_columnar=True)._parse()}
+
+    assert csv_reviews.keys() == col_reviews.keys()
+    assert all(csv_reviews[k].text == col_reviews[k].text for k in csv_reviews)
+    assert (source / ".columnar" / "Reviews.parquet").exists()
+
+def test_columnar_filter_pushdown_matches_csv_filter(tmp_path):
+    source = _write_dataset(tmp_path / "amazon", 50)
+    review_filter = ReviewFilter(product_ids={"P1", "P3"}, min_rating=3, start_time=1010, end_time=1045)
+
+    expected = _ids(AmazonParser(source, 1000, review_filter=review_filter))
+    assert expected
+    assert _ids(AmazonParser(source, 1000, review_filter=review_filter, use_columnar=True)) == expected
+
+def test_columnar_store_rebuilds_when_source_changes(tmp_path):
+    source = _write_dataset(tmp_path / "amazon", 10)
+    store = ColumnarStore(source, AmazonParser.COLUMN_TYPES, sort_by="ProductId")
+    assert not store.is_fresh()
+    store.ensure()
+    assert store.is_fresh()
+
+    with open(source / "Reviews.csv", "a", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerow([11, "P9", "user", "name", 0, 0, 5, 2000, "new", "appended review"])
+    assert not store.is_fresh()
+    assert 11 in _ids(AmazonParser(source, 1000, use_columnar=True))
+
+def test_columnar_store_is_sorted_across_row_groups(tmp_path, monkeypatch):
+    source = _write_dataset(tmp_path / "amazon", 50)
+    monkeypatch.setattr(columnar, "ROW_GROUP_SIZE", 16)
+    monkeypatch.setattr(columnar, "READ_BLOCK_BYTES", 256)
+    # Room for a few rows only: the sort has to spill runs and merge them
+    ColumnarStore(source, AmazonParser.COLUMN_TYPES, sort_by="ProductId", memory_budget=2048).build()
+
+    parquet = pq.ParquetFile(source / ".columnar" / "Reviews.parquet")
+    assert parquet.num_row_groups > 1
+    products = parquet.read(columns=["ProductId"]).column(0).to_pylist()
+    assert products == sorted(products)
+
+    product_column = parquet.schema_arrow.get_field_index("ProductId")
+    ranges = [
+        (stats.min, stats.max)
+        for stats in (parquet.metadata.row_group(group).column(product_column).statistics for group in range(parquet.num_row_groups))
+    ]
+    assert all(prev_max < next_min for (_, prev_max), (next_min, _) in zip(ranges, ranges[1:]))
+    assert sum(low <= "P1" <= high for low, high in ranges) == 1  # A product filter only matches one row group
+    assert _ids(AmazonParser(source, 1000, use_columnar=True)) == list(range(1, 51))
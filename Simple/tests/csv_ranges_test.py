@@ -0,0 +1,57 @@
+from Simple.data import csv_ranges
+from Simple.data.csv_ranges import record_aligned_ranges, parallel_csv_reviews
+from Simple.data.parsers import AmazonParser
+
+import csv
+import io
+
+HEADER = ["Id", "ProductId", "UserId", "ProfileName", "HelpfulnessNumerator", "HelpfulnessDenominator", "Score", "Time", "Summary", "Text"]
+
+def _write_csv(path, start: int, rows: int):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for i in range(start, start + rows):
+            # Quoted newlines and escaped quotes must never be mistaken for record boundaries
+            writer.writerow([i, f"P{i % 7}", "u", "n", 0, 0, i % 5 + 1, 1000 + i, "s", f'line one\n"quoted" line, two {i}\n' * (i % 4)])
+    return path
+
+def test_ranges_align_to_records(tmp_path):
+    path = _write_csv(tmp_path / "r.csv", 1, 300)
+    fieldnames, ranges = record_aligned_ranges(path, target_bytes=500)
+    assert fieldnames == HEADER
+    assert len(ranges) > 10
+
+    data = path.read_bytes()
+    ids = []
+    for start, end in ranges:
+        rows = list(csv.DictReader(io.StringIO(data[start:end].decode(), newline=""), fieldnames=fieldnames))
+        ids.extend(int(row["Id"]) for row in rows)
+    assert ids == list(range(1, 301))
+
+def test_ranges_with_small_scan_blocks(tmp_path, monkeypatch):
+    path = _write_csv(tmp_path / "r.csv", 1, 100)
+    expected = record_aligned_ranges(path, target_bytes=700)
+    monkeypatch.setattr(csv_ranges, "SCAN_BLOCK_BYTES", 37)
+    assert record_aligned_ranges(path, target_bytes=700) == expected
+
+def test_parallel_ingest_matches_sequential_with_global_cap(tmp_path, monkeypatch):
+    source = tmp_path / "amazon"
+    source.mkdir()
+    _write_csv(source / "a.csv", 1, 120)
+    _write_csv(source / "b.csv", 1000, 120)
+    monkeypatch.setattr(csv_ranges, "RANGE_BYTES", 2000)
+    assert all(len(record_aligned_ranges(source / name)[1]) > 1 for name in ("a.csv", "b.csv"))
+
+    for cap in (1, 50, 130, 1000):
+        sequential = [r.review_id for r in AmazonParser(source, cap)._parse()]
+        parallel = [r.review_id for r in AmazonParser(source, cap, parallel_ingest=True)._parse()]
+        assert parallel == sequential
+        assert len(parallel) == min(cap, 240)
+
+def test_parallel_ingest_uses_several_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(csv_ranges, "RANGE_BYTES", 1000)
+    path = _write_csv(tmp_path / "r.csv", 1, 200)
+    assert len(record_aligned_ranges(path)[1]) > 2
+    reviews = list(parallel_csv_reviews([path], AmazonParser._review_from_row, max_reviews=150, processes=2))
+    assert [int(r.review_id) for r in reviews] == list(range(1, 151))
@@ -0,0 +1,49 @@
+from Simple.src.processing.dedup import deduplicate, expand_duplicate_keywords, minhash
+from Simple.src.types.API import LLMOutput
+from Simple.src.types.reviews import ReviewRecord
+
+import numpy as np
+
+BASE = (
+    "I bought these dog treats for my beagle and she absolutely loves them, they arrived quickly "
+    "and the bag was sealed well, the price is fair and I will definitely order them again next month"
+)
+
+def _review(idx: int, text: str) -> ReviewRecord:
+    return ReviewRecord(review_id=str(idx), product_id="p", rating=5, summary="", text=text, date=0)
+
+## minhash tests
+def test_minhash_is_deterministic():
+    assert np.array_equal(minhash(BASE), minhash(BASE))
+
+def test_minhash_similarity_tracks_overlap():
+    unrelated = "Terrible coffee, bitter and stale. The grounds were everywhere and customer service never replied."
+    assert np.mean(minhash(BASE) == minhash(BASE + " Thanks!")) > 0.8
+    assert np.mean(minhash(BASE) == minhash(unrelated)) < 0.2
+
+## dedup tests
+def test_deduplicate_collapses_near_duplicates_onto_first():
+    reviews = [
+        _review(0, BASE),
+        _review(1, "Great tea, smooth and not bitter at all, my new morning favourite."),
+        _review(2, BASE.upper() + "!!!"), # normalization ignores case and punctuation
+        _review(3, BASE + " Five stars."),
+    ]
+    kept, duplicates = deduplicate(reviews, threshold=0.8)
+    assert [r.review_id for r in kept] == ["0", "1"]
+    assert duplicates == {"0": ["2", "3"]}
+
+def test_deduplicate_keeps_distinct_reviews():
+    reviews = [_review(i, f"review number {i} talks about a completely different flavour {i * 7}") for i in range(5)]
+    kept, duplicates = deduplicate(reviews, threshold=0.8)
+    assert kept == reviews
+    assert duplicates == {}
+
+def test_expand_duplicate_keywords():
+    output = LLMOutput(product_id="p", keywords=[
+        {"product_id": "p", "review_id": "0", "keyword": "treats", "sentiment": 0.9, "embedding": [0.1]},
+        {"product_id": "p", "review_id": "1", "keyword": "tea", "sentiment": 0.5},
+    ])
+    expand_duplicate_keywords([output], {"0": ["2", "3"]})
+    assert [(kw.review_id, kw.keyword) for kw in output.keywords] == [("0", "treats"), ("1", "tea"), ("2", "treats"), ("3", "treats")]
+    assert output.keywords[3].embedding == [0.1]
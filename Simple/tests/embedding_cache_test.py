@@ -0,0 +1,77 @@
+from Simple.src.utils.embedding_cache import EmbeddingCache, normalize_text
+from Simple.src.utils import api_interface
+from Simple.src.utils.api_interface import APIInterface
+from Simple.src.types.models import EmbeddingModel
+from Simple.src.types.API import LLMOutput
+from Simple.tests.api_interface_test import _server, _state, _embed
+
+from collections import deque
+from aiohttp import web
+
+import numpy as np
+
+def test_vectors_roundtrip_through_both_tiers(tmp_path):
+    vector = [0.1, -0.25, 3.0]
+    cache = EmbeddingCache(tmp_path / "emb.sqlite", lru_entries=1)
+    cache.put_many(EmbeddingModel.TEXT_SMALL3, 3, {"taste": vector, "price": [1.0, 2.0, 3.0]})
+
+    # "taste" was pushed out of the single-entry LRU, it comes back from disk
+    assert cache.get_many(EmbeddingModel.TEXT_SMALL3, 3, ["price", "taste", "smell"]) == {
+        "price": [1.0, 2.0, 3.0],
+        "taste": np.float32(vector).tolist()
+    }
+    assert (cache.memory_hits, cache.disk_hits, cache.misses) == (1, 1, 1)
+
+    # A new process only has the disk tier
+    reopened = EmbeddingCache(tmp_path / "emb.sqlite")
+    assert reopened.get_many(EmbeddingModel.TEXT_SMALL3, 3, ["taste"]) == {"taste": np.float32(vector).tolist()}
+    assert (reopened.memory_hits, reopened.disk_hits, reopened.misses) == (0, 1, 0)
+
+def test_cache_is_keyed_by_model_and_dimensions(tmp_path):
+    cache = EmbeddingCache(tmp_path / "emb.sqlite")
+    cache.put_many(EmbeddingModel.TEXT_SMALL3, 3, {"taste": [1.0, 2.0, 3.0]})
+    assert cache.get_many(EmbeddingModel.TEXT_LARGE3, 3, ["taste"]) == {}
+    assert cache.get_many(EmbeddingModel.TEXT_SMALL3, 2, ["taste"]) == {}
+
+def test_normalized_text_shares_one_entry():
+    assert normalize_text("  Great   Taste ") == normalize_text("great taste") == "great taste"
+
+def test_second_run_only_embeds_new_keywords(tmp_path, monkeypatch):
+    cache = EmbeddingCache(tmp_path / "emb.sqlite")
+    monkeypatch.setattr(api_interface, "get_embedding_cache", lambda: cache)
+    requested = []
+    async def handler(request):
+        texts = (await request.json())["texts"]
+        requested.extend(texts)
+        return web.json_response({"model": "m", "embeddings": [[float(len(text))] for text in texts]})
+
+    def outputs(words: list[str]) -> deque[LLMOutput]:
+        return deque([LLMOutput(product_id="p", keywords=[
+            {"product_id": "p", "review_id": str(i), "keyword": word, "sentiment": 0.0} for i, word in enumerate(words)
+        ])])
+
+    with _server("/embed_texts/{model}", handler) as end_point:
+        api = APIInterface(_state(end_point, embedding_cache=True))
+        _embed(api, outputs(["Taste", "price"]))
+        second = outputs(["taste ", "price", "smell"])
+        _embed(api, second)
+
+    assert requested == ["Taste", "price", "smell"]  # Normalized for the cache key only
+    assert (cache.memory_hits, cache.misses) == (2, 3)
+    assert [kw.embedding for kw in second[0].keywords] == [[5.0], [5.0], [5.0]]
+
+def test_keywords_are_embedded_as_returned_without_the_cache():
+    requested = []
+    async def handler(request):
+        texts = (await request.json())["texts"]
+        requested.extend(texts)
+        return web.json_response({"model": "m", "embeddings": [[float(len(text))] for text in texts]})
+
+    outputs = deque([LLMOutput(product_id="p", keywords=[
+        {"product_id": "p", "review_id": str(i), "keyword": word, "sentiment": 0.0} for i, word in enumerate(["Taste ", "taste", "taste"])
+    ])])
+    with _server("/embed_texts/{model}", handler) as end_point:
+        _embed(APIInterface(_state(end_point)), outputs)
+
+    assert requested == ["Taste ", "taste"]
+    assert [kw.embedding for kw in outputs[0].keywords] == [[6.0], [5.0], [5.0]]
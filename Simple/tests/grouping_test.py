@@ -0,0 +1,32 @@
+from Simple.data.grouping import group_by_key
+
+def _items():
+    # (product_id, review_id) pairs with products interleaved across the stream
+    return [(f"p{i % 7}", f"r{i}") for i in range(200)]
+
+def test_in_memory_grouping_keeps_first_seen_order():
+    groups = list(group_by_key(_items(), key=lambda it: it[0], sizeof=lambda it: 1, memory_budget=10_000))
+    assert [key for key, _ in groups] == [f"p{i}" for i in range(7)]
+    assert sum(len(group) for _, group in groups) == 200
+
+def test_ordered_in_memory_grouping_is_in_key_order():
+    items = list(reversed(_items()))
+    groups = list(group_by_key(items, key=lambda it: it[0], sizeof=lambda it: 1, memory_budget=10_000, ordered=True))
+    assert [key for key, _ in groups] == [f"p{i}" for i in range(7)]
+
+def test_spilled_grouping_yields_each_key_once():
+    groups = list(group_by_key(_items(), key=lambda it: it[0], sizeof=lambda it: 1, memory_budget=16))
+    keys = [key for key, _ in groups]
+    assert keys == sorted(set(keys))
+    assert sum(len(group) for _, group in groups) == 200
+
+def test_spilled_grouping_preserves_input_order_within_key():
+    expected = {}
+    for product_id, review_id in _items():
+        expected.setdefault(product_id, []).append(review_id)
+
+    for key, group in group_by_key(_items(), key=lambda it: it[0], sizeof=lambda it: 1, memory_budget=16):
+        assert [review_id for _, review_id in group] == expected[key]
+
+def test_empty_stream():
+    assert list(group_by_key([], key=lambda it: it, sizeof=lambda it: 1, memory_budget=16)) == []
@@ -0,0 +1,59 @@
+from Simple.src.utils.http_client import APIClient
+from Simple.src.utils.api_interface import APIInterface
+from Simple.src.utils.retry import APIRequestError
+from Simple.src.types.models import MODEL_TOKEN_LIMITS, ModelType
+from Simple.tests.api_interface_test import _server, _state
+
+from aiohttp import web
+
+import asyncio
+import pytest
+
+def test_requests_reuse_pooled_connections():
+    peers = set()
+    async def handler(request):
+        peers.add(request.transport.get_extra_info("peername"))
+        return web.json_response({"ok": True})
+
+    async def send(end_point: str) -> list:
+        async with APIClient(end_point, connections_per_host=2) as client:
+            return await asyncio.gather(*(client.post("/echo", {"i": i}) for i in range(20)))
+
+    with _server("/echo", handler) as end_point:
+        assert asyncio.run(send(end_point)) == [{"ok": True}] * 20
+    assert len(peers) <= 2
+
+def test_errors_carry_status_detail_and_retry_after():
+    async def handler(request):
+        return web.json_response({"detail": "slow down"}, status=429, headers={"Retry-After": "2.5"})
+
+    with _server("/echo", handler) as end_point:
+        with pytest.raises(APIRequestError) as error:
+            APIClient(end_point).request_sync("POST", "/echo", {})
+    assert (error.value.status, error.value.detail, error.value.retry_after) == (429, "slow down", 2.5)
+
+def test_token_limit_falls_back_to_known_limit():
+    async def handler(request):
+        return web.json_response({"detail": "down"}, status=503)
+
+    with _server("/unused", handler) as end_point:
+        api = APIInterface(_state(end_point))
+        assert api.get_token_limit(from_source=True) == MODEL_TOKEN_LIMITS[ModelType.CLAUDE]
+
+def test_http2_transport_sends_and_raises_like_the_default():
+    pytest.importorskip("h2")
+    async def handler(request):
+        body = await request.json()
+        if body.get("fail"):
+            return web.json_response({"detail": "slow down"}, status=429, headers={"Retry-After": "1"})
+        return web.json_response(body)
+
+    async def send(end_point: str) -> list:
+        async with APIClient(end_point, http2=True) as client:
+            return await asyncio.gather(*(client.post("/echo", {"i": i}) for i in range(5)))
+
+    with _server("/echo", handler) as end_point:
+        assert asyncio.run(send(end_point)) == [{"i": i} for i in range(5)]
+        with pytest.raises(APIRequestError) as error:
+            APIClient(end_point, http2=True).request_sync("POST", "/echo", {"fail": True})
+    assert (error.value.status, error.value.detail, error.value.retry_after) == (429, "slow down", 1.0)
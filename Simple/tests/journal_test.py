@@ -0,0 +1,78 @@
+from Simple.data.journal import ExtractionJournal, find_journal, journal_path, new_header, roll_back_outputs
+from Simple.data.keyword_writer import KeywordWriter
+from Simple.src.utils.api_interface import APIInterface
+from Simple.src.types.API import LLMOutput
+from Simple.src.types.reviews import SamplingStrategy
+from Simple.data.parsers import AmazonParser
+from Simple.tests.columnar_test import _write_dataset
+from Simple.tests.api_interface_test import _server, _state, _review, _keywords_for, _extracted_ids
+
+from collections import deque
+from pathlib import Path
+from aiohttp import web
+
+def _output(review_id: str) -> LLMOutput:
+    return LLMOutput(product_id="p", keywords=[{"product_id": "p", "review_id": review_id, "keyword": "k", "sentiment": 1.0, "embedding": [0.5]}])
+
+def test_journal_survives_a_torn_last_entry(tmp_path):
+    path = journal_path(tmp_path, "run")
+    journal = ExtractionJournal.create(path, new_header(tmp_path, Path("data/amazon"), "run", merge=False))
+    journal.append(["a"], [_output("1")])
+    journal.append(["b", "c"], [_output("2"), _output("3")])
+    journal.close()
+    with path.open("a") as jf:
+        jf.write('{"chunks": ["d"], "outp')  # Crashed mid-write
+
+    assert find_journal(tmp_path, Path("data/amazon")) == path
+    assert find_journal(tmp_path, Path("data/yelp")) is None
+    resumed = ExtractionJournal.load(path)
+    assert resumed.done == {"a", "b", "c"}
+    assert [out.keywords[0].embedding for out in resumed.outputs] == [[0.5]] * 3
+
+    resumed.append(["d"], [_output("4")])
+    resumed.close()
+    assert ExtractionJournal.load(path).done == {"a", "b", "c", "d"}
+
+def test_resume_draws_the_same_stratified_sample(tmp_path):
+    source = _write_dataset(tmp_path / "amazon", 60)
+    path = journal_path(tmp_path, "run")
+    ExtractionJournal.create(path, new_header(tmp_path, source, "run", merge=False, sampling_seed=7)).close()
+    seed = ExtractionJournal.load(path).header.sampling_seed
+
+    def sample(sampling_seed: int) -> list[str]:
+        parser = AmazonParser(source, 10, sampling=SamplingStrategy.STRATIFIED, sampling_seed=sampling_seed)
+        return [review.review_id for review in parser._reviews()]
+    assert seed == 7 and sample(seed) == sample(7)
+    assert any(sample(seed) != sample(other) for other in range(8, 12))
+
+def test_roll_back_restores_merged_files(tmp_path):
+    with KeywordWriter(tmp_path, "run") as writer:
+        writer.write([_output("1")])
+    before = writer.keyword_path.read_text()
+    header = new_header(tmp_path, Path("data/amazon"), "run", merge=True)
+    with KeywordWriter(tmp_path, "run", merge=True) as writer:
+        writer.write([_output("2")])
+
+    roll_back_outputs(tmp_path, header)
+    assert writer.keyword_path.read_text() == before
+
+def test_resume_only_extracts_unjournaled_chunks(tmp_path):
+    requested = []
+    async def extract(request):
+        reviews = await request.json()
+        requested.extend(r["review_id"] for r in reviews)
+        return web.json_response(_keywords_for(reviews))
+    async def embed(request):
+        return web.json_response({"model": "m", "embeddings": [[1.0] for _ in (await request.json())["texts"]]})
+
+    chunks = [[_review(i)] for i in range(4)]
+    with _server("/feed_model/{model}", extract, {"/embed_texts/{model}": embed}) as end_point:
+        api = APIInterface(_state(end_point, duplicates={}, reviews={"p": deque(deque(chunk) for chunk in chunks)}))
+        journal = ExtractionJournal.create(journal_path(tmp_path, "run"), new_header(tmp_path, Path("d"), "run", merge=False))
+        journal.append([api.chunk_key(chunks[0]), api.chunk_key(chunks[2])], [_output("0"), _output("2")])
+        output = api.get_llmOutput(journal=journal)
+        journal.close()
+
+    assert sorted(requested) == ["1", "3"]
+    assert _extracted_ids(list(output)) == ["1", "3"]
+    assert len(ExtractionJournal.load(journal.path).done) == 4
@@ -0,0 +1,28 @@
+from Simple.FastAPI.utils.outputs import split_by_product
+from Simple.src.types.reviews import Review
+
+def _review(review_id: str, product_id: str) -> Review:
+    return Review(review_id=review_id, product_id=product_id, rating=5, summary="", text="", date=0)
+
+def test_split_attributes_keywords_by_review():
+    reviews = [_review("1", "A"), _review("2", "B"), _review("3", "A")]
+    parsed = {"keywords": [
+        {"review_id": "1", "keyword": "taste", "sentiment": 0.8},
+        {"review_id": "2", "keyword": "price", "sentiment": -0.4},
+        {"review_id": 3, "keyword": "bag", "sentiment": 0.1},
+    ]}
+    outputs = {out.product_id: out for out in split_by_product(parsed, reviews)}
+
+    assert [kw.keyword for kw in outputs["A"].keywords] == ["taste", "bag"]
+    assert [kw.keyword for kw in outputs["B"].keywords] == ["price"]
+    assert all(kw.product_id == "A" for kw in outputs["A"].keywords)
+
+def test_split_drops_unknown_review_ids_in_mixed_chunks():
+    reviews = [_review("1", "A"), _review("2", "B")]
+    outputs = split_by_product({"keywords": [{"review_id": "99", "keyword": "x", "sentiment": 0}]}, reviews)
+    assert sum(len(out.keywords) for out in outputs) == 0
+    assert [out.product_id for out in outputs] == ["A", "B"]
+
+def test_split_single_product_keeps_unknown_review_ids():
+    outputs = split_by_product({"keywords": [{"review_id": "99", "keyword": "x", "sentiment": 0}]}, [_review("1", "A")])
+    assert len(outputs) == 1 and outputs[0].keywords[0].product_id == "A"
@@ -0,0 +1,54 @@
+from Simple.src.utils.response_cache import ResponseCache, response_key
+from Simple.src.utils import api_interface
+from Simple.src.utils.api_interface import APIInterface
+from Simple.src.types.models import ModelType
+from Simple.src.types.API import LLMOutput
+from Simple.tests.api_interface_test import _server, _state, _review, _keywords_for, _extracted_ids, _run_extraction
+
+from collections import deque
+from aiohttp import web
+
+def _output(product_id: str) -> LLMOutput:
+    return LLMOutput(product_id=product_id, keywords=[{"product_id": product_id, "review_id": "1", "keyword": "taste", "sentiment": 0.9}])
+
+def test_key_covers_model_prompt_and_chunk():
+    chunk = [_review(1).model_dump()]
+    key = response_key(ModelType.CLAUDE, "prompt", chunk)
+    assert key == response_key(ModelType.CLAUDE, "prompt", [_review(1).model_dump()])
+    assert key != response_key(ModelType.GPT4, "prompt", chunk)
+    assert key != response_key(ModelType.CLAUDE, "other prompt", chunk)
+    assert key != response_key(ModelType.CLAUDE, "prompt", [_review(2).model_dump()])
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    with ResponseCache(tmp_path / "responses.sqlite", max_entries=2) as cache:
+        for name in ("a", "b", "c"):
+            cache.put(name.encode(), [_output(name)])
+        assert cache.get(b"a")[0].product_id == "a"  # now the most recently used
+        assert cache.evict() == 1
+        assert cache.get(b"b") is None
+        assert [cache.get(key)[0].keywords[0].keyword for key in (b"a", b"c")] == ["taste", "taste"]
+
+def test_rerun_on_unchanged_chunks_sends_nothing(tmp_path, monkeypatch):
+    monkeypatch.setattr(api_interface, "RESPONSE_CACHE_PATH", tmp_path / "responses.sqlite")
+    sizes = []
+    async def handler(request):
+        reviews = await request.json()
+        sizes.append(len(reviews))
+        if len(reviews) > 2:
+            return web.json_response({"detail": "too big"}, status=413)
+        return web.json_response(_keywords_for(reviews))
+
+    def run(response_cache: bool) -> list[LLMOutput]:
+        state = _state(end_point, response_cache=response_cache, response_cache_entries=100,
+                       reviews={"p": deque([deque(_review(i) for i in range(4)), deque([_review(9)])])})
+        return _run_extraction(APIInterface(state))
+
+    with _server("/feed_model/{model}", handler) as end_point:
+        first = run(True)
+        sent = len(sizes)
+        second = run(True)
+        assert len(sizes) == sent  # Split chunks were cached as a whole too
+        run(False)
+        assert len(sizes) == 2 * sent
+
+    assert _extracted_ids(first) == _extracted_ids(second) == ["0", "1", "2", "3", "9"]
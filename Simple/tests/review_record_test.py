@@ -0,0 +1,23 @@
+from Simple.data.parsers import AmazonParser
+from Simple.src.types.reviews import Review, ReviewRecord
+
+import pickle
+
+ROW = {"Id": "7", "ProductId": "B001", "Score": "4", "Time": "1303862400", "Summary": "Tasty", "Text": "Good coffee."}
+
+def test_record_from_row_converts_types_like_validation_did():
+    record = AmazonParser._review_from_row(ROW)
+    assert (record.rating, record.date) == (4.0, 1303862400)
+
+def test_record_dumps_like_the_validated_model():
+    record = AmazonParser._review_from_row(ROW)
+    review = Review(review_id="7", product_id="B001", rating="4", summary="Tasty", text="Good coffee.", date="1303862400")
+    assert record.model_dump() == review.model_dump()
+    assert record.to_model() == review
+
+def test_record_pickles_with_its_token_count():
+    record = AmazonParser._review_from_row(ROW)
+    record.cached_token_count = 3
+    restored = pickle.loads(pickle.dumps(record))
+    assert restored == record
+    assert restored.token_count() == 3
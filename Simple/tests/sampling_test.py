@@ -0,0 +1,37 @@
+from Simple.data.sampling import stratified_sample
+
+from collections import Counter
+
+def _stream(products: dict[str, int]) -> list[tuple[int, str, int]]:
+    # (position, product, score), scores cycle through 1..5
+    rows = [(product, i % 5 + 1) for product, count in products.items() for i in range(count)]
+    return [(pos, product, score) for pos, (product, score) in enumerate(rows)]
+
+def _sample(items, n, group_cap=None, seed=0):
+    return stratified_sample(items, n, stratum=lambda it: (it[1], it[2]), group=lambda it: it[1], group_cap=group_cap, seed=seed)
+
+def test_sample_covers_small_products_before_large_ones():
+    # A head-of-file read would take 100 reviews of "big" only.
+    items = _stream({"big": 10_000, "a": 3, "b": 7, "c": 12})
+    sample = _sample(items, 100)
+    per_product = Counter(it[1] for it in sample)
+    assert len(sample) == 100
+    assert per_product["a"] == 3 and per_product["b"] == 7 and per_product["c"] == 12
+    assert per_product["big"] == 78
+
+def test_sample_balances_scores_and_respects_group_cap():
+    items = _stream({f"p{i}": 200 for i in range(10)})
+    sample = _sample(items, 100, group_cap=10)
+    assert all(count == 10 for count in Counter(it[1] for it in sample).values())
+    assert all(count == 2 for count in Counter((it[1], it[2]) for it in sample).values())
+
+def test_sample_keeps_stream_order_and_is_reproducible():
+    items = _stream({f"p{i}": 50 for i in range(40)})
+    sample = _sample(items, 300, seed=3)
+    assert sample == sorted(sample)
+    assert sample == _sample(items, 300, seed=3)
+    assert len(set(sample)) == 300
+
+def test_sample_smaller_than_n_returns_everything():
+    items = _stream({"a": 5, "b": 5})
+    assert _sample(items, 100) == items
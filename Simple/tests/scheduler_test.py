@@ -0,0 +1,47 @@
+from Simple.src.types.models import RateLimit
+from Simple.src.utils.scheduler import RequestScheduler, TokenBucket
+
+import asyncio
+import time
+
+def test_bucket_allows_a_burst_then_paces():
+    async def run():
+        bucket = TokenBucket(per_minute=600) # 10 per second
+        assert await bucket.acquire(600) == 0
+        start = time.monotonic()
+        await bucket.acquire(1)
+        return time.monotonic() - start
+    assert 0.08 <= asyncio.run(run()) < 0.5
+
+def test_bucket_caps_oversized_requests_at_capacity():
+    async def run():
+        bucket = TokenBucket(per_minute=6000)
+        return await bucket.acquire(10**9)
+    assert asyncio.run(run()) == 0
+
+def test_scheduler_respects_concurrency_cap():
+    peak = 0
+
+    async def request(scheduler: RequestScheduler):
+        nonlocal peak
+        async with scheduler.slot(tokens=10):
+            peak = max(peak, scheduler.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        scheduler = RequestScheduler(RateLimit(requests_per_minute=10_000, tokens_per_minute=10**6), max_concurrency=3)
+        await asyncio.gather(*(request(scheduler) for _ in range(20)))
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert peak == 3
+    assert (scheduler.sent, scheduler.in_flight) == (20, 0)
+
+def test_scheduler_throttles_on_tokens_per_minute():
+    async def run():
+        scheduler = RequestScheduler(RateLimit(requests_per_minute=10_000, tokens_per_minute=6_000), max_concurrency=10)
+        for _ in range(2):
+            async with scheduler.slot(tokens=3_050): # The second request is 100 tokens short, ~1s at 100 tokens/s
+                pass
+        return scheduler.throttled_seconds
+    assert 0.5 < asyncio.run(run()) < 1.5
@@ -0,0 +1,73 @@
+from Simple.src.utils.telemetry import Telemetry, get_telemetry
+from Simple.src.utils.retry import APIRequestError
+from Simple.src.utils.api_interface import APIInterface
+from Simple.tests.api_interface_test import _server, _state, _review, _keywords_for
+
+from collections import deque
+from aiohttp import web
+
+import pytest
+
+def test_stages_count_items_and_time():
+    telemetry = Telemetry()
+    assert list(telemetry.timed_iter("parse", ["a", "b", "c"])) == ["a", "b", "c"]
+    with telemetry.stage("extract", items=2, tokens=400):
+        pass
+    telemetry.add("extract", tokens=100)
+
+    summary = telemetry.summary()["stages"]
+    assert (summary["parse"]["items"], summary["parse"]["calls"]) == (3, 3)
+    assert (summary["extract"]["items"], summary["extract"]["tokens"], summary["extract"]["calls"]) == (2, 500, 1)
+
+def test_requests_record_latency_errors_and_in_flight():
+    telemetry = Telemetry()
+    with telemetry.request("feed_model"):
+        with telemetry.request("feed_model"):
+            pass
+    with pytest.raises(APIRequestError):
+        with telemetry.request("feed_model"):
+            raise APIRequestError(429, "slow down")
+
+    stats = telemetry.summary()["requests"]["feed_model"]
+    assert (stats["requests"], stats["errors"], stats["max_in_flight"]) == (3, {"429": 1}, 2)
+    assert stats["p50_seconds"] == 0.05 and sum(stats["buckets"].values()) == 3
+
+def test_prometheus_families_are_grouped(tmp_path):
+    telemetry = Telemetry()
+    with telemetry.stage("embed", items=3):
+        pass
+    with telemetry.request("embed_texts"):
+        pass
+    telemetry.sample_queue("extracted", 4)
+    telemetry.write_prometheus(tmp_path / "hearsay.prom")
+
+    lines = (tmp_path / "hearsay.prom").read_text().splitlines()
+    families = [line.split()[2] for line in lines if line.startswith("# TYPE")]
+    for family in families:
+        type_line = lines.index(next(line for line in lines if line.startswith(f"# TYPE {family} ")))
+        samples = [i for i, line in enumerate(lines) if line.split("{")[0].split()[0].removesuffix("_bucket").removesuffix("_sum").removesuffix("_count") == family]
+        assert samples == list(range(type_line + 1, type_line + 1 + len(samples)))
+    assert 'hearsay_request_duration_seconds_bucket{endpoint="embed_texts",le="+Inf"} 1' in lines
+    assert 'hearsay_queue_max_depth{queue="extracted"} 4' in lines
+
+def test_pipeline_reports_every_stage(tmp_path):
+    async def extract(request):
+        return web.json_response(_keywords_for(await request.json()))
+    embedded = []
+    async def embed(request):
+        texts = (await request.json())["texts"]
+        embedded.extend(texts)
+        return web.json_response({"model": "m", "embeddings": [[1.0] for _ in texts]})
+
+    get_telemetry().reset()
+    with _server("/feed_model/{model}", extract, {"/embed_texts/{model}": embed}) as end_point:
+        api = APIInterface(_state(end_point, duplicates={}, reviews={"p": deque(deque([_review(i)]) for i in range(3))}))
+        api.get_llmOutput()
+
+    summary = get_telemetry().summary()
+    assert summary["stages"]["extract"]["items"] == 3 and summary["stages"]["extract"]["tokens"] > 30
+    # How many chunks each embed request coalesces depends on timing, only what was sent is fixed
+    assert set(embedded) == {"k"}
+    assert summary["stages"]["embed"]["items"] == len(embedded)
+    assert summary["requests"]["feed_model"]["requests"] == 3
+    assert "extracted" in summary["queues"] and "embedded" in summary["queues"]
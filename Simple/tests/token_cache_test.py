@@ -0,0 +1,29 @@
+from Simple.src.utils.token_cache import TokenCountCache
+from Simple.src.utils.tokens import tokenize_reviews, count_tokens
+from Simple.src.types.reviews import ReviewRecord
+
+def _reviews(texts: list[str]) -> list[ReviewRecord]:
+    return [ReviewRecord(review_id=str(i), product_id="p", rating=5, summary="", text=text, date=0) for i, text in enumerate(texts)]
+
+def test_second_run_reads_counts_from_cache(tmp_path):
+    texts = ["Great coffee, would buy again.", "Arrived broken.", "Great coffee, would buy again."]
+    expected = count_tokens(texts)
+
+    with TokenCountCache(tmp_path / "tokens.sqlite") as cache:
+        reviews = _reviews(texts)
+        tokenize_reviews(reviews, cache=cache)
+        assert [r.token_count() for r in reviews] == expected
+        assert (cache.hits, cache.misses) == (0, 3)
+
+    with TokenCountCache(tmp_path / "tokens.sqlite") as cache:
+        reviews = _reviews(texts + ["New review."])
+        tokenize_reviews(reviews, cache=cache)
+        assert [r.token_count() for r in reviews] == expected + count_tokens(["New review."])
+        assert (cache.hits, cache.misses) == (3, 1)
+        assert cache.hit_rate == 0.75
+
+def test_cache_is_keyed_by_encoding(tmp_path):
+    with TokenCountCache(tmp_path / "tokens.sqlite") as cache:
+        cache.put_many([b"h"], [7], encoding="cl100k_base")
+        assert cache.get_many([b"h"], encoding="cl100k_base") == [7]
+        assert cache.get_many([b"h"], encoding="o200k_base") == [None]
@@ -0,0 +1,53 @@
+from Simple.data.parsers import AmazonParser
+from Simple.data.watermarks import load_watermark, save_watermark
+from Simple.src.types.watermark import Watermark
+
+import csv
+
+HEADER = ["Id", "ProductId", "Score", "Time", "Summary", "Text"]
+
+def _append_rows(path, ids: range, times: dict[int, int] | None = None):
+    new = not path.exists()
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if new:
+            writer.writerow(HEADER)
+        for i in ids:
+            writer.writerow([i, f"P{i % 3}", i % 5 + 1, (times or {}).get(i, 1000 + i), "s", f"review text {i}"])
+
+def _batched_ids(parser: AmazonParser) -> set[str]:
+    chunks = parser.get_batched_reviews(token_limit=1000, prompt_tokens=10)
+    return {review.review_id for product in chunks.values() for chunk in product for review in chunk}
+
+def test_incremental_run_reads_only_unseen_reviews(tmp_path):
+    source = tmp_path / "amazon"
+    source.mkdir()
+    _append_rows(source / "Reviews.csv", range(0, 20))
+
+    first = AmazonParser(source, max_reviews=100)
+    assert _batched_ids(first) == {str(i) for i in range(20)}
+    first.processed.keyword_file = "run"
+    save_watermark(source, first.processed)
+
+    # New reviews appended, one of them backdated before the watermark's max time.
+    _append_rows(source / "Reviews.csv", range(20, 25), times={24: 5})
+    watermark = load_watermark(source)
+    assert (watermark.max_time, watermark.keyword_file) == (1019, "run")
+
+    second = AmazonParser(source, max_reviews=100, watermark=watermark)
+    assert _batched_ids(second) == {str(i) for i in range(20, 25)}
+    assert len(watermark.merged(second.processed).review_ids) == 25
+
+def test_max_reviews_counts_only_unseen_reviews(tmp_path):
+    source = tmp_path / "amazon"
+    source.mkdir()
+    _append_rows(source / "Reviews.csv", range(0, 30))
+
+    watermark = Watermark()
+    watermark.record(AmazonParser._review_from_row({"Id": str(i), "ProductId": "P", "Score": "1", "Time": "1100", "Summary": "", "Text": ""}) for i in range(10))
+    parser = AmazonParser(source, max_reviews=5, watermark=watermark)
+    assert _batched_ids(parser) == {str(i) for i in range(10, 15)}
+
+def test_corrupted_watermark_is_ignored(tmp_path):
+    (tmp_path / ".watermark.json").write_text("{not json")
+    assert load_watermark(tmp_path) is None
@@ -0,0 +1,41 @@
+from Simple.data.parsers import YelpParser
+from Simple.data.parser_factory import ParserFactory
+
+import csv
+
+def _write_dataset(path):
+    path.mkdir(parents=True)
+    with open(path / "business.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "imgs", "rating", "num_ratings", "offerings", "price_range", "location"])
+        writer.writerow(["biz-1", "Lamb on Leg", "", 4.0, 400, '["Lamb"]', 2, ""])
+        writer.writerow(["biz-2", "Goat House", "", 3.5, 12, '["Goat"]', 1, ""])
+    with open(path / "reviews.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["biz_id", "username", "rating", "text", "date", "images"])
+        writer.writerow(["biz-1", "goat", 4.5, "This was good chow", "Mar 3, 2024", "null"])
+        writer.writerow(["biz-2", "sheep", 2.0, "Too salty", "Now", "null"])
+        writer.writerow(["biz-9", "ghost", 1.0, "Closed forever", "Mar 3, 2024", "null"])
+        writer.writerow(["biz-1", "cow", 5.0, "Great lamb", "Jan 10, 2023", "null"])
+    return path
+
+def test_factory_routes_yelp_paths(tmp_path):
+    source = _write_dataset(tmp_path / "yelp" / "scrape")
+    assert isinstance(ParserFactory.get_parser(source, 10), YelpParser)
+
+def test_yelp_reviews_join_businesses(tmp_path):
+    reviews = list(YelpParser(_write_dataset(tmp_path / "yelp"), 10)._parse())
+
+    # biz-9 has no business row and is dropped by the join
+    assert [r.product_id for r in reviews] == ["biz-1", "biz-2", "biz-1"]
+    assert reviews[0].summary == "Lamb on Leg"
+    assert reviews[0].date > 0 and reviews[1].date == 0
+    assert len({r.review_id for r in reviews}) == 3
+
+def test_yelp_review_ids_are_stable(tmp_path):
+    source = _write_dataset(tmp_path / "yelp")
+    first = [r.review_id for r in YelpParser(source, 10)._parse()]
+    assert first == [r.review_id for r in YelpParser(source, 10)._parse()]
+
+def test_yelp_max_reviews(tmp_path):
+    assert len(list(YelpParser(_write_dataset(tmp_path / "yelp"), 2)._parse())) == 2